@@ -0,0 +1,260 @@
+"""Market aggregates over the house catalogue, updated as houses are added
+
+Keeps running price bounds, price and price-per-m² quantile sketches for the
+whole catalogue, each city and each district (parsed from the address), so a
+listing's quality score is a lookup instead of a scan of every price.
+"""
+import math
+from functools import lru_cache
+from metro import fold_name
+
+# Address parts that are not a place: the country and postal codes
+COUNTRY_NAMES = {'azerbaycan', 'azerbaijan'}
+DISTRICT_SUFFIXES = (' rayonu', ' rayon', ' district')
+
+# Address parts repeat across listings (cities, districts, the country)
+fold_part = lru_cache(maxsize=4096)(fold_name)
+
+def parse_location(address):
+    """Get (district, city) from an address like "street, Səbail Rayonu, Bakü, Azerbaycan"
+
+    The district is the "... Rayonu" part; addresses without one (smaller
+    cities) use the city as their district. Either is None if not found.
+    """
+    parts = [part.strip() for part in (address or '').split(',')]
+    parts = [part for part in parts if part and not part.isdigit() and fold_part(part) not in COUNTRY_NAMES]
+    if not parts:
+        return None, None
+    city = parts[-1]
+    district = next((part for part in parts if fold_part(part).endswith(DISTRICT_SUFFIXES)), None)
+    if district is None and len(parts) > 1:
+        district = city
+    return district, city
+
+def area_key(name):
+    """Get the grouping key of a district or city name ("Sebail Rayonu" == "Səbail rayonu")"""
+    name = fold_part(name)
+    for suffix in DISTRICT_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+class QuantileSketch:
+    """Log-bucketed histogram of positive values with bounded relative error
+
+    Values are counted in buckets that are (1 + accuracy) / (1 - accuracy)
+    wide, kept in a Fenwick tree, so adding a value and getting a rank or a
+    quantile take O(log buckets) whatever the number of values. The tree is
+    built on the first read, so bulk loading only counts buckets. Quantiles
+    stay within the smallest and largest values added.
+    """
+
+    def __init__(self, accuracy=0.01, min_value=1.0, max_value=1e10):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        self.size = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self._tree = None
+        self._bucket_counts = [0] * self.size
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        if value <= 0:
+            return 0
+        bucket = math.floor(math.log(value) / self._log_gamma) - self._offset
+        return min(max(bucket, 0), self.size - 1)
+
+    def _build_tree(self):
+        tree = [0] + self._bucket_counts
+        for index in range(1, self.size + 1):
+            parent = index + (index & -index)
+            if parent <= self.size:
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _below(self, bucket):
+        """Count the values in buckets before bucket"""
+        if self._tree is None:
+            self._build_tree()
+        total = 0
+        while bucket > 0:
+            total += self._tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+    def add(self, value):
+        bucket = self._bucket(value)
+        self._bucket_counts[bucket] += 1
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if self._tree is None:
+            return
+        bucket += 1
+        while bucket <= self.size:
+            self._tree[bucket] += 1
+            bucket += bucket & -bucket
+
+    def rank(self, value):
+        """Get the share of values below value (0-1), counting equal values as half below"""
+        if not self.count:
+            return None
+        bucket = self._bucket(value)
+        return (self._below(bucket) + self._bucket_counts[bucket] / 2) / self.count
+
+    def quantile(self, fraction):
+        """Get the value at a fraction (0-1) of the values, within the sketch's accuracy"""
+        if not self.count:
+            return None
+        if self._tree is None:
+            self._build_tree()
+        target = max(1, math.ceil(fraction * self.count))
+        # Walk down the tree to the first bucket whose running count reaches target
+        bucket, seen = 0, 0
+        step = 1 << (self.size.bit_length() - 1)
+        while step:
+            if bucket + step <= self.size and seen + self._tree[bucket + step] < target:
+                bucket += step
+                seen += self._tree[bucket]
+            step >>= 1
+        # Spread the bucket's values evenly (in log space) across it, then
+        # keep the estimate within the values actually seen
+        position = (target - seen - 0.5) / self._bucket_counts[bucket]
+        value = self.gamma ** (bucket + self._offset + position)
+        return min(max(value, self.min), self.max)
+
+class MarketStats:
+    """Running statistics of a group of listings"""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.count = 0
+        self.min_price = None
+        self.max_price = None
+        self.prices = QuantileSketch()
+        self.price_per_m2 = QuantileSketch()
+        self.min_price_per_m2 = None
+        self.max_price_per_m2 = None
+        self._price_per_m2_sum = 0.0
+
+    def add(self, price, per_m2):
+        self.count += 1
+        self.min_price = price if self.min_price is None else min(self.min_price, price)
+        self.max_price = price if self.max_price is None else max(self.max_price, price)
+        self.prices.add(price)
+        if per_m2 is not None:
+            self.price_per_m2.add(per_m2)
+            self._price_per_m2_sum += per_m2
+            self.min_price_per_m2 = per_m2 if self.min_price_per_m2 is None else min(self.min_price_per_m2, per_m2)
+            self.max_price_per_m2 = per_m2 if self.max_price_per_m2 is None else max(self.max_price_per_m2, per_m2)
+
+    def summary(self):
+        """Get the statistics as a JSON-ready dict"""
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+        sized = self.price_per_m2.count
+        return {
+            'name': self.name,
+            'count': self.count,
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+            'median_price': rounded(self.prices.quantile(0.5)),
+            'price_per_m2': {
+                'count': sized,
+                'min': rounded(self.min_price_per_m2),
+                'max': rounded(self.max_price_per_m2),
+                'mean': rounded(self._price_per_m2_sum / sized) if sized else None,
+                'p25': rounded(self.price_per_m2.quantile(0.25)),
+                'median': rounded(self.price_per_m2.quantile(0.5)),
+                'p75': rounded(self.price_per_m2.quantile(0.75))
+            }
+        }
+
+def price_per_m2(house):
+    """Get a house's price per m², or None if it has no area"""
+    try:
+        area = float(house.get('area') or 0)
+    except (TypeError, ValueError):
+        return None
+    return house['price'] / area if area > 0 else None
+
+class MarketAggregates:
+    """Market statistics of the catalogue, its cities and districts
+
+    Not thread-safe on its own; the repository updates and reads it under its lock.
+    """
+
+    def __init__(self, min_comparables=5):
+        self.min_comparables = min_comparables
+        self.market = MarketStats()
+        self.cities = {}  # area key -> MarketStats
+        self.districts = {}
+        self._house_groups = {}  # house id -> its stats, most specific first
+
+    @classmethod
+    def build(cls, houses, min_comparables=5):
+        aggregates = cls(min_comparables)
+        for house in houses:
+            aggregates.add(house)
+        return aggregates
+
+    def _groups(self, house):
+        """Get the district, city and market stats of a house, most specific first"""
+        groups = self._house_groups.get(house.get('id'))
+        if groups is not None:
+            return groups
+        district, city = parse_location(house.get('address'))
+        groups = []
+        if district is not None:
+            groups.append(self.districts.get(area_key(district)))
+        if city is not None:
+            groups.append(self.cities.get(area_key(city)))
+        groups.append(self.market)
+        return [group for group in groups if group is not None]
+
+    def add(self, house):
+        per_m2 = price_per_m2(house)
+        district, city = parse_location(house.get('address'))
+        groups = []
+        for name, by_key in ((district, self.districts), (city, self.cities)):
+            if name is not None:
+                key = area_key(name)
+                if key not in by_key:
+                    by_key[key] = MarketStats(name)
+                groups.append(by_key[key])
+        groups.append(self.market)
+        for group in groups:
+            group.add(house['price'], per_m2)
+        self._house_groups[house.get('id')] = groups
+
+    def quality_score(self, house):
+        """Score a house 0-100 by how cheap it is against comparable listings
+
+        The score is the share of comparable listings that cost more per m²:
+        the house's district if it has at least min_comparables sized
+        listings, else its city, else the whole catalogue. Houses without an
+        area are compared on price alone.
+        """
+        per_m2 = price_per_m2(house)
+        groups = self._groups(house)
+        if per_m2 is not None:
+            group = next((g for g in groups if g.price_per_m2.count >= self.min_comparables), groups[-1])
+            rank = group.price_per_m2.rank(per_m2)
+        else:
+            group = next((g for g in groups if g.count >= self.min_comparables), groups[-1])
+            rank = group.prices.rank(house['price'])
+        if rank is None:
+            return 50
+        return round(100 - rank * 100, 2)
+
+    def summary(self):
+        """Get the market, city and district statistics as a JSON-ready dict"""
+        def by_count(groups):
+            return [stats.summary() for stats in sorted(groups.values(), key=lambda s: (-s.count, s.name))]
+        return {
+            'market': self.market.summary(),
+            'cities': by_count(self.cities),
+            'districts': by_count(self.districts)
+        }
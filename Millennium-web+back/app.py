@@ -1,13 +1,25 @@
 """Main Flask application file"""
+import os
 from flask import Flask
 from flask_cors import CORS
+from config import WARMUP_ON_STARTUP
 from routes import register_routes
+from instrumentation import init_app as init_instrumentation
+from warmup import start_background_warmup
 
 app = Flask(__name__)
 CORS(app)
 
+# Per-request timing (Server-Timing header) and /metrics histograms
+init_instrumentation(app)
+
 # Register all routes
 register_routes(app)
 
+# Prefetch POIs for the configured regions in the background. With the debug
+# reloader, only the child process that serves requests does it
+if WARMUP_ON_STARTUP and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    start_background_warmup()
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,129 @@
+"""Benchmark fixtures: recorded Overpass responses and synthetic house catalogues
+
+Record a real Overpass response for Baku (needs network access):
+
+    python benchmarks/fixtures.py record
+
+or regenerate the bundled synthetic one:
+
+    python benchmarks/fixtures.py synthesize
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from config import DEFAULT_LOCATION, OVERPASS_ENDPOINTS, METRO_STATIONS_FILE
+
+FIXTURE_FILE = os.path.join(BENCHMARKS_DIR, 'fixtures', 'overpass_baku.json')
+
+# Synthetic area and POI counts, roughly matching OpenStreetMap data for Baku
+BAKU_AREA = {'min_lat': 40.30, 'max_lat': 40.55, 'min_lon': 49.70, 'max_lon': 50.05}
+SYNTHETIC_POIS = {
+    ('amenity', 'school'): 150,
+    ('amenity', 'hospital'): 60,
+    ('shop', 'supermarket'): 200,
+    ('amenity', 'marketplace'): 20,
+    ('amenity', 'cafe'): 250,
+    ('amenity', 'restaurant'): 250,
+    ('leisure', 'park'): 80,
+    ('leisure', 'fitness_centre'): 70,
+    ('amenity', 'pharmacy'): 150,
+    ('amenity', 'police'): 40
+}
+RECORD_RADIUS = 20000  # meters around DEFAULT_LOCATION
+
+DISTRICTS = ['Nəsimi', 'Yasamal', 'Səbail', 'Nərimanov', 'Xətai', 'Binəqədi', 'Nizami', 'Sabunçu', 'Suraxanı']
+
+def synthesize(seed=42):
+    """Make a deterministic Overpass-format response with POIs spread over Baku"""
+    rng = random.Random(seed)
+    elements = []
+    for (key, value), count in SYNTHETIC_POIS.items():
+        for i in range(count):
+            elements.append({
+                'type': 'node',
+                'id': len(elements) + 1,
+                'lat': round(rng.uniform(BAKU_AREA['min_lat'], BAKU_AREA['max_lat']), 6),
+                'lon': round(rng.uniform(BAKU_AREA['min_lon'], BAKU_AREA['max_lon']), 6),
+                'tags': {key: value, 'name': f'{value.replace("_", " ").title()} {i + 1}'}
+            })
+    # Metro stations at their real locations, as ways like many OSM stations
+    with open(os.path.join(os.path.dirname(BENCHMARKS_DIR), METRO_STATIONS_FILE), 'r', encoding='utf-8') as f:
+        stations = json.load(f)['stations']
+    for station in stations:
+        elements.append({
+            'type': 'way',
+            'id': len(elements) + 1,
+            'center': {'lat': station['lat'], 'lon': station['lon']},
+            'tags': {'railway': 'station', 'station': 'subway', 'name': station['name']}
+        })
+    return {'source': 'synthetic', 'elements': elements}
+
+def record(endpoint=OVERPASS_ENDPOINTS[0], radius=RECORD_RADIUS):
+    """Fetch every queried amenity type around Baku from a live Overpass server"""
+    import requests
+    from osm import OSM_QUERIES
+    lat, lon = DEFAULT_LOCATION['lat'], DEFAULT_LOCATION['lon']
+    parts = set()
+    for place_type, tags in OSM_QUERIES.items():
+        kinds = ('node', 'way') if place_type == 'metro' else ('node',)
+        for key, value in tags:
+            for kind in kinds:
+                parts.add(f'{kind}["{key}"="{value}"](around:{radius},{lat},{lon});')
+    query = f"[out:json][timeout:120];({' '.join(sorted(parts))}); out center;"
+    response = requests.post(endpoint, data={'data': query}, timeout=180)
+    response.raise_for_status()
+    return {'source': endpoint, 'recorded_at': datetime.now().isoformat(), 'elements': response.json()['elements']}
+
+def load_fixture(path=FIXTURE_FILE):
+    """Get the recorded Overpass elements"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['elements']
+
+def make_catalogue(size, seed=7):
+    """Make a synthetic list of house listings around Baku"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    houses = []
+    for house_id in range(1, size + 1):
+        district = rng.choice(DISTRICTS)
+        area = rng.randint(40, 250)
+        houses.append({
+            'id': house_id,
+            'title': f'Listing {house_id}',
+            'address': f'{rng.randint(1, 200)}, Street {rng.randint(1, 500)}, {district} Rayonu, Bakü, Azerbaycan',
+            'latitude': rng.uniform(40.33, 40.47),
+            'longitude': rng.uniform(49.75, 49.98),
+            'price': float(round(area * rng.uniform(900, 3500), -3)),
+            'description': 'Synthetic benchmark listing',
+            'bedrooms': rng.randint(1, 5),
+            'bathrooms': rng.randint(1, 3),
+            'area': area,
+            'seller_name': 'Benchmark',
+            'seller_phone': '+994000000000',
+            'created_at': (start + timedelta(minutes=house_id)).isoformat()
+        })
+    return houses
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage benchmark fixtures')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('synthesize', help='Regenerate the synthetic Overpass fixture')
+    record_parser = subparsers.add_parser('record', help='Record an Overpass response for Baku')
+    record_parser.add_argument('--endpoint', default=OVERPASS_ENDPOINTS[0])
+    args = parser.parse_args(argv)
+
+    data = synthesize() if args.command == 'synthesize' else record(args.endpoint)
+    with open(FIXTURE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved {len(data['elements'])} elements to {FIXTURE_FILE}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
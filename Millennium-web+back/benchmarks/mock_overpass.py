@@ -0,0 +1,102 @@
+"""Local Overpass API stand-in that replays a recorded response
+
+Answers each query with the recorded elements matching its tag filters and
+around: circles, after an injected latency:
+
+    python benchmarks/mock_overpass.py --port 8900 --latency 0.3
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import calculate_distance
+from fixtures import FIXTURE_FILE, load_fixture
+
+STATEMENT = re.compile(r'(node|way)((?:\["[^"]+"="[^"]+"\])+)\(around:([\d.]+),([\d.\-]+),([\d.\-]+)\)')
+TAG_FILTER = re.compile(r'\["([^"]+)"="([^"]+)"\]')
+
+class OverpassReplay:
+    """Answers Overpass QL queries from recorded elements"""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def answer(self, query):
+        with self._lock:
+            self.requests += 1
+        found = {}
+        for kind, filters, radius, lat, lon in STATEMENT.findall(query):
+            tags = TAG_FILTER.findall(filters)
+            radius_km = float(radius) / 1000
+            for element in self.elements:
+                if element['type'] != kind or (kind, element['id']) in found:
+                    continue
+                if not all(element['tags'].get(key) == value for key, value in tags):
+                    continue
+                point = element.get('center', element)
+                if calculate_distance(float(lat), float(lon), point['lat'], point['lon']) <= radius_km:
+                    found[(kind, element['id'])] = element
+        # Overpass outputs nodes before ways, each by id
+        return {'elements': [found[key] for key in sorted(found, key=lambda k: (k[0] != 'node', k[1]))]}
+
+def serve(port=0, latency=0.0, jitter=0.0, fixture=FIXTURE_FILE, status=200):
+    """Start the mock server in a background thread; returns (server, replay)
+
+    With an error status every query is counted and answered with that status.
+    """
+    replay = OverpassReplay(load_fixture(fixture))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+            query = parse_qs(body).get('data', [''])[0]
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if status != 200:
+                with replay._lock:
+                    replay.requests += 1
+                self.send_error(status)
+                return
+            payload = json.dumps(replay.answer(query)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, replay
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve recorded Overpass responses locally')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds on top of the latency')
+    parser.add_argument('--fixture', default=FIXTURE_FILE)
+    args = parser.parse_args(argv)
+
+    server, _ = serve(args.port, args.latency, args.jitter, args.fixture)
+    print(f"Mock Overpass listening on http://127.0.0.1:{server.server_address[1]}/api/interpreter")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
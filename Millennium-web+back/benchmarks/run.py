@@ -0,0 +1,251 @@
+"""Benchmark suite for the API endpoints
+
+Runs the app in-process (Flask test client) against the local Overpass
+stand-in, so timings don't depend on a live server:
+
+    python benchmarks/run.py
+    python benchmarks/run.py --quick
+    python benchmarks/run.py compare benchmarks/results/old.json benchmarks/results/new.json
+
+Each group of scenarios runs in its own process and working directory, so
+caches, catalogues and memory readings don't leak between them. Results are
+written to benchmarks/results/ as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+GRID_SIZES = [5, 10, 15, 20, 25]
+CATALOGUE_SIZES = [10, 1000, 100000]
+REQUIREMENT_TYPES = ['school', 'hospital', 'market', 'cafe', 'restaurant', 'park', 'pharmacy', 'gym']
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def measure(name, call, iterations, params=None):
+    """Time a request: one cold call, `iterations` warm calls, then one traced call for peak memory"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        status = call(0).status_code
+        first = time.perf_counter() - start
+
+        durations = []
+        for i in range(1, iterations + 1):
+            start = time.perf_counter()
+            call(i)
+            durations.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        call(iterations + 1)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    ordered = sorted(durations)
+    result = {
+        'name': name,
+        'params': params or {},
+        'status': status,
+        'iterations': iterations,
+        'first_ms': round(first * 1000, 2),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+        'throughput_rps': round(len(durations) / sum(durations), 2),
+        'peak_memory_mb': round(peak / 1024 / 1024, 2)
+    }
+    print(f"  {name} {params or ''}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, "
+          f"p99 {result['p99_ms']}ms, {result['throughput_rps']} req/s, peak {result['peak_memory_mb']}MB",
+          file=sys.stderr)
+    return result
+
+def random_requirements(rng):
+    return {place_type: rng.randint(0, 10) for place_type in REQUIREMENT_TYPES}
+
+def run_evaluate_group(spec):
+    """Benchmark /api/evaluate per grid size and /api/all-places"""
+    from app import app
+    client = app.test_client()
+    rng = random.Random(1)
+    requirements = {place_type: 5 for place_type in REQUIREMENT_TYPES}
+    results = []
+    for grid_size in spec['grid_sizes']:
+        body = {'latitude': 40.4093, 'longitude': 49.8671, 'requirements': requirements, 'grid_size': grid_size}
+        results.append(measure('evaluate', lambda i: client.post('/api/evaluate', json=body),
+                               spec['iterations'], {'grid_size': grid_size}))
+    for radius in (2000, 5000):
+        results.append(measure('all-places', lambda i: client.post('/api/all-places', json={
+            'latitude': 40.4093 + rng.uniform(-0.01, 0.01), 'longitude': 49.8671, 'radius': radius
+        }), spec['iterations'], {'radius': radius}))
+    return results
+
+def run_search_group(spec):
+    """Benchmark house search and listing over a synthetic catalogue"""
+    from fixtures import make_catalogue
+    from models import save_houses
+    save_houses(make_catalogue(spec['size']))
+
+    from app import app
+    from profiles import get_profile_store
+    from repository import get_house_repository
+
+    # Profiles are precomputed, as in production after a backfill
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        get_profile_store().compute(get_house_repository().all())
+    setup_s = round(time.perf_counter() - start, 2)
+
+    client = app.test_client()
+    rng = random.Random(2)
+    # A different requirement profile per call, so no call reuses a cached ranking
+    profiles = [random_requirements(rng) for _ in range(spec['iterations'] + 2)]
+    results = [
+        measure('search', lambda i: client.post('/api/houses/search', json={
+            'requirements': profiles[i], 'limit': 20
+        }), spec['iterations'], {'catalogue': spec['size']}),
+        measure('houses', lambda i: client.get('/api/houses?limit=50'),
+                spec['iterations'], {'catalogue': spec['size']})
+    ]
+    # A city-wide view (clusters) and a street-level view (listings), panned a little per call
+    for zoom, span in ((12, 0.2), (16, 0.01)):
+        results.append(measure('viewport', lambda i: client.get('/api/houses/viewport', query_string={
+            'bbox': f'{49.86 - span + i * span / 50},{40.40 - span / 2},{49.86 + span + i * span / 50},{40.40 + span / 2}',
+            'zoom': zoom
+        }), spec['iterations'], {'catalogue': spec['size'], 'zoom': zoom}))
+    for result in results:
+        result['setup_s'] = setup_s
+    return results
+
+def run_worker(spec):
+    """Run one scenario group; called in a fresh process by run_suite"""
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, BENCHMARKS_DIR)
+    groups = {'evaluate': run_evaluate_group, 'search': run_search_group}
+    print(json.dumps(groups[spec['group']](spec)))
+
+def spawn(spec, port):
+    """Run a scenario group in a subprocess with its own working directory"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env.update({
+            'OVERPASS_ENDPOINTS': f'http://127.0.0.1:{port}/api/interpreter',
+            'POI_STORE_FILE': os.path.join(workdir, 'pois.db'),
+            'METRO_STATIONS_FILE': os.path.join(APP_DIR, 'data', 'metro_stations.json'),
+            'WARMUP_ON_STARTUP': 'false'
+        })
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'worker', json.dumps(spec)],
+            cwd=workdir, env=env, stdout=subprocess.PIPE, text=True
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark group {spec['group']} failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_suite(args):
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, BENCHMARKS_DIR)
+    from mock_overpass import serve
+
+    server, replay = serve(latency=args.latency, jitter=args.jitter)
+    port = server.server_address[1]
+    specs = [{'group': 'evaluate', 'grid_sizes': args.grid_sizes, 'iterations': args.iterations}]
+    specs += [{'group': 'search', 'size': size, 'iterations': args.iterations} for size in args.catalogues]
+
+    scenarios = []
+    for spec in specs:
+        print(f"Running {spec['group']} {spec.get('size', '')}...", file=sys.stderr)
+        before = replay.requests
+        results = spawn(spec, port)
+        for result in results:
+            result['group_upstream_requests'] = replay.requests - before
+        scenarios.extend(results)
+    server.shutdown()
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'latency': args.latency, 'jitter': args.jitter, 'iterations': args.iterations},
+        'scenarios': scenarios
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {path}", file=sys.stderr)
+    return path
+
+def scenario_key(scenario):
+    return (scenario['name'], json.dumps(scenario['params'], sort_keys=True))
+
+def compare(old_path, new_path):
+    """Print the p50/p95 change of every scenario between two result files"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {scenario_key(s): s for s in json.load(f)['scenarios']}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)['scenarios']
+    for scenario in new:
+        before = old.get(scenario_key(scenario))
+        if before is None:
+            continue
+        changes = []
+        for metric in ('p50_ms', 'p95_ms', 'peak_memory_mb'):
+            if before[metric]:
+                changes.append(f"{metric} {before[metric]} -> {scenario[metric]} "
+                               f"({(scenario[metric] - before[metric]) / before[metric] * 100:+.1f}%)")
+        print(f"{scenario['name']} {scenario['params']}: {', '.join(changes)}")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['worker']:
+        run_worker(json.loads(argv[1]))
+        return 0
+    if argv[:1] == ['compare']:
+        compare(argv[1], argv[2])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Benchmark the API against a local Overpass stand-in')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds the mock Overpass adds per response')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Random +/- seconds on top of the latency')
+    parser.add_argument('--iterations', type=int, default=20, help='Warm requests per scenario')
+    parser.add_argument('--grid-sizes', type=lambda v: [int(x) for x in v.split(',')], default=GRID_SIZES)
+    parser.add_argument('--catalogues', type=lambda v: [int(x) for x in v.split(',')], default=CATALOGUE_SIZES)
+    parser.add_argument('--quick', action='store_true', help='Small grids and catalogues only')
+    parser.add_argument('--output', default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.grid_sizes = [5, 10]
+        args.catalogues = [10, 1000]
+        args.iterations = min(args.iterations, 5)
+
+    run_suite(args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Listing clusters for every map zoom level, updated as houses are added
+
+Each zoom level is a grid of square cells CLUSTER_CELL_PIXELS wide on the
+web map. A cell keeps the count, coordinate sums and price range of its
+listings, so a zoomed-out viewport is answered from the cells it overlaps
+instead of from every listing inside it.
+"""
+import math
+
+# Web map tiles are 256px at every zoom level
+TILE_PIXELS = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+def world_xy(lat, lon):
+    """Get the web mercator position of a point, 0-1 across the world on each axis"""
+    lat = min(max(lat, -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180) / 360, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+class Cluster:
+    """Running totals of the listings in one cell"""
+
+    __slots__ = ('count', 'sum_lat', 'sum_lon', 'min_price', 'max_price', 'house')
+
+    def __init__(self):
+        self.count = 0
+        self.sum_lat = 0.0
+        self.sum_lon = 0.0
+        self.min_price = None
+        self.max_price = None
+        self.house = None  # the listing itself while it's alone in the cell
+
+    def add(self, house):
+        self.count += 1
+        self.sum_lat += house['latitude']
+        self.sum_lon += house['longitude']
+        price = house['price']
+        self.min_price = price if self.min_price is None else min(self.min_price, price)
+        self.max_price = price if self.max_price is None else max(self.max_price, price)
+        self.house = house if self.count == 1 else None
+
+    def merge(self, other):
+        """Add the listings of another cluster"""
+        self.house = other.house if self.count == 0 else None
+        self.count += other.count
+        self.sum_lat += other.sum_lat
+        self.sum_lon += other.sum_lon
+        self.min_price = other.min_price if self.min_price is None else min(self.min_price, other.min_price)
+        self.max_price = other.max_price if self.max_price is None else max(self.max_price, other.max_price)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'latitude': self.sum_lat / self.count,
+            'longitude': self.sum_lon / self.count,
+            'min_price': self.min_price,
+            'max_price': self.max_price
+        }
+
+class ClusterIndex:
+    """Clusters of listings for zoom levels 0 to max_zoom"""
+
+    def __init__(self, max_zoom, cell_pixels):
+        if cell_pixels & (cell_pixels - 1) or not 1 <= cell_pixels <= TILE_PIXELS:
+            raise ValueError('cell_pixels must be a power of two up to 256')
+        self.max_zoom = max_zoom
+        self.cell_pixels = cell_pixels
+        self.levels = [{} for _ in range(max_zoom + 1)]  # zoom -> (x, y) -> Cluster
+
+    @classmethod
+    def build(cls, houses, max_zoom, cell_pixels):
+        """Cluster houses at max_zoom, then merge each level's cells into the next one out"""
+        index = cls(max_zoom, cell_pixels)
+        finest = index.levels[max_zoom]
+        for house in houses:
+            key = index._cell(house, max_zoom)
+            cluster = finest.get(key)
+            if cluster is None:
+                cluster = finest[key] = Cluster()
+            cluster.add(house)
+        for zoom in range(max_zoom - 1, -1, -1):
+            level = index.levels[zoom]
+            for (col, row), child in index.levels[zoom + 1].items():
+                key = (col >> 1, row >> 1)
+                cluster = level.get(key)
+                if cluster is None:
+                    cluster = level[key] = Cluster()
+                cluster.merge(child)
+        return index
+
+    def _cells_across(self, zoom):
+        return 2 ** zoom * TILE_PIXELS // self.cell_pixels
+
+    def _cell(self, house, zoom):
+        x, y = world_xy(house['latitude'], house['longitude'])
+        cells = self._cells_across(zoom)
+        return math.floor(x * cells), math.floor(y * cells)
+
+    def add(self, house):
+        # Cells halve in size with every zoom level, so the cell at each level
+        # is the one at max_zoom shifted right
+        col, row = self._cell(house, self.max_zoom)
+        for zoom, level in enumerate(self.levels):
+            shift = self.max_zoom - zoom
+            key = (col >> shift, row >> shift)
+            cluster = level.get(key)
+            if cluster is None:
+                cluster = level[key] = Cluster()
+            cluster.add(house)
+
+    def within(self, min_lat, max_lat, min_lon, max_lon, zoom):
+        """Get the clusters of the cells overlapping a bounding box at a zoom level"""
+        level = self.levels[zoom]
+        cells = self._cells_across(zoom)
+        # Mercator y grows southwards
+        min_x, min_y = world_xy(max_lat, min_lon)
+        max_x, max_y = world_xy(min_lat, max_lon)
+        min_col, max_col = math.floor(min_x * cells), math.floor(max_x * cells)
+        min_row, max_row = math.floor(min_y * cells), math.floor(max_y * cells)
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > len(level):
+            return [cluster for (col, row), cluster in level.items()
+                    if min_col <= col <= max_col and min_row <= row <= max_row]
+        return [level[(col, row)] for col in range(min_col, max_col + 1) for row in range(min_row, max_row + 1)
+                if (col, row) in level]
@@ -0,0 +1,52 @@
+"""Conditional GET: strong ETags, Last-Modified and Cache-Control from data versions"""
+import hashlib
+from datetime import datetime, timezone
+from flask import request, Response
+
+def make_etag(*parts):
+    """Build a strong ETag from a data version and whatever else the body depends on"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:24]
+
+def version_time(version_ns):
+    """Get the modification time of a nanosecond data version"""
+    return datetime.fromtimestamp(version_ns / 1e9, timezone.utc)
+
+def http_last_modified(modified, now=None):
+    """Get the Last-Modified value for a modification time, or None if it can't be one yet
+
+    HTTP dates have whole seconds, so a copy served in the same second as the
+    change could miss a second change within that second and still match
+    If-Modified-Since later. Those responses carry only the ETag.
+    """
+    now = now or datetime.now(timezone.utc)
+    if int(now.timestamp()) <= int(modified.timestamp()):
+        return None
+    return modified.replace(microsecond=0)
+
+def cache_control(max_age):
+    """Cache-Control value: revalidate every time, or cache for max_age seconds"""
+    return f'public, max-age={max_age}' if max_age > 0 else 'no-cache'
+
+def is_fresh(etag, last_modified):
+    """Check if the client's copy matches; If-None-Match wins over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified <= since
+
+def conditional(etag, modified, max_age, build):
+    """Answer 304 if the client's copy is current, otherwise the response from build()
+
+    modified is the exact time the data last changed (or None). build is only
+    called for a full response, so a 304 costs no loading or serialization.
+    """
+    last_modified = http_last_modified(modified) if modified is not None else None
+    if is_fresh(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control(max_age)
+    return response
@@ -1,26 +1,126 @@
-"""Configuration file for the application"""
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# File to store house listings
-HOUSES_FILE = 'houses.json'
-
-# Google Maps API key - set this in .env file
-GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY_HERE')
-
-# Azerbaijan geographic bounds
-AZERBAIJAN_BOUNDS = {
-    'min_lat': 38.4,
-    'max_lat': 41.9,
-    'min_lon': 44.8,
-    'max_lon': 50.4
-}
-
-# Default location: Baku, Azerbaijan
-DEFAULT_LOCATION = {
-    'lat': 40.4093,
-    'lon': 49.8671
-}
-
+"""Configuration file for the application"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# File to store house listings
+HOUSES_FILE = 'houses.json'
+
+# Google Maps API key - set this in .env file
+GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', 'YOUR_API_KEY_HERE')
+
+# Azerbaijan geographic bounds
+AZERBAIJAN_BOUNDS = {
+    'min_lat': 38.4,
+    'max_lat': 41.9,
+    'min_lon': 44.8,
+    'max_lon': 50.4
+}
+
+# Default location: Baku, Azerbaijan
+DEFAULT_LOCATION = {
+    'lat': 40.4093,
+    'lon': 49.8671
+}
+
+# Local POI store built with `python poi_store.py ingest <extract>`
+POI_STORE_FILE = os.getenv('POI_STORE_FILE', 'pois.db')
+
+# Query the live Overpass API when the POI store doesn't cover a location
+OVERPASS_FALLBACK = os.getenv('OVERPASS_FALLBACK', 'true').lower() == 'true'
+
+# Overpass response cache: in-process LRU plus an on-disk SQLite tier
+POI_CACHE_FILE = os.getenv('POI_CACHE_FILE', 'poi_cache.db')
+POI_CACHE_TTL = int(os.getenv('POI_CACHE_TTL', 24 * 3600))  # seconds
+POI_CACHE_GRID = float(os.getenv('POI_CACHE_GRID', 0.001))  # degrees, about 100m
+POI_CACHE_MEMORY_ENTRIES = int(os.getenv('POI_CACHE_MEMORY_ENTRIES', 256))
+POI_CACHE_MAX_DISK_MB = float(os.getenv('POI_CACHE_MAX_DISK_MB', 100))
+
+# Precomputed amenity profiles of house listings
+PROFILES_FILE = os.getenv('PROFILES_FILE', 'amenity_profiles.json')
+PROFILE_MAX_AGE_DAYS = int(os.getenv('PROFILE_MAX_AGE_DAYS', 30))  # refresh older profiles
+PROFILE_WORKERS = int(os.getenv('PROFILE_WORKERS', 2))
+
+# Overpass API mirrors, tried in order (Kumi Systems is often faster)
+OVERPASS_ENDPOINTS = [url.strip() for url in os.getenv(
+    'OVERPASS_ENDPOINTS',
+    'https://overpass.kumi.systems/api/interpreter,https://overpass-api.de/api/interpreter'
+).split(',') if url.strip()]
+OVERPASS_TIMEOUT = float(os.getenv('OVERPASS_TIMEOUT', 8))  # seconds per request
+OVERPASS_POOL_SIZE = int(os.getenv('OVERPASS_POOL_SIZE', 8))  # concurrent requests / pooled connections
+OVERPASS_HEDGE_AFTER = float(os.getenv('OVERPASS_HEDGE_AFTER', 3))  # seconds, until a p95 is known
+OVERPASS_COOLDOWN = float(os.getenv('OVERPASS_COOLDOWN', 60))  # seconds a failed mirror is tried last
+
+# Fetch several place types with one combined Overpass query
+OVERPASS_UNION_QUERIES = os.getenv('OVERPASS_UNION_QUERIES', 'true').lower() == 'true'
+OVERPASS_UNION_TIMEOUT = int(os.getenv('OVERPASS_UNION_TIMEOUT', 15))  # server-side seconds
+
+# Bundled Baku metro stations, refreshed with `python metro.py refresh`
+METRO_STATIONS_FILE = os.getenv('METRO_STATIONS_FILE', os.path.join('data', 'metro_stations.json'))
+METRO_AREA_RADIUS = 20000  # meters around DEFAULT_LOCATION, covers all of Baku
+
+# Local gazetteer behind /api/geocode and /api/reverse; the OSM place/street
+# dump is optional and downloaded with `python gazetteer.py fetch`
+GAZETTEER_FILE = os.getenv('GAZETTEER_FILE', os.path.join('data', 'places.json'))
+GAZETTEER_REVERSE_RADIUS = float(os.getenv('GAZETTEER_REVERSE_RADIUS', 0.5))  # km to the nearest address or street
+
+# Grid cells per batch in streamed /api/evaluate responses
+EVALUATE_BATCH_SIZE = int(os.getenv('EVALUATE_BATCH_SIZE', 50))
+
+# Adaptive evaluation: subdivide promising grid cells up to this depth and number of scored cells
+ADAPTIVE_MAX_DEPTH = int(os.getenv('ADAPTIVE_MAX_DEPTH', 3))
+ADAPTIVE_CELL_BUDGET = int(os.getenv('ADAPTIVE_CELL_BUDGET', 200))
+ADAPTIVE_SCORE_THRESHOLD = float(os.getenv('ADAPTIVE_SCORE_THRESHOLD', 60))  # refine cells scoring at least this
+ADAPTIVE_VARIATION_THRESHOLD = float(os.getenv('ADAPTIVE_VARIATION_THRESHOLD', 15))  # or differing this much from a neighbour
+
+# Precomputed distance layers, built with `python layers.py build`
+LAYERS_DIR = os.getenv('LAYERS_DIR', 'layers')
+LAYER_RESOLUTION = float(os.getenv('LAYER_RESOLUTION', 0.001))  # degrees, about 100m
+LAYER_TILE_SIZE = 128  # raster cells per tile side
+LAYER_FETCH_CHUNK_KM = float(os.getenv('LAYER_FETCH_CHUNK_KM', 5))  # side of the squares POIs are fetched for
+LAYER_AREAS = {
+    'baku': {'min_lat': 40.30, 'max_lat': 40.60, 'min_lon': 49.70, 'max_lon': 50.10},
+    'sumqayit': {'min_lat': 40.55, 'max_lat': 40.63, 'min_lon': 49.58, 'max_lon': 49.72},
+    'ganja': {'min_lat': 40.64, 'max_lat': 40.72, 'min_lon': 46.30, 'max_lon': 46.42}
+}
+
+# Cache warm-up (`python warmup.py`): regions prefetched into the POI cache
+WARMUP_REGIONS = [
+    {'name': 'Baku', 'lat': DEFAULT_LOCATION['lat'], 'lon': DEFAULT_LOCATION['lon'], 'extent_km': 12},
+    {'name': 'Sumqayit', 'lat': 40.5897, 'lon': 49.6686, 'extent_km': 4},
+    {'name': 'Ganja', 'lat': 40.6828, 'lon': 46.3606, 'extent_km': 4},
+    {'name': 'Mingachevir', 'lat': 40.7640, 'lon': 47.0595, 'extent_km': 3},
+    {'name': 'Shirvan', 'lat': 39.9317, 'lon': 48.9203, 'extent_km': 3},
+    {'name': 'Lankaran', 'lat': 38.7543, 'lon': 48.8506, 'extent_km': 3},
+    {'name': 'Shaki', 'lat': 41.1919, 'lon': 47.1706, 'extent_km': 3},
+    {'name': 'Nakhchivan', 'lat': 39.2089, 'lon': 45.4122, 'extent_km': 3}
+]
+# Meters fetched around each warm-up point; 0 covers any /api/evaluate grid of up to
+# WARMUP_GRID_SIZE points a side centered in the region
+WARMUP_RADIUS = int(os.getenv('WARMUP_RADIUS', 0))
+WARMUP_GRID_SIZE = int(os.getenv('WARMUP_GRID_SIZE', 5))
+WARMUP_SPACING_KM = float(os.getenv('WARMUP_SPACING_KM', 3))  # distance between warm-up points
+WARMUP_INTERVAL = float(os.getenv('WARMUP_INTERVAL', 2))  # minimum seconds between Overpass fetches
+WARMUP_PROGRESS_FILE = os.getenv('WARMUP_PROGRESS_FILE', 'warmup_progress.json')
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+
+# Cache-Control max-age (seconds) of GET endpoints; 0 means revalidate every time.
+# Responses carry ETags, so revalidating an unchanged resource is a cheap 304
+HOUSES_MAX_AGE = int(os.getenv('HOUSES_MAX_AGE', 0))
+METRO_MAX_AGE = int(os.getenv('METRO_MAX_AGE', 3600))
+
+# Quality scores compare a house's price per m² with its district, or its city
+# when the district has fewer sized listings than this
+QUALITY_MIN_COMPARABLES = int(os.getenv('QUALITY_MIN_COMPARABLES', 5))
+
+# Map viewport queries (/api/houses/viewport): listings are clustered in cells
+# of this many pixels up to CLUSTER_MAX_ZOOM, and returned one by one beyond it
+CLUSTER_MAX_ZOOM = int(os.getenv('CLUSTER_MAX_ZOOM', 15))
+CLUSTER_CELL_PIXELS = int(os.getenv('CLUSTER_CELL_PIXELS', 64))
+
+# Production server (`python serve.py`)
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', 5000))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', os.cpu_count() or 1))  # worker processes
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))  # seconds to finish requests on stop/reload
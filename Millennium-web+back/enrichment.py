@@ -0,0 +1,132 @@
+"""Batched amenity enrichment for house listings"""
+from datetime import datetime
+from geo import calculate_distance
+from spatial_index import index_for
+from utils import fetch_pois_parallel, scoring_place_types, proximity_score
+
+# Amenities reported for every house: place type -> search radius in meters
+HOUSE_AMENITIES = {
+    'hospital': 3000,
+    'police': 3000,
+    'school': 2000,
+    'metro': 5000
+}
+
+# Houses further apart than this are fetched in separate groups, so a
+# catalogue spread over several cities doesn't turn into one huge query
+MAX_GROUP_RADIUS = 10000  # meters
+
+def box_radius(min_lat, max_lat, min_lon, max_lon):
+    """Get (lat, lon, radius_m) of the circle around a bounding box"""
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+    radius_km = max(calculate_distance(center_lat, center_lon, lat, lon)
+                    for lat in (min_lat, max_lat) for lon in (min_lon, max_lon))
+    return center_lat, center_lon, radius_km * 1000
+
+def group_houses(houses):
+    """Greedily split houses into groups whose bounding circles stay within MAX_GROUP_RADIUS
+
+    Returns (center_lat, center_lon, radius_m, houses) for each group.
+    """
+    groups = []  # [min_lat, max_lat, min_lon, max_lon, houses]
+    for house in houses:
+        lat, lon = house['latitude'], house['longitude']
+        for group in groups:
+            box = (min(group[0], lat), max(group[1], lat), min(group[2], lon), max(group[3], lon))
+            if box_radius(*box)[2] <= MAX_GROUP_RADIUS:
+                group[:4] = box
+                group[4].append(house)
+                break
+        else:
+            groups.append([lat, lat, lon, lon, [house]])
+    return [(*box_radius(*group[:4]), group[4]) for group in groups]
+
+# Amenities stored in each listing's profile: place type -> radius in meters.
+# Covers every scored type plus the amenities reported in search results
+PROFILE_RADII = {
+    **{place_type: config['radius'] for place_type, config in scoring_place_types({}).items()},
+    **HOUSE_AMENITIES
+}
+
+# Amenity entry of a type that wasn't found (or isn't in an older profile)
+NOT_FOUND = {'distance': None, 'name': None, 'count': 0}
+
+def nearest_within(places, lat, lon, radius):
+    """Get (distance_km, name, count) of the closest place within radius (meters)"""
+    found = index_for(places).within_indexes(lat, lon, radius / 1000)
+    if not found:
+        return None, None, 0
+    distance, index = min(found, key=lambda f: f[0])
+    return distance, places.name(index), len(found)
+
+def profile_fetches(houses):
+    """Get the (lat, lon, radius_m, houses) POI fetches that build the profiles of houses
+
+    Each place type is fetched once per group of nearby houses, covering the
+    group's bounding box plus the largest amenity radius.
+    """
+    fetch_radius = max(PROFILE_RADII.values())
+    return [(center_lat, center_lon, int(group_radius + fetch_radius), group)
+            for center_lat, center_lon, group_radius, group in group_houses(houses)]
+
+def build_profiles(houses):
+    """Compute the amenity profile of each house, or None where a fetch failed
+
+    POIs are fetched once per group of nearby houses (see profile_fetches)
+    and everything else is resolved locally. A failed fetch would look like
+    no amenities nearby, so its group gets no profiles.
+    """
+    results = {}
+    for center_lat, center_lon, radius, group in profile_fetches(houses):
+        failed = set()
+        cached_pois = fetch_pois_parallel(center_lat, center_lon, list(PROFILE_RADII), radius, failed)
+        if failed:
+            continue
+        for house in group:
+            lat, lon = house['latitude'], house['longitude']
+            amenities = {}
+            for place_type, radius in PROFILE_RADII.items():
+                distance, name, count = nearest_within(cached_pois[place_type], lat, lon, radius)
+                amenities[place_type] = {
+                    'distance': distance,
+                    'name': name,
+                    'count': count
+                }
+            results[id(house)] = {
+                'house_id': house['id'],
+                'latitude': lat,
+                'longitude': lon,
+                'computed_at': datetime.now().isoformat(),
+                'amenities': amenities
+            }
+    return [results.get(id(house)) for house in houses]
+
+def profile_score(profile, requirements):
+    """Score a house from its amenity profile, matching score_location"""
+    score = 0
+    max_score = 0
+    for place_type, config in scoring_place_types(requirements).items():
+        weight = config['weight']
+        if weight > 0:
+            max_score += weight * 10
+            # Profiles computed before a type was added don't have it yet
+            amenity = profile['amenities'].get(place_type) or NOT_FOUND
+            score += proximity_score(weight, amenity['distance'], config['radius'])
+    
+    # Normalize score to 0-100
+    if max_score > 0:
+        return round((score / max_score) * 100, 2)
+    return 0
+
+def profile_amenities(profile):
+    """Get the hospital, police, school and metro info shown for a house"""
+    amenities_info = {}
+    for place_type in HOUSE_AMENITIES:
+        amenity = profile['amenities'].get(place_type) or NOT_FOUND
+        distance = round(amenity['distance'], 2) if amenity['distance'] is not None else None
+        amenities_info[place_type] = {'distance': distance, 'count': amenity['count'], 'name': amenity['name']}
+    # Only the nearest station matters for metro
+    amenities_info['metro'] = {'distance': amenities_info['metro']['distance'],
+                               'name': amenities_info['metro']['name']}
+    return amenities_info
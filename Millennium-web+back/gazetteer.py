@@ -0,0 +1,344 @@
+"""Local gazetteer for address autocomplete and reverse geocoding
+
+Built from the listing addresses (plus their district and city centers), the
+metro stations and an optional OSM dump of places and streets, so lookups
+don't go to Nominatim. Download the dump from OpenStreetMap with:
+
+    python gazetteer.py fetch
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from config import GAZETTEER_FILE, GAZETTEER_REVERSE_RADIUS, AZERBAIJAN_BOUNDS, DEFAULT_LOCATION, METRO_AREA_RADIUS
+from aggregates import parse_location, area_key
+from metro import fold_name, get_metro_registry
+from osm import element_coordinates
+from poi_store import iter_json_elements, iter_osm_xml_elements
+from repository import get_house_repository
+from spatial_index import PlaceIndex
+
+# Result order: bigger and better known places first
+KIND_RANKS = {
+    'city': 0, 'town': 1, 'district': 2, 'suburb': 2, 'metro': 3, 'village': 4,
+    'neighbourhood': 5, 'quarter': 5, 'street': 6, 'address': 7, 'place': 8
+}
+# Reverse lookups name the closest detail (address, street, station) and
+# the closest locality ("..., Bakü")
+REVERSE_GROUPS = {
+    'detail': {'address', 'street', 'metro', 'neighbourhood', 'quarter'},
+    'locality': {'city', 'town', 'village', 'district', 'suburb'}
+}
+
+# Reverse lookups don't name a locality further away than this
+MAX_LOCALITY_DISTANCE = 30  # km
+
+# Trie depth; longer query words are matched by comparing the words themselves
+MAX_PREFIX_LENGTH = 12
+
+STREET_TAGS = {'primary', 'secondary', 'tertiary', 'residential', 'living_street', 'pedestrian', 'unclassified', 'trunk'}
+PLACE_TAGS = {'city', 'town', 'village', 'suburb', 'neighbourhood', 'quarter'}
+
+def fold_words(text):
+    """Split text into folded words ("Səbail Rayonu, Bakı" -> ['sebail', 'rayonu', 'baki'])"""
+    return re.sub(r'[^\w\s]', ' ', fold_name(text or '')).split()
+
+class TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []  # entries with a word starting here, best ranked first
+
+class GazetteerIndex:
+    """Named points with a prefix trie over their folded words and a spatial index
+
+    Entries are numbered in rank order, so each trie node's id list is
+    already sorted and a lookup stops after the first `limit` matches.
+    """
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda e: (KIND_RANKS.get(e['kind'], len(KIND_RANKS)),
+                                                      len(e['name']), e['name']))
+        self._words = [fold_words(f"{e['name']} {e.get('context', '')}") for e in self.entries]
+        self._root = TrieNode()
+        for entry_id, words in enumerate(self._words):
+            for word in set(words):
+                node = self._root
+                for char in word[:MAX_PREFIX_LENGTH]:
+                    node = node.children.setdefault(char, TrieNode())
+                    node.ids.append(entry_id)
+        self._spatial = {}  # reverse group -> (PlaceIndex, entries)
+        for group, kinds in REVERSE_GROUPS.items():
+            members = [e for e in self.entries if e['kind'] in kinds]
+            places = [{'geometry': {'location': {'lat': e['lat'], 'lng': e['lon']}}} for e in members]
+            self._spatial[group] = (PlaceIndex(places), members)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _lookup(self, word):
+        node = self._root
+        for char in word[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def search(self, query, limit):
+        """Get up to limit (entry_id, entry) pairs whose words start with every word of query"""
+        words = fold_words(query)
+        if not words:
+            return []
+        # Walk the shortest candidate list and keep the ids found for every other word
+        lists = sorted((self._lookup(word) for word in words), key=len)
+        others = [set(ids) for ids in lists[1:]]
+        # The trie stops at MAX_PREFIX_LENGTH, so longer words are checked in full
+        long_words = [word for word in words if len(word) > MAX_PREFIX_LENGTH]
+        results = []
+        seen = set()
+        for entry_id in lists[0]:
+            if entry_id in seen or not all(entry_id in ids for ids in others):
+                continue
+            seen.add(entry_id)
+            if long_words and not all(any(w.startswith(word) for w in self._words[entry_id]) for word in long_words):
+                continue
+            results.append((entry_id, self.entries[entry_id]))
+            if len(results) == limit:
+                break
+        return results
+
+    def nearest(self, lat, lon, group):
+        """Get (distance_km, entry) of the closest entry of a reverse group, or (None, None)"""
+        index, members = self._spatial[group]
+        distance, position = index.nearest_index(lat, lon)
+        if position is None:
+            return None, None
+        return distance, members[position]
+
+def entry(name, lat, lon, kind, source, context=''):
+    return {'name': name, 'lat': lat, 'lon': lon, 'kind': kind, 'source': source, 'context': context}
+
+def listing_entries(houses):
+    """Get an entry per listing address, plus district and city centers"""
+    entries = []
+    areas = {}  # (kind, key) -> [name, sum_lat, sum_lon, count]
+    for house in houses:
+        address = house.get('address')
+        if not address:
+            continue
+        entries.append(entry(address, house['latitude'], house['longitude'], 'address', 'listings'))
+        district, city = parse_location(address)
+        for kind, name in (('district', district), ('city', city)):
+            if name is None or (kind == 'district' and district == city):
+                continue
+            area = areas.setdefault((kind, area_key(name)), [name, 0.0, 0.0, 0])
+            area[1] += house['latitude']
+            area[2] += house['longitude']
+            area[3] += 1
+    for (kind, _), (name, sum_lat, sum_lon, count) in areas.items():
+        entries.append(entry(name, sum_lat / count, sum_lon / count, kind, 'listings'))
+    return entries
+
+def metro_entries(stations):
+    return [entry(s['name'], s['geometry']['location']['lat'], s['geometry']['location']['lng'],
+                  'metro', 'metro', 'metro') for s in stations]
+
+def is_gazetteer_way(tags):
+    """Check if a way is a named street or place"""
+    return bool(tags.get('name') or tags.get('name:az') or tags.get('name:en')) and (
+        tags.get('highway') in STREET_TAGS or tags.get('place') in PLACE_TAGS)
+
+def osm_entries(path):
+    """Get place and street entries from an OSM dump (Overpass JSON, GeoJSON or OSM XML)"""
+    if path.endswith(('.osm', '.xml')):
+        # Streets are ways, which the POI store's extract reader skips
+        elements = iter_osm_xml_elements(path, keep_way=is_gazetteer_way)
+    else:
+        elements = iter_json_elements(path)
+    entries = []
+    seen = set()
+    for element in elements:
+        tags = element.get('tags') or {}
+        name = tags.get('name') or tags.get('name:az') or tags.get('name:en')
+        lat, lon = element_coordinates(element)
+        if not name or lat is None or lon is None:
+            continue
+        if tags.get('place') in PLACE_TAGS:
+            kind = tags['place']
+        elif tags.get('highway') in STREET_TAGS:
+            kind = 'street'
+        else:
+            continue
+        # A street is split into many ways; keep one point per name and ~5km cell
+        key = (kind, fold_name(name), round(lat / 0.05), round(lon / 0.05))
+        if key in seen:
+            continue
+        seen.add(key)
+        # English names are searchable too, but the local name is shown
+        aliases = ' '.join(v for k, v in tags.items() if k in ('name:en', 'name:az', 'name:ru') and v != name)
+        entries.append(entry(name, lat, lon, kind, 'osm', aliases))
+    return entries
+
+def file_state(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+class Gazetteer:
+    """Listing, metro and OSM entries, rebuilt when their sources change
+
+    Listings change most often, so they get their own index and adding a
+    house doesn't rebuild the (much larger) OSM part.
+    """
+
+    def __init__(self, path=GAZETTEER_FILE, reverse_radius=GAZETTEER_REVERSE_RADIUS):
+        self.path = path
+        self.reverse_radius = reverse_radius
+        self._listings = GazetteerIndex([])
+        self._listings_version = None
+        self._base = GazetteerIndex([])
+        self._base_state = None
+        self._lock = threading.Lock()
+
+    def _indexes(self):
+        """Get the (base, listings) indexes, rebuilding any whose source changed"""
+        repository = get_house_repository()
+        registry = get_metro_registry()
+        version = repository.current_version()
+        base_state = (registry.current_revision(), file_state(self.path))
+        with self._lock:
+            if base_state != self._base_state:
+                entries = metro_entries(registry.stations)
+                if base_state[1] is not None:
+                    try:
+                        entries += osm_entries(self.path)
+                    except Exception as e:
+                        print(f"Error loading gazetteer file {self.path}: {e}")
+                self._base = GazetteerIndex(entries)
+                self._base_state = base_state
+            if version != self._listings_version:
+                self._listings = GazetteerIndex(listing_entries(repository.all()))
+                self._listings_version = version
+            return self._base, self._listings
+
+    def search(self, query, limit=10):
+        """Get up to limit places whose words start with the words of query, best first"""
+        found = []
+        for index in self._indexes():
+            found.extend(index.search(query, limit))
+        # Each index is in rank order; merge them and drop repeated names
+        found.sort(key=lambda f: (KIND_RANKS.get(f[1]['kind'], len(KIND_RANKS)), len(f[1]['name']), f[0]))
+        results = []
+        seen = set()
+        for _, item in found:
+            key = (item['kind'], fold_name(item['name']))
+            if key not in seen:
+                seen.add(key)
+                results.append(place_result(item))
+            if len(results) == limit:
+                break
+        return results
+
+    def reverse(self, lat, lon):
+        """Describe a point by the closest address, street or station and its locality
+
+        Returns None if nothing is known within the reverse radius or a locality.
+        """
+        indexes = self._indexes()
+        detail = min((index.nearest(lat, lon, 'detail') for index in indexes), key=closest_first)
+        locality = min((index.nearest(lat, lon, 'locality') for index in indexes), key=closest_first)
+        if detail[0] is not None and detail[0] > self.reverse_radius:
+            detail = (None, None)
+        if locality[0] is not None and locality[0] > MAX_LOCALITY_DISTANCE:
+            locality = (None, None)
+        if detail[1] is None and locality[1] is None:
+            return None
+
+        distance, item = detail if detail[1] is not None else locality
+        parts = [item['name']]
+        # Listing addresses already name their district and city
+        if item['kind'] != 'address' and locality[1] is not None and locality[1] is not item:
+            parts.append(locality[1]['name'])
+        return {
+            **place_result(item),
+            'display_name': ', '.join(parts),
+            'locality': locality[1]['name'] if locality[1] is not None else None,
+            'distance': round(distance, 3)
+        }
+
+def closest_first(found):
+    return found[0] if found[0] is not None else float('inf')
+
+def place_result(item):
+    """Convert an entry to the format used by the API"""
+    return {
+        'name': item['name'],
+        'display_name': item['name'],
+        'kind': item['kind'],
+        'latitude': item['lat'],
+        'longitude': item['lon'],
+        'source': item['source']
+    }
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Get the shared gazetteer"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+def fetch(path=GAZETTEER_FILE, street_radius=METRO_AREA_RADIUS):
+    """Download named places in Azerbaijan and streets around Baku from Overpass"""
+    from overpass_client import OverpassClient
+
+    bounds = AZERBAIJAN_BOUNDS
+    bbox = f"{bounds['min_lat']},{bounds['min_lon']},{bounds['max_lat']},{bounds['max_lon']}"
+    streets = '|'.join(sorted(STREET_TAGS))
+    query = (
+        f"[out:json][timeout:180];("
+        f"node[place~\"^({'|'.join(sorted(PLACE_TAGS))})$\"][name]({bbox});"
+        f"way[highway~\"^({streets})$\"][name]"
+        f"(around:{street_radius},{DEFAULT_LOCATION['lat']},{DEFAULT_LOCATION['lon']});"
+        f"); out center;"
+    )
+    # One large query; the live API's usual per-request timeout is far too short
+    data = OverpassClient(timeout=200).query(query)
+    elements = data.get('elements', [])
+    if not elements:
+        raise ValueError('Overpass returned no places')
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'elements': elements}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return len(elements)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the local gazetteer')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fetch_parser = subparsers.add_parser('fetch', help='Download places and streets from OpenStreetMap')
+    fetch_parser.add_argument('--file', default=GAZETTEER_FILE, help='Dump file to write')
+    fetch_parser.add_argument('--street-radius', type=int, default=METRO_AREA_RADIUS,
+                              help='Meters around Baku to include streets from')
+    args = parser.parse_args(argv)
+
+    try:
+        count = fetch(args.file, args.street_radius)
+    except Exception as e:
+        print(f"Error fetching gazetteer data: {e}")
+        return 1
+    print(f"Saved {count} places and streets to {args.file}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""Geographic helper functions"""
+import math
+
+EARTH_RADIUS_KM = 6371
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points using Haversine formula"""
+    R = EARTH_RADIUS_KM  # Earth radius in kilometers
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat/2) * math.sin(dlat/2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon/2) * math.sin(dlon/2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+def bounding_box(lat, lon, radius_km):
+    """Get (min_lat, max_lat, min_lon, max_lon) of a box enclosing a circle"""
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    # Widest longitude extent of a spherical cap
+    ratio = math.sin(angle) / max(math.cos(math.radians(lat)), 1e-9)
+    dlon = math.degrees(math.asin(ratio)) if ratio < 1 else 180
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
@@ -0,0 +1,23 @@
+"""gunicorn settings for production (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Settings come from the environment and .env like config.py. This file
+doesn't import config, so the master never holds a copy of it: on SIGHUP
+gunicorn rereads this file and forks new workers, which import the code
+and configuration afresh, while the old ones finish their requests.
+"""
+import os
+from dotenv import dotenv_values
+
+# The environment wins over .env, as with load_dotenv()
+settings = {**dotenv_values(), **os.environ}
+
+bind = f"{settings.get('SERVER_HOST', '0.0.0.0')}:{settings.get('SERVER_PORT', 5000)}"
+workers = int(settings.get('SERVER_WORKERS') or os.cpu_count() or 1)
+# Requests mostly wait on Overpass and SQLite, so each worker serves several at once
+worker_class = 'gthread'
+threads = int(settings.get('SERVER_THREADS', 8))
+graceful_timeout = float(settings.get('SERVER_GRACEFUL_TIMEOUT', 30))
+# Cold evaluations can wait on several Overpass queries
+timeout = 120
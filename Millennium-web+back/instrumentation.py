@@ -0,0 +1,175 @@
+"""Request timing breakdown (Server-Timing header) and Prometheus metrics"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from poi_cache import get_poi_cache
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Metric:
+    """Base of the metric types: a name, help text and label names"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return lines
+
+class Counter(Metric):
+    """Monotonic counter"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{self._label_text(k)} {v}' for k, v in sorted(values.items())]
+
+class Histogram(Metric):
+    """Cumulative histogram of observed values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        lines = []
+        for label_values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{self._label_text(label_values, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._label_text(label_values)} {counts[-1]}')
+            lines.append(f'{self.name}_count{self._label_text(label_values)} {cumulative}')
+        return lines
+
+class Gauge(Metric):
+    """Value read from a callback when metrics are scraped"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, callback):
+        super().__init__(name, help_text)
+        self.callback = callback
+
+    def samples(self):
+        return [f'{self.name} {self.callback()}']
+
+METRICS = []
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time spent handling requests',
+                            ('endpoint', 'method', 'status'))
+UPSTREAM_LATENCY = Histogram('overpass_fetch_duration_seconds', 'Time spent fetching POIs from Overpass',
+                             ('place_type',))
+POIS_PROCESSED = Counter('pois_processed_total', 'POIs served to requests, from any source', ('place_type',))
+Gauge('poi_cache_hit_ratio', 'Share of POI cache lookups answered from the cache',
+      lambda: get_poi_cache().stats()['hit_ratio'])
+
+@contextmanager
+def phase(name):
+    """Time a phase of the current request for its Server-Timing header
+
+    Outside a request (background jobs, CLI tools) this does nothing.
+    """
+    if not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault('phase_timings', {})
+        timings[name] = timings.get(name, 0) + time.perf_counter() - start
+
+@contextmanager
+def upstream_timer(place_types):
+    """Time an Overpass fetch: a request phase plus the upstream latency of each place type"""
+    start = time.perf_counter()
+    with phase('overpass'):
+        yield
+    elapsed = time.perf_counter() - start
+    for place_type in place_types:
+        UPSTREAM_LATENCY.observe(elapsed, place_type)
+
+def count_pois(cached_pois):
+    """Count the POIs of each type served, whether from Overpass, the cache, the POI store or the metro registry"""
+    for place_type, places in cached_pois.items():
+        POIS_PROCESSED.inc(len(places), place_type)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times serialization as the 'json' phase"""
+
+    def dumps(self, obj, **kwargs):
+        with phase('json'):
+            return super().dumps(obj, **kwargs)
+
+def render_metrics():
+    """Render every metric in the Prometheus text format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    """Time every request, add the Server-Timing header and record latency histograms"""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_timing(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        timings = g.get('phase_timings', {})
+        parts = [f'{name};dur={duration * 1000:.1f}' for name, duration in timings.items()]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(total, endpoint, request.method, str(response.status_code))
+        return response
@@ -0,0 +1,297 @@
+"""Precomputed per-type distance layers for instant scoring of any requirements
+
+The distance to the nearest place of each scored type doesn't depend on the
+user's weights, so it is rasterized once per configured area and stored as
+tiled .npy arrays. A requirement profile is then scored with a weighted sum
+over the layers. Build or rebuild the layers with:
+
+    python layers.py build
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import zlib
+from datetime import datetime
+import numpy as np
+from config import LAYERS_DIR, LAYER_AREAS, LAYER_RESOLUTION, LAYER_TILE_SIZE, LAYER_FETCH_CHUNK_KM
+from geo import calculate_distance
+from scoring import nearest_places, proximity_scores
+from utils import fetch_pois_parallel, scoring_place_types
+
+# Heatmap colors, matching the score bands used on the map
+SCORE_COLORS = [
+    (80, (0x00, 0xff, 0x00)),  # Green
+    (60, (0x90, 0xee, 0x90)),  # Light green
+    (40, (0xff, 0xff, 0x00)),  # Yellow
+    (20, (0xff, 0xa5, 0x00)),  # Orange
+    (0, (0xff, 0x00, 0x00))  # Red
+]
+HEATMAP_ALPHA = 110
+TILE_PIXELS = 256
+
+class LayerArea:
+    """Distance rasters of one area; row 0 is the southern edge"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.name = meta['name']
+        self.bounds = meta['bounds']
+        self.resolution = meta['resolution']
+        self.rows = meta['rows']
+        self.cols = meta['cols']
+        self.tile_size = meta['tile_size']
+        self.types = meta['types']
+        self.computed_at = meta['computed_at']
+        self._tiles = {}
+        self._lock = threading.Lock()
+
+    def covers(self, lat, lon):
+        """Check if a point is inside the area"""
+        return (self.bounds['min_lat'] <= lat <= self.bounds['max_lat'] and
+                self.bounds['min_lon'] <= lon <= self.bounds['max_lon'])
+
+    def _tile(self, place_type, tile_row, tile_col):
+        key = (place_type, tile_row, tile_col)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                tile = np.load(os.path.join(self.path, place_type, f'{tile_row}_{tile_col}.npy'), mmap_mode='r')
+                self._tiles[key] = tile
+            return tile
+
+    def cells(self, lats, lons):
+        """Get the raster (row, col) of points and a mask of those inside the area"""
+        rows = np.rint((lats - self.bounds['min_lat']) / self.resolution).astype(np.int64)
+        cols = np.rint((lons - self.bounds['min_lon']) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return rows, cols, inside
+
+    def distances(self, place_type, rows, cols, inside):
+        """Get the nearest-place distance (km) at raster cells; inf outside the area"""
+        result = np.full(len(rows), np.inf)
+        tile_rows = rows // self.tile_size
+        tile_cols = cols // self.tile_size
+        for tile_row, tile_col in set(zip(tile_rows[inside].tolist(), tile_cols[inside].tolist())):
+            in_tile = inside & (tile_rows == tile_row) & (tile_cols == tile_col)
+            tile = self._tile(place_type, tile_row, tile_col)
+            result[in_tile] = tile[rows[in_tile] - tile_row * self.tile_size,
+                                   cols[in_tile] - tile_col * self.tile_size]
+        return result
+
+class LayerStore:
+    """The layers of every built area"""
+
+    def __init__(self, root=LAYERS_DIR):
+        self.root = root
+        self.areas = []
+        for name in LAYER_AREAS:
+            path = os.path.join(root, name)
+            try:
+                with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                    self.areas.append(LayerArea(path, json.load(f)))
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Error loading score layers for {name}: {e}")
+
+    def area_for(self, lat, lon):
+        """Get the built area containing a point, or None"""
+        for area in self.areas:
+            if area.covers(lat, lon):
+                return area
+        return None
+
+    def score_array(self, lats, lons, requirements):
+        """Score points from the layers; returns (scores, distances by type, covered mask)"""
+        scores = np.zeros(len(lats))
+        covered = np.zeros(len(lats), dtype=bool)
+        distances = {}
+        max_score = 0
+        place_types = scoring_place_types(requirements)
+        for config in place_types.values():
+            if config['weight'] > 0:
+                max_score += config['weight'] * 10
+
+        for area in self.areas:
+            rows, cols, inside = area.cells(lats, lons)
+            inside &= ~covered
+            if not inside.any():
+                continue
+            covered |= inside
+            for place_type, config in place_types.items():
+                if config['weight'] <= 0:
+                    continue
+                area_distances = area.distances(place_type, rows, cols, inside)
+                distances.setdefault(place_type, np.full(len(lats), np.inf))[inside] = area_distances[inside]
+                scores[inside] += proximity_scores(config['weight'], area_distances[inside], config['radius'])
+
+        if max_score > 0:
+            scores = (scores / max_score) * 100
+        return scores, distances, covered
+
+    def score_points(self, points, requirements):
+        """Score (lat, lon) points like evaluate_locations, or None if the layers don't cover them all
+
+        Amenities only carry the distance; names and counts aren't stored in the layers.
+        """
+        lats = np.array([p[0] for p in points], dtype=np.float64)
+        lons = np.array([p[1] for p in points], dtype=np.float64)
+        scores, distances, covered = self.score_array(lats, lons, requirements)
+        if not covered.all():
+            return None
+
+        locations = []
+        for i, (lat, lon) in enumerate(points):
+            amenities = {}
+            for place_type, type_distances in distances.items():
+                distance = type_distances[i]
+                amenities[place_type] = {
+                    'distance': round(float(distance), 2) if math.isfinite(distance) else None,
+                    'name': None,
+                    'count': None
+                }
+            locations.append({'lat': lat, 'lon': lon, 'score': round(float(scores[i]), 2), 'amenities': amenities})
+        return locations
+
+    def heatmap_tile(self, z, x, y, requirements):
+        """Render a z/x/y web map tile of scores as PNG bytes; uncovered pixels are transparent"""
+        pixels = (np.arange(TILE_PIXELS) + 0.5) / TILE_PIXELS
+        n = 2 ** z
+        lons = (x + pixels) / n * 360 - 180
+        lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixels) / n))))
+        grid_lats = np.repeat(lats, TILE_PIXELS)
+        grid_lons = np.tile(lons, TILE_PIXELS)
+
+        rgba = np.zeros((TILE_PIXELS * TILE_PIXELS, 4), dtype=np.uint8)
+        scores, _, covered = self.score_array(grid_lats, grid_lons, requirements)
+        assigned = ~covered
+        for threshold, color in SCORE_COLORS:
+            band = ~assigned & (scores >= threshold)
+            rgba[band] = (*color, HEATMAP_ALPHA)
+            assigned |= band
+        return encode_png(rgba.reshape(TILE_PIXELS, TILE_PIXELS, 4))
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+def encode_png(rgba):
+    """Encode an (height, width, 4) uint8 array as an RGBA PNG"""
+    height, width = rgba.shape[:2]
+    # Each scanline starts with filter type 0 (none)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)]).tobytes()
+    return (b'\x89PNG\r\n\x1a\n' +
+            png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) +
+            png_chunk(b'IDAT', zlib.compress(raw, 6)) +
+            png_chunk(b'IEND', b''))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_layer_store():
+    """Get the shared layer store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LayerStore()
+    return _store
+
+def raster_distances(bounds, rows, cols, resolution, chunk_km=LAYER_FETCH_CHUNK_KM):
+    """Get each scored type's nearest-place distance (km) over the raster
+
+    POIs are fetched for squares of about chunk_km at a time, so no single
+    Overpass query covers the whole area. Distances beyond a type's scoring
+    radius are stored as inf (nothing in range). Returns ({place_type: 2D
+    array}, {place_type: distinct places found}); raises RuntimeError if any fetch
+    failed, since the gaps would look like areas without amenities.
+    """
+    place_types = scoring_place_types({})
+    max_radius = max(config['radius'] for config in place_types.values())
+    chunk = max(1, int(chunk_km / (resolution * 111.32)))
+    distances = {place_type: np.full((rows, cols), np.inf, dtype=np.float32) for place_type in place_types}
+    found = {place_type: set() for place_type in place_types}  # place coordinates
+    failed = set()
+    chunks = [(row, col) for row in range(0, rows, chunk) for col in range(0, cols, chunk)]
+    for position, (row, col) in enumerate(chunks, 1):
+        row_indexes = np.arange(row, min(rows, row + chunk))
+        col_indexes = np.arange(col, min(cols, col + chunk))
+        lats = np.repeat(bounds['min_lat'] + row_indexes * resolution, len(col_indexes))
+        lons = np.tile(bounds['min_lon'] + col_indexes * resolution, len(row_indexes))
+        # Every place within the largest radius of some cell in the chunk
+        center_lat, center_lon = float(lats.mean()), float(lons.mean())
+        corner_km = calculate_distance(center_lat, center_lon, float(lats.max()), float(lons.max()))
+        radius = int(corner_km * 1000 + max_radius)
+        cached_pois = fetch_pois_parallel(center_lat, center_lon, list(place_types), radius, failed)
+        if failed:
+            raise RuntimeError(f"Could not fetch {', '.join(sorted(failed))} from Overpass")
+        for place_type, config in place_types.items():
+            places = cached_pois[place_type]
+            found[place_type].update(zip(places.lats.tolist(), places.lons.tolist()))
+            if not places:
+                continue
+            chunk_distances, _ = nearest_places(lats, lons, places)
+            chunk_distances[chunk_distances > config['radius'] / 1000] = np.inf
+            distances[place_type][row:row + len(row_indexes), col:col + len(col_indexes)] = \
+                chunk_distances.reshape(len(row_indexes), len(col_indexes))
+        print(f"  [{position}/{len(chunks)}] {sum(len(p) for p in cached_pois.values())} POIs")
+    return distances, {place_type: len(places) for place_type, places in found.items()}
+
+def build_area(name, bounds, root=LAYERS_DIR, resolution=LAYER_RESOLUTION, tile_size=LAYER_TILE_SIZE):
+    """Rasterize the nearest-place distance of every scored type over an area
+
+    Nothing is written unless every fetch worked, so a failed build leaves
+    the previous layers in place.
+    """
+    rows = int(round((bounds['max_lat'] - bounds['min_lat']) / resolution)) + 1
+    cols = int(round((bounds['max_lon'] - bounds['min_lon']) / resolution)) + 1
+    print(f"Fetching POIs for {name} ({rows}x{cols} cells)...")
+    distances, counts = raster_distances(bounds, rows, cols, resolution)
+
+    path = os.path.join(root, name)
+    for place_type, type_distances in distances.items():
+        os.makedirs(os.path.join(path, place_type), exist_ok=True)
+        for tile_row in range(math.ceil(rows / tile_size)):
+            for tile_col in range(math.ceil(cols / tile_size)):
+                tile = type_distances[tile_row * tile_size:(tile_row + 1) * tile_size,
+                                      tile_col * tile_size:(tile_col + 1) * tile_size]
+                np.save(os.path.join(path, place_type, f'{tile_row}_{tile_col}.npy'), tile)
+        print(f"  {place_type}: {counts[place_type]} places")
+
+    meta = {
+        'name': name,
+        'bounds': bounds,
+        'resolution': resolution,
+        'rows': rows,
+        'cols': cols,
+        'tile_size': tile_size,
+        'types': counts,
+        'computed_at': datetime.now().isoformat()
+    }
+    tmp_path = os.path.join(path, 'meta.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, 'meta.json'))
+    return meta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage precomputed score layers')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Rasterize the configured areas')
+    build_parser.add_argument('--area', action='append', choices=sorted(LAYER_AREAS),
+                              help='Area to build (default: all)')
+    args = parser.parse_args(argv)
+
+    for name in args.area or LAYER_AREAS:
+        try:
+            build_area(name, LAYER_AREAS[name])
+        except Exception as e:
+            print(f"Error building score layers for {name}, keeping the previous ones: {e}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
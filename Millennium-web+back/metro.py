@@ -0,0 +1,193 @@
+"""Baku metro station registry, loaded from a bundled data file
+
+The metro network is small and rarely changes, so stations are not fetched
+per request. Update the bundled list from OpenStreetMap with:
+
+    python metro.py refresh
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import unicodedata
+from datetime import date
+from config import METRO_STATIONS_FILE, METRO_AREA_RADIUS, DEFAULT_LOCATION
+from spatial_index import PlaceIndex
+
+# Azerbaijani letters without a decomposed form in Unicode
+FOLD_TABLE = str.maketrans({'ə': 'e', 'ı': 'i', '-': ' '})
+
+# Words dropped from names like "Sahil Metro Station"
+STATION_WORDS = {'metro', 'station', 'subway', 'stansiyasi'}
+
+def fold_name(name):
+    """Fold a station name to lowercase ASCII-ish form for lookups"""
+    name = name.replace('İ', 'i').replace('Ə', 'ə').lower().translate(FOLD_TABLE)
+    name = ''.join(c for c in unicodedata.normalize('NFKD', name) if not unicodedata.combining(c))
+    return ' '.join(name.split())
+
+def station_place(station):
+    """Convert a registry station to the place format used by the API"""
+    return {
+        'geometry': {
+            'location': {
+                'lat': station['lat'],
+                'lng': station['lon']
+            }
+        },
+        'name': station['name'],
+        'tags': {'railway': 'station', 'station': 'subway', 'name': station['name']}
+    }
+
+class MetroRegistry:
+    """Metro stations with a folded-name alias index and a nearest-station index"""
+
+    def __init__(self, path=METRO_STATIONS_FILE):
+        self.path = path
+        self.version = None
+        self.source = None
+        self.revision = 0  # increases whenever the file is reloaded with changes
+        self._file_state = None
+        self._lock = threading.Lock()
+        self.stations = []  # places in the API format
+        self._aliases = {}  # folded name -> station name
+        self._index = PlaceIndex([])
+        self.load()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def load(self):
+        """(Re)load the stations file"""
+        state = self._stat()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            print(f"Metro stations file {self.path} not found")
+            return
+        except Exception as e:
+            print(f"Error loading metro stations: {e}")
+            return
+
+        aliases = {fold_name(alias): name for alias, name in data.get('aliases', {}).items()}
+        for station in data['stations']:
+            for alias in [station['name'], *station.get('aliases', [])]:
+                aliases[fold_name(alias)] = station['name']
+        stations = [station_place(station) for station in data['stations']]
+
+        self._aliases = aliases
+        self._index = PlaceIndex(stations)
+        self.stations = stations
+        self.version = data.get('version')
+        self.source = data.get('source')
+        self._file_state = state
+        # The file's mtime, kept increasing even if it moved back
+        self.revision = max(self.revision + 1, state[0]) if state else self.revision + 1
+
+    def current_revision(self):
+        """Reload the stations if the file changed on disk, then get the data revision"""
+        with self._lock:
+            if self._stat() != self._file_state:
+                self.load()
+            return self.revision
+
+    def normalize(self, name):
+        """Get the canonical name of a station, or the name itself if it's unknown"""
+        if not name:
+            return name
+        key = fold_name(name)
+        canonical = self._aliases.get(key)
+        if canonical is None:
+            # "Sahil Metro Station" -> "Sahil"
+            stripped = ' '.join(word for word in key.split() if word not in STATION_WORDS)
+            canonical = self._aliases.get(stripped)
+        return canonical or name
+
+    def nearest(self, lat, lon):
+        """Get (distance_km, station) of the closest station, or (None, None)"""
+        return self._index.nearest(lat, lon)
+
+    def within(self, lat, lon, radius_km):
+        """Get the stations within radius_km, in registry order"""
+        return [station for _, station in self._index.within(lat, lon, radius_km)]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_metro_registry():
+    """Get the shared metro registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetroRegistry()
+    return _registry
+
+def refresh(path=METRO_STATIONS_FILE):
+    """Fetch the stations from Overpass and rewrite the stations file
+
+    Aliases and lines of stations already in the file are kept.
+    """
+    # utils normalizes station names through this module, so import it late
+    from utils import build_overpass_query, parse_overpass_elements
+    from overpass_client import get_overpass_client
+
+    query = build_overpass_query(DEFAULT_LOCATION['lat'], DEFAULT_LOCATION['lon'], 'metro', METRO_AREA_RADIUS)
+    places = parse_overpass_elements(get_overpass_client().query(query).get('elements', []), 'metro').to_places()
+    if not places:
+        raise ValueError('Overpass returned no metro stations')
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    except FileNotFoundError:
+        current = {'stations': []}
+    known = {station['name']: station for station in current['stations']}
+
+    stations = []
+    for place in places:
+        name = place['name']
+        station = {
+            'name': name,
+            'lat': round(place['geometry']['location']['lat'], 6),
+            'lon': round(place['geometry']['location']['lng'], 6)
+        }
+        if name in known:
+            station.update({k: v for k, v in known[name].items() if k not in station})
+        stations.append(station)
+
+    data = {
+        'version': date.today().isoformat(),
+        'source': 'overpass',
+        'stations': stations,
+        'aliases': current.get('aliases', {})
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return stations
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the bundled metro station list')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = subparsers.add_parser('refresh', help='Update the stations from OpenStreetMap')
+    refresh_parser.add_argument('--file', default=METRO_STATIONS_FILE, help='Stations file to write')
+    args = parser.parse_args(argv)
+
+    try:
+        stations = refresh(args.file)
+    except Exception as e:
+        print(f"Error refreshing metro stations: {e}")
+        return 1
+    print(f"Saved {len(stations)} metro stations to {args.file}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
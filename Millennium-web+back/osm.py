@@ -0,0 +1,52 @@
+"""OpenStreetMap tag mappings and element helpers"""
+
+# Map place types to OpenStreetMap tag queries
+OSM_QUERIES = {
+    'school': [('amenity', 'school')],
+    'hospital': [('amenity', 'hospital')],
+    'supermarket': [('shop', 'supermarket')],
+    'market': [('shop', 'supermarket'), ('amenity', 'marketplace')],
+    'cafe': [('amenity', 'cafe')],
+    'restaurant': [('amenity', 'restaurant')],
+    'park': [('leisure', 'park')],
+    'gym': [('leisure', 'fitness_centre'), ('sport', 'gym')],
+    'pharmacy': [('amenity', 'pharmacy')],
+    'metro': [('railway', 'station'), ('station', 'subway'), ('public_transport', 'station')],
+    'police': [('amenity', 'police')]
+}
+
+def tag_queries_for(place_type):
+    """Get the OSM tag queries for a place type (unknown types fall back to schools)"""
+    return OSM_QUERIES.get(place_type, [('amenity', 'school')])
+
+def matches_place_type(tags, place_type):
+    """Check if an element's tags match what the Overpass query for a place type selects"""
+    if place_type == 'metro':
+        # Metro queries only select subway stations
+        return tags.get('station') == 'subway' and (
+            tags.get('railway') == 'station' or tags.get('public_transport') == 'station')
+    return any(tags.get(key) == value for key, value in tag_queries_for(place_type))
+
+def place_types_for_element(element):
+    """List the place types an element belongs to, mirroring the Overpass queries
+
+    Only metro queries include ways; every other type is queried as nodes only.
+    """
+    tags = element.get('tags', {})
+    if not tags:
+        return []
+    types = []
+    for place_type in OSM_QUERIES:
+        if element.get('type') != 'node' and place_type != 'metro':
+            continue
+        if matches_place_type(tags, place_type):
+            types.append(place_type)
+    return types
+
+def element_coordinates(element):
+    """Get (lat, lon) of an Overpass element, using the center for ways and relations"""
+    if element.get('type') == 'node':
+        return element.get('lat'), element.get('lon')
+    if element.get('type') in ('way', 'relation') and 'center' in element:
+        return element['center'].get('lat'), element['center'].get('lon')
+    return None, None
@@ -0,0 +1,147 @@
+"""Shared Overpass API client with connection pooling, mirror failover and hedged requests"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    OVERPASS_ENDPOINTS, OVERPASS_TIMEOUT, OVERPASS_POOL_SIZE,
+    OVERPASS_HEDGE_AFTER, OVERPASS_COOLDOWN
+)
+
+# Hedge once this many latency samples give a meaningful p95
+MIN_LATENCY_SAMPLES = 20
+
+class OverpassClient:
+    """Sends Overpass queries over pooled keep-alive connections
+
+    Each query goes to the healthiest mirror first. If it fails, the next
+    mirror is tried right away; if it's slower than the recent p95 latency,
+    a duplicate (hedged) request goes to the next mirror and whichever
+    answers first wins.
+    """
+
+    def __init__(self, endpoints=OVERPASS_ENDPOINTS, timeout=OVERPASS_TIMEOUT,
+                 pool_size=OVERPASS_POOL_SIZE, hedge_after=OVERPASS_HEDGE_AFTER,
+                 cooldown=OVERPASS_COOLDOWN):
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.cooldown = cooldown
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='overpass')
+        self._latencies = deque(maxlen=200)
+        self._down_until = {}
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'failures': 0, 'hedged': 0, 'failovers': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging: the p95 of recent latencies"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.hedge_after
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _ordered_endpoints(self):
+        """Endpoints in configured order, with recently failed ones last"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self.endpoints if self._down_until.get(e, 0) <= now]
+            down = sorted((e for e in self.endpoints if e not in healthy), key=lambda e: self._down_until[e])
+        return healthy + down
+
+    def _post(self, endpoint, query, timeout, hedge):
+        self._count('requests')
+        start = time.perf_counter()
+        try:
+            response = self.session.post(endpoint, data={'data': query}, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self._count('failures')
+            with self._lock:
+                self._down_until[endpoint] = time.monotonic() + self.cooldown
+            raise
+        with self._lock:
+            # Only hedged queries' latencies set the hedging delay
+            if hedge:
+                self._latencies.append(time.perf_counter() - start)
+            self._down_until.pop(endpoint, None)
+        return data
+
+    async def query_async(self, query, timeout=None, hedge=True):
+        """Run one Overpass query and return the decoded JSON response
+
+        timeout (seconds) overrides the client's for queries the server may
+        work on longer; with hedge off a slow query is left to finish.
+        """
+        loop = asyncio.get_running_loop()
+        endpoints = self._ordered_endpoints()
+        pending = set()
+        last_error = None
+        timeout = timeout or self.timeout
+
+        def launch():
+            pending.add(loop.run_in_executor(self._executor, self._post, endpoints.pop(0), query, timeout, hedge))
+
+        launch()
+        while pending:
+            wait_for = self.hedge_delay() if endpoints and hedge else None
+            done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Slower than usual - race a duplicate request on the next mirror
+                self._count('hedged')
+                launch()
+                continue
+            for future in done:
+                if future.exception() is None:
+                    # Requests still in flight finish in the pool; their results are dropped
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                last_error = future.exception()
+            if not pending and endpoints:
+                self._count('failovers')
+                launch()
+        raise last_error
+
+    async def query_many_async(self, queries):
+        """Run queries concurrently; failed ones come back as their exception"""
+        return await asyncio.gather(*(self.query_async(q) for q in queries), return_exceptions=True)
+
+    def query(self, query, timeout=None, hedge=True):
+        """Blocking wrapper around query_async"""
+        return asyncio.run(self.query_async(query, timeout, hedge))
+
+    def query_many(self, queries):
+        """Blocking wrapper around query_many_async"""
+        return asyncio.run(self.query_many_async(queries))
+
+    def stats(self):
+        """Get request counters and the current hedging delay"""
+        with self._lock:
+            stats = dict(self.counters)
+        stats['hedge_delay'] = round(self.hedge_delay(), 3)
+        return stats
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_overpass_client():
+    """Get the shared Overpass client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OverpassClient()
+    return _client
@@ -0,0 +1,81 @@
+"""Cursor-based pagination helpers"""
+import base64
+import hashlib
+import heapq
+import json
+import threading
+from collections import OrderedDict
+
+def encode_cursor(data):
+    """Encode cursor data as an opaque URL-safe string"""
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+# Cursor field types; bool is excluded explicitly since it's an int subclass
+NUMBER = (int, float)
+
+def decode_cursor(cursor, fields):
+    """Decode a cursor made by encode_cursor, raising ValueError if it's malformed
+
+    fields maps each key the cursor must have to its allowed type(s).
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(data, dict):
+        raise ValueError('Invalid cursor')
+    for name, types in fields.items():
+        value = data.get(name)
+        if not isinstance(value, types) or isinstance(value, bool):
+            raise ValueError('Invalid cursor')
+    return data
+
+def parse_limit(value):
+    """Parse a page size parameter; None means no limit"""
+    if value is None or value == '':
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return limit
+
+def query_signature(*parts):
+    """Get a short stable hash of query parameters"""
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+def top_k(items, limit, key, after=None):
+    """Get the first `limit` items ordered by key, starting after a key
+
+    Uses a bounded heap, so only the page is sorted. Returns (page, has_more).
+    """
+    if after is not None:
+        items = (item for item in items if key(item) > after)
+    if limit is None:
+        return sorted(items, key=key), False
+    page = heapq.nsmallest(limit + 1, items, key=key)
+    return page[:limit], len(page) > limit
+
+class RankingCache:
+    """Small LRU of scored candidate lists, so later pages don't rescore"""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
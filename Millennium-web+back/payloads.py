@@ -0,0 +1,107 @@
+"""Compact columnar response payloads and compression negotiation"""
+import gzip
+from flask import jsonify, request
+
+# Brotli is optional: pip install Brotli
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+COORDINATE_DECIMALS = 6  # about 0.1m
+
+# Place types sent under another name too; compact payloads list them once
+PLACE_ALIASES = {'market': 'supermarket'}
+
+class NameTable:
+    """Shared table of strings, referenced by index"""
+
+    def __init__(self):
+        self.names = []
+        self._indexes = {}
+
+    def index(self, name):
+        if name is None:
+            return None
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+def compact_places(places_by_type, include_tags=False):
+    """Convert {type: PoiCollection} to columnar arrays per type with a shared name table"""
+    names = NameTable()
+    types = {}
+    aliases = {}
+    for place_type, places in places_by_type.items():
+        target = PLACE_ALIASES.get(place_type)
+        if target is not None and places_by_type.get(target) is places:
+            aliases[place_type] = target
+            continue
+        # The collection's own name table maps onto the shared one
+        name_indexes = [names.index(name) for name in places.names]
+        columns = {
+            'lat': [round(lat, COORDINATE_DECIMALS) for lat in places.lats.tolist()],
+            'lng': [round(lon, COORDINATE_DECIMALS) for lon in places.lons.tolist()],
+            'name': [name_indexes[i] for i in places.name_ids.tolist()]
+        }
+        if include_tags:
+            columns['tags'] = [places.tags(i) for i in range(len(places))]
+        types[place_type] = columns
+    return {'format': 'compact', 'names': names.names, 'places': types, 'aliases': aliases}
+
+def compact_locations(locations):
+    """Convert scored locations to columnar arrays, with amenities as columns per type"""
+    names = NameTable()
+    columns = {'lat': [], 'lon': [], 'score': []}
+    extra = [key for key in ('size', 'depth') if locations and key in locations[0]]
+    for key in extra:
+        columns[key] = []
+    amenities = {}
+    for location in locations:
+        for key in columns:
+            columns[key].append(location[key])
+        for place_type, amenity in location['amenities'].items():
+            column = amenities.setdefault(place_type, {'distance': [], 'name': [], 'count': []})
+            column['distance'].append(amenity['distance'])
+            column['name'].append(names.index(amenity['name']))
+            column['count'].append(amenity['count'])
+    # Counts are the same for every cell when they come from one fetch
+    for column in amenities.values():
+        if len(set(column['count'])) == 1:
+            column['count'] = column['count'][0]
+    return {'format': 'compact', 'names': names.names, 'locations': columns, 'amenities': amenities}
+
+def accepted_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def compressed_json(payload, status=200):
+    """JSON response, compressed with brotli or gzip if the client accepts it"""
+    response = jsonify(payload)
+    response.status_code = status
+    response.vary.add('Accept-Encoding')
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''))
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return response
+    response.set_data(brotli.compress(body) if encoding == 'br' else gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,255 @@
+"""Two-tier cache for Overpass responses: an in-process LRU plus a SQLite file that survives restarts
+
+The SQLite file is in WAL mode, so server worker processes share it: a result
+fetched by one worker is a disk hit for the others.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    POI_CACHE_FILE, POI_CACHE_TTL, POI_CACHE_GRID,
+    POI_CACHE_MEMORY_ENTRIES, POI_CACHE_MAX_DISK_MB
+)
+from geo import calculate_distance, bounding_box
+from poi_collection import PoiCollection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    place_type TEXT NOT NULL,
+    radius INTEGER NOT NULL,
+    lat_key INTEGER NOT NULL,
+    lon_key INTEGER NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    places TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (place_type, radius, lat_key, lon_key)
+);
+CREATE INDEX IF NOT EXISTS entries_lookup ON entries (place_type, lat, lon);
+"""
+
+class PoiCache:
+    """Cache of nearby-place results keyed by (place_type, radius, lat/lon snapped to a grid)
+
+    A query whose circle lies inside a cached larger-radius result is served by
+    filtering that result instead of going upstream. Places are PoiCollections.
+    """
+
+    def __init__(self, path=POI_CACHE_FILE, ttl=POI_CACHE_TTL, grid=POI_CACHE_GRID,
+                 memory_entries=POI_CACHE_MEMORY_ENTRIES, max_disk_mb=POI_CACHE_MAX_DISK_MB):
+        self.path = path
+        self.ttl = ttl
+        self.grid = grid
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._memory = OrderedDict()  # key -> (lat, lon, places, expires_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'superset_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+            'expired': 0
+        }
+        if self.path:
+            conn = self._connection()
+            # Readers in other processes don't block on a writer (and vice versa)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # SQLite connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            # A lost cache write after a power failure is harmless; skip the fsync per commit
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _key(self, place_type, lat, lon, radius):
+        return (place_type, int(radius), round(lat / self.grid), round(lon / self.grid))
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def get(self, place_type, lat, lon, radius):
+        """Get cached places for a query, or None on a miss"""
+        key = self._key(place_type, lat, lon, radius)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[3] > now:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return entry[2]
+                del self._memory[key]
+                self.counters['expired'] += 1
+
+        places = self._get_disk(key, now)
+        if places is not None:
+            self._count('disk_hits')
+            self._put_memory(key, lat, lon, places, now + self.ttl)
+            return places
+
+        places = self._get_superset(place_type, lat, lon, radius, now)
+        if places is not None:
+            self._count('superset_hits')
+            self._put_memory(key, lat, lon, places, now + self.ttl)
+            return places
+
+        self._count('misses')
+        return None
+
+    def _get_disk(self, key, now):
+        if not self.path:
+            return None
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT places, expires_at FROM entries '
+                'WHERE place_type = ? AND radius = ? AND lat_key = ? AND lon_key = ?', key
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                with conn:
+                    conn.execute('DELETE FROM entries WHERE place_type = ? AND radius = ? '
+                                 'AND lat_key = ? AND lon_key = ?', key)
+                self._count('expired')
+                return None
+            with conn:
+                conn.execute('UPDATE entries SET last_access = ? WHERE place_type = ? AND radius = ? '
+                             'AND lat_key = ? AND lon_key = ?', (now, *key))
+            return PoiCollection.from_json(row[0], key[0])
+        except sqlite3.Error as e:
+            print(f"Error reading POI cache: {e}")
+            return None
+
+    def _get_superset(self, place_type, lat, lon, radius, now):
+        """Find a cached larger circle containing the query circle and filter it"""
+        radius_km = radius / 1000
+
+        def contains(entry_lat, entry_lon, entry_radius):
+            return calculate_distance(lat, lon, entry_lat, entry_lon) + radius_km <= entry_radius / 1000
+
+        with self._lock:
+            candidates = [
+                (key[1], entry_lat, entry_lon, places)
+                for key, (entry_lat, entry_lon, places, expires_at) in self._memory.items()
+                if key[0] == place_type and key[1] > radius and expires_at > now
+            ]
+        for entry_radius, entry_lat, entry_lon, places in sorted(candidates, key=lambda c: c[0]):
+            if contains(entry_lat, entry_lon, entry_radius):
+                return places.within_radius(lat, lon, radius_km)
+
+        if not self.path:
+            return None
+        try:
+            # A containing circle's center is at most its radius away; bound the search
+            # by the largest cached radius for this type
+            conn = self._connection()
+            row = conn.execute('SELECT MAX(radius) FROM entries WHERE place_type = ? AND radius > ?',
+                               (place_type, radius)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, row[0] / 1000)
+            rows = conn.execute(
+                'SELECT lat, lon, radius, places FROM entries WHERE place_type = ? AND radius > ? '
+                'AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ? AND expires_at > ? ORDER BY radius',
+                (place_type, radius, min_lat, max_lat, min_lon, max_lon, now)
+            ).fetchall()
+            for entry_lat, entry_lon, entry_radius, places in rows:
+                if contains(entry_lat, entry_lon, entry_radius):
+                    return PoiCollection.from_json(places, place_type).within_radius(lat, lon, radius_km)
+        except sqlite3.Error as e:
+            print(f"Error reading POI cache: {e}")
+        return None
+
+    def put(self, place_type, lat, lon, radius, places):
+        """Store the places fetched for a query in both tiers"""
+        key = self._key(place_type, lat, lon, radius)
+        now = time.time()
+        expires_at = now + self.ttl
+        self._put_memory(key, lat, lon, places, expires_at)
+
+        if not self.path:
+            return
+        payload = places.to_json()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (*key, lat, lon, payload, len(payload), expires_at, now))
+            self._evict_disk(now)
+        except sqlite3.Error as e:
+            print(f"Error writing POI cache: {e}")
+
+    def _put_memory(self, key, lat, lon, places, expires_at):
+        with self._lock:
+            self._memory[key] = (lat, lon, places, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                self.counters['memory_evictions'] += 1
+
+    def _evict_disk(self, now):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        conn = self._connection()
+        with conn:
+            expired = conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,)).rowcount
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            evicted = 0
+            if total > self.max_disk_bytes:
+                rows = conn.execute('SELECT rowid, size FROM entries ORDER BY last_access').fetchall()
+                for rowid, size in rows:
+                    if total <= self.max_disk_bytes:
+                        break
+                    conn.execute('DELETE FROM entries WHERE rowid = ?', (rowid,))
+                    total -= size
+                    evicted += 1
+        with self._lock:
+            self.counters['expired'] += expired
+            self.counters['disk_evictions'] += evicted
+
+    def stats(self):
+        """Get hit/miss/eviction counters and the current size of each tier"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['superset_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0
+        if self.path:
+            try:
+                row = self._connection().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+                stats['disk_entries'], stats['disk_bytes'] = row
+            except sqlite3.Error as e:
+                print(f"Error reading POI cache: {e}")
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_poi_cache():
+    """Get the shared POI cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = PoiCache()
+                except sqlite3.Error as e:
+                    # Keep serving from memory if the cache file can't be opened
+                    print(f"Error opening POI cache {POI_CACHE_FILE}: {e}")
+                    _cache = PoiCache(path=None)
+    return _cache
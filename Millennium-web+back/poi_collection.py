@@ -0,0 +1,163 @@
+"""Column-oriented POI collections, the internal format for fetching and scoring
+
+Places are kept as float arrays of coordinates, indexes into an interned name
+table and type codes, instead of one nested dict per place. Tags are stored as
+JSON text and only decoded when asked for. The API's place dicts
+({'geometry': {'location': {'lat', 'lng'}}, 'name', 'tags'}) are built at the
+JSON boundary with to_places(), or one at a time by indexing.
+"""
+import json
+import sys
+import numpy as np
+from osm import OSM_QUERIES
+from scoring import haversine_matrix
+
+# Type codes index into PLACE_TYPES. The table is fixed: types outside it
+# (e.g. from request data) share the last code instead of growing it
+PLACE_TYPES = (*OSM_QUERIES, 'other')
+_type_codes = {place_type: code for code, place_type in enumerate(PLACE_TYPES)}
+OTHER_TYPE_CODE = len(PLACE_TYPES) - 1
+
+def type_code(place_type):
+    """Get the code of a place type"""
+    return _type_codes.get(place_type, OTHER_TYPE_CODE)
+
+def encode_tags(tags):
+    return json.dumps(tags, ensure_ascii=False, separators=(',', ':')) if tags else None
+
+class PoiBuilder:
+    """Collects places one at a time and builds a PoiCollection"""
+
+    def __init__(self, place_type):
+        self.place_type = place_type
+        self.lats = []
+        self.lons = []
+        self.names = []
+        self.name_ids = []
+        self.tags = []
+        self._name_index = {}
+
+    def add(self, lat, lon, name, tags=None):
+        name_id = self._name_index.get(name)
+        if name_id is None:
+            name_id = self._name_index[name] = len(self.names)
+            # Names repeat across collections (chains, "Cafe" placeholders)
+            self.names.append(sys.intern(name) if isinstance(name, str) else name)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.name_ids.append(name_id)
+        self.tags.append(encode_tags(tags))
+
+    def build(self):
+        return PoiCollection(
+            np.array(self.lats, dtype=np.float64),
+            np.array(self.lons, dtype=np.float64),
+            np.full(len(self.lats), type_code(self.place_type), dtype=np.uint8),
+            self.names,
+            np.array(self.name_ids, dtype=np.int32),
+            self.tags
+        )
+
+class PoiCollection:
+    """Places of one fetch stored as columns; indexing or iterating yields place dicts"""
+
+    __slots__ = ('lats', 'lons', 'type_codes', 'names', 'name_ids', '_tags')
+
+    def __init__(self, lats, lons, type_codes, names, name_ids, tags):
+        self.lats = lats
+        self.lons = lons
+        self.type_codes = type_codes
+        self.names = names  # distinct names
+        self.name_ids = name_ids  # per place, index into names
+        self._tags = tags  # per place, JSON text or None
+
+    @classmethod
+    def empty(cls, place_type):
+        return PoiBuilder(place_type).build()
+
+    @classmethod
+    def from_places(cls, places, place_type):
+        """Build a collection from place dicts"""
+        builder = PoiBuilder(place_type)
+        for place in places:
+            location = place['geometry']['location']
+            builder.add(location['lat'], location['lng'], place.get('name'), place.get('tags'))
+        return builder.build()
+
+    @classmethod
+    def from_json(cls, text, place_type):
+        """Load a collection saved with to_json (or a JSON list of place dicts)"""
+        data = json.loads(text)
+        if isinstance(data, list):
+            return cls.from_places(data, place_type)
+        return cls(
+            np.array(data['lat'], dtype=np.float64),
+            np.array(data['lon'], dtype=np.float64),
+            np.full(len(data['lat']), type_code(place_type), dtype=np.uint8),
+            [sys.intern(name) if isinstance(name, str) else name for name in data['names']],
+            np.array(data['name'], dtype=np.int32),
+            data['tags']
+        )
+
+    def to_json(self):
+        return json.dumps({
+            'lat': self.lats.tolist(),
+            'lon': self.lons.tolist(),
+            'names': self.names,
+            'name': self.name_ids.tolist(),
+            'tags': self._tags
+        }, ensure_ascii=False)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __getitem__(self, index):
+        return self.place(index)
+
+    def __iter__(self):
+        return iter(self.to_places())
+
+    def place_type(self, index):
+        return PLACE_TYPES[self.type_codes[index]]
+
+    def name(self, index):
+        return self.names[self.name_ids[index]]
+
+    def tags(self, index):
+        text = self._tags[index]
+        return json.loads(text) if text else {}
+
+    def place(self, index):
+        """Get one place as a place dict"""
+        return {
+            'geometry': {
+                'location': {
+                    'lat': float(self.lats[index]),
+                    'lng': float(self.lons[index])
+                }
+            },
+            'name': self.name(index),
+            'tags': self.tags(index)
+        }
+
+    def to_places(self):
+        """Get every place as a place dict, in order"""
+        names = [self.names[i] for i in self.name_ids.tolist()]
+        return [
+            {'geometry': {'location': {'lat': lat, 'lng': lon}}, 'name': name,
+             'tags': json.loads(text) if text else {}}
+            for lat, lon, name, text in zip(self.lats.tolist(), self.lons.tolist(), names, self._tags)
+        ]
+
+    def subset(self, indexes):
+        """Get the places at indexes (an index array or boolean mask), in order"""
+        indexes = np.flatnonzero(indexes) if np.asarray(indexes).dtype == bool else np.asarray(indexes)
+        return PoiCollection(self.lats[indexes], self.lons[indexes], self.type_codes[indexes],
+                             self.names, self.name_ids[indexes], [self._tags[i] for i in indexes.tolist()])
+
+    def within_radius(self, lat, lon, radius_km):
+        """Get the places within radius_km of a point, in order"""
+        if not len(self):
+            return self
+        distances = haversine_matrix(np.array([lat]), np.array([lon]), self.lats, self.lons)[0]
+        return self.subset(distances <= radius_km)
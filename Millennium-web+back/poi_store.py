@@ -0,0 +1,240 @@
+"""Local POI store backed by a SQLite R-tree
+
+Build it from an OSM extract so radius queries work without the Overpass API:
+
+    python poi_store.py ingest azerbaijan.osm
+    python poi_store.py ingest overpass_dump.json
+    python poi_store.py ingest pois.geojson
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from config import POI_STORE_FILE
+from osm import place_types_for_element, element_coordinates
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pois (
+    id INTEGER PRIMARY KEY,
+    place_type TEXT NOT NULL,
+    osm_type TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS poi_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+class PoiStore:
+    """Read-only access to an ingested POI database"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.bounds = None
+        meta = dict(self._connection().execute('SELECT key, value FROM meta').fetchall())
+        if 'bounds' in meta:
+            self.bounds = json.loads(meta['bounds'])
+
+    def _connection(self):
+        # SQLite connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            self._local.conn = conn
+        return conn
+
+    def covers(self, lat, lon):
+        """Check if a location is inside the area the store was built for"""
+        if not self.bounds:
+            return False
+        return (self.bounds['min_lat'] <= lat <= self.bounds['max_lat'] and
+                self.bounds['min_lon'] <= lon <= self.bounds['max_lon'])
+
+    def query_bbox(self, place_type, min_lat, max_lat, min_lon, max_lon):
+        """Get elements of a place type inside a bounding box, in Overpass element format"""
+        rows = self._connection().execute(
+            'SELECT p.osm_type, p.lat, p.lon, p.tags FROM poi_rtree r JOIN pois p ON p.id = r.id '
+            'WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? '
+            'AND p.place_type = ? ORDER BY p.id',
+            (min_lat, max_lat, min_lon, max_lon, place_type)
+        ).fetchall()
+        elements = []
+        for osm_type, lat, lon, tags in rows:
+            if osm_type == 'node':
+                elements.append({'type': 'node', 'lat': lat, 'lon': lon, 'tags': json.loads(tags)})
+            else:
+                elements.append({'type': osm_type, 'center': {'lat': lat, 'lon': lon},
+                                 'tags': json.loads(tags)})
+        return elements
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_poi_store():
+    """Get the shared POI store, or None if it hasn't been ingested yet"""
+    global _store
+    if _store is None and os.path.exists(POI_STORE_FILE):
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = PoiStore(POI_STORE_FILE)
+                except sqlite3.Error as e:
+                    print(f"Error opening POI store {POI_STORE_FILE}: {e}")
+                    return None
+    return _store
+
+def iter_json_elements(path):
+    """Yield Overpass-style elements from an Overpass JSON dump or a GeoJSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if 'elements' in data:
+        yield from data['elements']
+        return
+
+    for feature in data.get('features', []):
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+        # osmtogeojson nests tags, most other exporters flatten them
+        tags = properties.get('tags', properties)
+        coords = geometry.get('coordinates')
+        if not coords:
+            continue
+        if geometry.get('type') == 'Point':
+            yield {'type': 'node', 'lon': coords[0], 'lat': coords[1], 'tags': tags}
+            continue
+        # Use the mean of the outer ring / line as the center
+        points = coords
+        while points and isinstance(points[0][0], list):
+            points = points[0]
+        yield {
+            'type': 'way',
+            'center': {
+                'lat': sum(p[1] for p in points) / len(points),
+                'lon': sum(p[0] for p in points) / len(points)
+            },
+            'tags': tags
+        }
+
+def is_poi_way(tags):
+    """Check if a way is a POI (only metro stations are queried as ways)"""
+    return bool(place_types_for_element({'type': 'way', 'tags': tags}))
+
+def iter_osm_xml_elements(path, keep_way=is_poi_way):
+    """Yield Overpass-style elements from an OSM XML extract
+
+    Only ways whose tags pass keep_way are yielded (by default the metro
+    stations), so their centers are resolved with a second pass that only
+    keeps the nodes those ways reference.
+    """
+    way_refs = {}
+    for _, elem in ET.iterparse(path):
+        if elem.tag == 'node':
+            tags = {t.get('k'): t.get('v') for t in elem.findall('tag')}
+            if tags:
+                yield {'type': 'node', 'lat': float(elem.get('lat')),
+                       'lon': float(elem.get('lon')), 'tags': tags}
+            elem.clear()
+        elif elem.tag == 'way':
+            tags = {t.get('k'): t.get('v') for t in elem.findall('tag')}
+            if keep_way(tags):
+                way_refs[elem.get('id')] = ([nd.get('ref') for nd in elem.findall('nd')], tags)
+            elem.clear()
+        elif elem.tag == 'relation':
+            elem.clear()
+
+    if not way_refs:
+        return
+
+    needed = {ref for refs, _ in way_refs.values() for ref in refs}
+    node_coords = {}
+    for _, elem in ET.iterparse(path):
+        if elem.tag == 'node':
+            if elem.get('id') in needed:
+                node_coords[elem.get('id')] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+
+    for refs, tags in way_refs.values():
+        points = [node_coords[ref] for ref in refs if ref in node_coords]
+        if not points:
+            continue
+        yield {
+            'type': 'way',
+            'center': {
+                'lat': sum(p[0] for p in points) / len(points),
+                'lon': sum(p[1] for p in points) / len(points)
+            },
+            'tags': tags
+        }
+
+def ingest(source_path, db_path=POI_STORE_FILE, bounds=None):
+    """Load an OSM extract into the POI store, replacing its previous contents"""
+    if source_path.endswith('.pbf'):
+        raise ValueError('PBF is not supported, convert it first: osmium cat extract.osm.pbf -o extract.osm')
+    if source_path.endswith(('.osm', '.xml')):
+        elements = iter_osm_xml_elements(source_path)
+    else:
+        elements = iter_json_elements(source_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    extent = {'min_lat': 90.0, 'max_lat': -90.0, 'min_lon': 180.0, 'max_lon': -180.0}
+    count = 0
+    with conn:
+        conn.execute('DELETE FROM pois')
+        conn.execute('DELETE FROM poi_rtree')
+        conn.execute('DELETE FROM meta')
+        for element in elements:
+            lat, lon = element_coordinates(element)
+            if lat is None or lon is None:
+                continue
+            place_types = place_types_for_element(element)
+            if not place_types:
+                continue
+            tags = json.dumps(element.get('tags', {}), ensure_ascii=False)
+            for place_type in place_types:
+                cursor = conn.execute(
+                    'INSERT INTO pois (place_type, osm_type, lat, lon, tags) VALUES (?, ?, ?, ?, ?)',
+                    (place_type, element['type'], lat, lon, tags))
+                conn.execute('INSERT INTO poi_rtree VALUES (?, ?, ?, ?, ?)',
+                             (cursor.lastrowid, lat, lat, lon, lon))
+                count += 1
+            extent['min_lat'] = min(extent['min_lat'], lat)
+            extent['max_lat'] = max(extent['max_lat'], lat)
+            extent['min_lon'] = min(extent['min_lon'], lon)
+            extent['max_lon'] = max(extent['max_lon'], lon)
+        conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)',
+                     ('bounds', json.dumps(bounds or extent)))
+    conn.close()
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage the local POI store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Load an OSM XML, Overpass JSON or GeoJSON extract')
+    ingest_parser.add_argument('source', help='Path to the extract')
+    ingest_parser.add_argument('--db', default=POI_STORE_FILE, help='Store file (default: %(default)s)')
+    ingest_parser.add_argument('--bounds', help='Covered area as min_lat,min_lon,max_lat,max_lon '
+                                                '(default: extent of the data)')
+    args = parser.parse_args(argv)
+
+    bounds = None
+    if args.bounds:
+        min_lat, min_lon, max_lat, max_lon = (float(v) for v in args.bounds.split(','))
+        bounds = {'min_lat': min_lat, 'max_lat': max_lat, 'min_lon': min_lon, 'max_lon': max_lon}
+
+    try:
+        count = ingest(args.source, args.db, bounds)
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"Error ingesting {args.source}: {e}")
+        return 1
+    print(f"Ingested {count} POIs into {args.db}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Precomputed amenity profiles for house listings
+
+Profiles are computed in the background when a house is added, so searches
+only read them and do arithmetic. Backfill existing listings with:
+
+    python profiles.py backfill
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import PROFILES_FILE, PROFILE_MAX_AGE_DAYS, PROFILE_WORKERS
+from enrichment import PROFILE_RADII, build_profiles
+from models import load_houses
+from repository import file_lock
+
+class ProfileStore:
+    """Amenity profiles keyed by house id, persisted to a JSON file"""
+
+    def __init__(self, path=PROFILES_FILE, max_age_days=PROFILE_MAX_AGE_DAYS, workers=PROFILE_WORKERS):
+        self.path = path
+        self.max_age = timedelta(days=max_age_days)
+        self._profiles = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = set()
+
+    def _load(self):
+        """Reload the profiles file if it changed on disk"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._profiles = json.load(f)
+            self._mtime = mtime
+        except Exception as e:
+            print(f"Error loading amenity profiles: {e}")
+
+    def get(self, house):
+        """Get a house's profile, or None if there is none for its current location"""
+        return self.get_many([house])[0]
+
+    def get_many(self, houses):
+        """Get the profile of each house like get, checking the file for changes once"""
+        with self._lock:
+            self._load()
+            profiles = [self._profiles.get(str(house['id'])) for house in houses]
+        return [
+            profile if profile is not None and
+            (profile['latitude'], profile['longitude']) == (house['latitude'], house['longitude']) else None
+            for house, profile in zip(houses, profiles)
+        ]
+
+    def is_stale(self, profile):
+        """Check if a profile is too old or misses an amenity type"""
+        if any(place_type not in profile['amenities'] for place_type in PROFILE_RADII):
+            return True
+        return datetime.now() - datetime.fromisoformat(profile['computed_at']) > self.max_age
+
+    def save(self, profiles):
+        """Store new profiles, merging them with the ones on disk
+
+        Server workers share the file, so the merge and write happen under a
+        lock on it; otherwise one worker could overwrite another's profiles.
+        """
+        with self._lock, file_lock(self.path):
+            self._load()
+            for profile in profiles:
+                self._profiles[str(profile['house_id'])] = profile
+            tmp_path = f'{self.path}.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._profiles, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._mtime = os.path.getmtime(self.path)
+            except Exception as e:
+                print(f"Error saving amenity profiles: {e}")
+
+    def compute(self, houses):
+        """Compute and store the profiles of houses
+
+        Returns the stored profiles; houses whose POIs couldn't be fetched
+        are left out and get another try on their next read.
+        """
+        profiles = [profile for profile in build_profiles(houses) if profile is not None]
+        if len(profiles) < len(houses):
+            print(f"Could not fetch amenities for {len(houses) - len(profiles)} of {len(houses)} houses")
+        if profiles:
+            self.save(profiles)
+        return profiles
+
+    def refresh_async(self, houses):
+        """Compute profiles for houses in the background"""
+        with self._lock:
+            houses = [h for h in houses if h['id'] not in self._pending]
+            self._pending.update(h['id'] for h in houses)
+        if houses:
+            self._executor.submit(self._refresh, houses)
+
+    def _refresh(self, houses):
+        try:
+            self.compute(houses)
+        except Exception as e:
+            print(f"Error computing amenity profiles: {e}")
+        finally:
+            with self._lock:
+                self._pending.difference_update(h['id'] for h in houses)
+
+    def profiles_for(self, houses):
+        """Get the profile of each house, or None while it is being computed
+
+        Nothing is fetched here: missing profiles (e.g. the background job
+        hasn't finished yet) are queued for the background job, and stale
+        ones are served and refreshed there too.
+        """
+        profiles = self.get_many(houses)
+        todo = [house for house, profile in zip(houses, profiles)
+                if profile is None or self.is_stale(profile)]
+        if todo:
+            self.refresh_async(todo)
+        return profiles
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_profile_store():
+    """Get the shared profile store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore()
+    return _store
+
+def backfill(houses, store, refresh_all=False, batch_size=200):
+    """Compute profiles for houses that have none or a stale one"""
+    todo = [house for house, profile in zip(houses, store.get_many(houses))
+            if refresh_all or profile is None or store.is_stale(profile)]
+    print(f"{len(todo)} of {len(houses)} houses need a profile")
+    computed = 0
+    for start in range(0, len(todo), batch_size):
+        computed += len(store.compute(todo[start:start + batch_size]))
+        print(f"Computed {computed}/{len(todo)} profiles")
+    return computed, len(todo) - computed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manage amenity profiles of house listings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill_parser = subparsers.add_parser('backfill', help='Compute missing and stale profiles')
+    backfill_parser.add_argument('--all', action='store_true', help='Recompute every profile')
+    args = parser.parse_args(argv)
+
+    _, failed = backfill(load_houses(), get_profile_store(), refresh_all=args.all)
+    if failed:
+        print(f"{failed} profiles failed; run the backfill again to retry them")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Adaptive quadtree refinement of evaluation cells"""
+import math
+from config import (
+    ADAPTIVE_MAX_DEPTH, ADAPTIVE_CELL_BUDGET, ADAPTIVE_SCORE_THRESHOLD, ADAPTIVE_VARIATION_THRESHOLD
+)
+
+class QuadTree:
+    """Leaf cells of a quadtree over a grid of equally sized square root cells
+
+    Leaves are keyed by (depth, row, col), where depth d cells are 1/2^d the
+    size of a root cell, so the leaf holding a point can be found by probing
+    each depth.
+    """
+
+    def __init__(self, roots, size):
+        self.size = size
+        self.origin_lat = min(lat for lat, _ in roots) - size / 2
+        self.origin_lon = min(lon for _, lon in roots) - size / 2
+        self.max_depth = 0
+        self.leaves = {}
+
+    def key(self, lat, lon, depth):
+        cell_size = self.size / 2 ** depth
+        return (depth, math.floor((lat - self.origin_lat) / cell_size),
+                math.floor((lon - self.origin_lon) / cell_size))
+
+    def add(self, cell):
+        self.leaves[self.key(cell['lat'], cell['lon'], cell['depth'])] = cell
+        self.max_depth = max(self.max_depth, cell['depth'])
+
+    def remove(self, cell):
+        del self.leaves[self.key(cell['lat'], cell['lon'], cell['depth'])]
+
+    def leaf_at(self, lat, lon):
+        """Get the leaf containing a point, or None outside the tree"""
+        for depth in range(self.max_depth + 1):
+            leaf = self.leaves.get(self.key(lat, lon, depth))
+            if leaf is not None:
+                return leaf
+        return None
+
+    def variation(self, cell):
+        """Largest score difference between a cell and its edge neighbours"""
+        offset = cell['size'] / 2 + self.size / 2 ** (self.max_depth + 2)
+        neighbours = [
+            self.leaf_at(cell['lat'] + d_lat, cell['lon'] + d_lon)
+            for d_lat, d_lon in ((offset, 0), (-offset, 0), (0, offset), (0, -offset))
+        ]
+        return max((abs(cell['score'] - n['score']) for n in neighbours if n is not None), default=0)
+
+def refine(roots, size, score_points, max_depth=ADAPTIVE_MAX_DEPTH, cell_budget=ADAPTIVE_CELL_BUDGET,
+           score_threshold=ADAPTIVE_SCORE_THRESHOLD, variation_threshold=ADAPTIVE_VARIATION_THRESHOLD):
+    """Score root cells, then split the promising ones into quadrants level by level
+
+    roots are (lat, lon) centers of square cells of `size` degrees and
+    score_points(points) returns a location dict per point. A cell is split
+    when its score is high or it differs sharply from a neighbour; the best
+    candidates go first, until cell_budget cells have been scored. Returns
+    the leaf cells, each with its 'size' and 'depth'.
+    """
+    if len(roots) > cell_budget:
+        # Grids bigger than the budget keep the roots nearest their center
+        center_lat = sum(lat for lat, _ in roots) / len(roots)
+        center_lon = sum(lon for _, lon in roots) / len(roots)
+        nearest = sorted(range(len(roots)),
+                         key=lambda i: (roots[i][0] - center_lat) ** 2 + (roots[i][1] - center_lon) ** 2)
+        roots = [roots[i] for i in sorted(nearest[:cell_budget])]
+    tree = QuadTree(roots, size)
+    for location in score_points(roots):
+        tree.add({**location, 'size': size, 'depth': 0})
+    scored = len(roots)
+
+    for depth in range(max_depth):
+        if scored >= cell_budget:
+            break
+        candidates = []
+        for cell in [c for c in tree.leaves.values() if c['depth'] == depth]:
+            variation = tree.variation(cell)
+            if cell['score'] >= score_threshold or variation >= variation_threshold:
+                candidates.append((cell['score'] + variation, cell))
+        candidates.sort(key=lambda candidate: -candidate[0])
+        candidates = candidates[:max(0, cell_budget - scored) // 4]
+        if not candidates:
+            break
+
+        children = []
+        for _, cell in candidates:
+            quarter = cell['size'] / 4
+            children.extend((cell['lat'] + d_lat, cell['lon'] + d_lon)
+                            for d_lat in (-quarter, quarter) for d_lon in (-quarter, quarter))
+        for _, cell in candidates:
+            tree.remove(cell)
+        for location in score_points(children):
+            tree.add({**location, 'size': size / 2 ** (depth + 1), 'depth': depth + 1})
+        scored += len(children)
+
+    return list(tree.leaves.values())
@@ -0,0 +1,229 @@
+"""In-memory listing repository with secondary indexes"""
+import bisect
+import math
+import os
+import threading
+from contextlib import contextmanager
+from config import HOUSES_FILE, QUALITY_MIN_COMPARABLES, CLUSTER_MAX_ZOOM, CLUSTER_CELL_PIXELS
+from aggregates import MarketAggregates
+from clusters import ClusterIndex
+from models import load_houses, save_houses
+from instrumentation import phase
+
+# Serializes writers across server worker processes; Windows runs a single process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Size of the lat/lon grid cells used for area lookups
+GRID_CELL_SIZE = 0.01  # degrees, about 1km
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path's .lock file, shared by every process"""
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class HouseRepository:
+    """Houses kept in memory, indexed by id, price and location
+
+    The backing file is only re-read when its modification time or size
+    changes, so reads don't pay the JSON parse cost. Treat returned house
+    dicts as read-only; they are shared between requests.
+    """
+
+    def __init__(self, path=HOUSES_FILE):
+        self.path = path
+        self.version = 0
+        self._file_state = None
+        self._houses = []
+        self._by_id = {}
+        self._ids = []  # sorted ids
+        self._prices = []  # sorted prices
+        self._by_price = []  # houses in the same order as _prices
+        self._grid = {}  # (row, col) -> houses
+        self._aggregates = MarketAggregates(QUALITY_MIN_COMPARABLES)
+        self._clusters = ClusterIndex(CLUSTER_MAX_ZOOM, CLUSTER_CELL_PIXELS)
+        self._lock = threading.RLock()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """Reload the houses if the backing file changed"""
+        state = self._stat()
+        if state == self._file_state:
+            return
+        with phase('load_houses'):
+            houses = load_houses(self.path)
+        self._index(houses)
+        self._file_state = state
+        self.version = state[0] if state else 0
+
+    def _index(self, houses):
+        self._houses = list(houses)
+        self._by_id = {h['id']: h for h in self._houses}
+        self._ids = sorted(self._by_id)
+        ordered = sorted(self._houses, key=lambda h: h['price'])
+        self._prices = [h['price'] for h in ordered]
+        self._by_price = ordered
+        self._grid = {}
+        for house in self._houses:
+            self._grid.setdefault(self._cell(house['latitude'], house['longitude']), []).append(house)
+        self._aggregates = MarketAggregates.build(self._houses, QUALITY_MIN_COMPARABLES)
+        self._clusters = ClusterIndex.build(self._houses, CLUSTER_MAX_ZOOM, CLUSTER_CELL_PIXELS)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / GRID_CELL_SIZE), math.floor(lon / GRID_CELL_SIZE))
+
+    def all(self):
+        """Get every house in file order"""
+        with self._lock:
+            self._refresh()
+            return list(self._houses)
+
+    def current_version(self):
+        """Get the data version, which increases whenever the houses change"""
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def count(self):
+        """Get the number of houses"""
+        with self._lock:
+            self._refresh()
+            return len(self._houses)
+
+    def page_by_id(self, after_id, limit):
+        """Get up to limit houses with ids greater than after_id, in id order"""
+        with self._lock:
+            self._refresh()
+            start = 0 if after_id is None else bisect.bisect_right(self._ids, after_id)
+            return [self._by_id[house_id] for house_id in self._ids[start:start + limit]]
+
+    def price_bounds(self):
+        """Get (min_price, max_price) of all houses, or None if there are none"""
+        with self._lock:
+            self._refresh()
+            if not self._prices:
+                return None
+            return self._prices[0], self._prices[-1]
+
+    def quality_scores(self, houses):
+        """Get the quality score of each house against comparable listings"""
+        with self._lock:
+            self._refresh()
+            return [self._aggregates.quality_score(house) for house in houses]
+
+    def market_summary(self):
+        """Get price statistics of the catalogue, its cities and districts"""
+        with self._lock:
+            self._refresh()
+            return self._aggregates.summary()
+
+    def get(self, house_id):
+        """Get a house by id, or None"""
+        with self._lock:
+            self._refresh()
+            return self._by_id.get(house_id)
+
+    def in_price_range(self, min_price, max_price):
+        """Get the houses with min_price <= price <= max_price, cheapest first"""
+        with self._lock:
+            self._refresh()
+            start = bisect.bisect_left(self._prices, min_price)
+            end = bisect.bisect_right(self._prices, max_price)
+            return self._by_price[start:end]
+
+    def in_area(self, min_lat, max_lat, min_lon, max_lon):
+        """Get the houses inside a bounding box"""
+        with self._lock:
+            self._refresh()
+            min_row, min_col = self._cell(min_lat, min_lon)
+            max_row, max_col = self._cell(max_lat, max_lon)
+            if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._grid):
+                cells = [cell for cell in self._grid
+                         if min_row <= cell[0] <= max_row and min_col <= cell[1] <= max_col]
+            else:
+                cells = [(r, c) for r in range(min_row, max_row + 1) for c in range(min_col, max_col + 1)]
+            return [
+                house for cell in cells for house in self._grid.get(cell, ())
+                if min_lat <= house['latitude'] <= max_lat and min_lon <= house['longitude'] <= max_lon
+            ]
+
+    def viewport(self, min_lat, max_lat, min_lon, max_lon, zoom):
+        """Get (clusters, houses) to draw for a map viewport
+
+        Up to CLUSTER_MAX_ZOOM, cells holding several listings come back as
+        cluster dicts and lone listings as houses. Closer in, every house in
+        the box is returned.
+        """
+        with self._lock:
+            self._refresh()
+            if zoom > self._clusters.max_zoom:
+                return [], self.in_area(min_lat, max_lat, min_lon, max_lon)
+            clusters = []
+            houses = []
+            for cluster in self._clusters.within(min_lat, max_lat, min_lon, max_lon, zoom):
+                if cluster.house is not None:
+                    houses.append(cluster.house)
+                else:
+                    clusters.append(cluster.to_dict())
+            return clusters, houses
+
+    def add(self, house):
+        """Assign an id to a new house, store it and save the file
+
+        Returns the stored house, or None if saving failed. Another process may
+        have added houses since the last read, so the file is re-checked under
+        the lock before the new id is assigned.
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            house = {'id': max(self._by_id, default=0) + 1, **house}
+            houses = self._houses + [house]
+            if not save_houses(houses, self.path):
+                return None
+
+            self._houses = houses
+            self._by_id[house['id']] = house
+            self._ids.append(house['id'])
+            position = bisect.bisect_right(self._prices, house['price'])
+            self._prices.insert(position, house['price'])
+            self._by_price.insert(position, house)
+            self._grid.setdefault(self._cell(house['latitude'], house['longitude']), []).append(house)
+            self._aggregates.add(house)
+            self._clusters.add(house)
+
+            # Keep the version increasing even if the clock didn't move
+            state = self._stat()
+            if state and state[0] <= self.version:
+                os.utime(self.path, ns=(self.version + 1, self.version + 1))
+                state = self._stat()
+            self._file_state = state
+            self.version = state[0] if state else self.version + 1
+            return house
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_house_repository():
+    """Get the shared house repository"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = HouseRepository()
+    return _repository
@@ -1,294 +1,455 @@
-"""API routes for the application"""
-from flask import request, jsonify, render_template
-from utils import (
-    find_nearby_places, calculate_distance, is_in_azerbaijan,
-    score_location, evaluate_locations, fetch_pois_parallel
-)
-from models import load_houses, save_houses, calculate_quality_scores
-from config import DEFAULT_LOCATION, AZERBAIJAN_BOUNDS
-from datetime import datetime
-
-def register_routes(app):
-    """Register all API routes"""
-    
-    @app.route('/')
-    def index():
-        return render_template('index.html')
-    
-    @app.route('/api/evaluate', methods=['POST'])
-    def evaluate():
-        """API endpoint to evaluate locations based on requirements"""
-        try:
-            data = request.json
-            
-            center_lat = float(data.get('latitude', DEFAULT_LOCATION['lat']))
-            center_lon = float(data.get('longitude', DEFAULT_LOCATION['lon']))
-            requirements = data.get('requirements', {})
-            grid_size = int(data.get('grid_size', 5))
-            
-            # Validate Azerbaijan bounds
-            if not is_in_azerbaijan(center_lat, center_lon):
-                return jsonify({
-                    'error': 'Location must be within Azerbaijan bounds',
-                    'bounds': AZERBAIJAN_BOUNDS
-                }), 400
-            
-            print(f"Received evaluation request for ({center_lat}, {center_lon})")
-            locations = evaluate_locations(center_lat, center_lon, requirements, grid_size)
-            
-            return jsonify({
-                'center': {'lat': center_lat, 'lon': center_lon},
-                'locations': locations
-            })
-        except Exception as e:
-            print(f"Error in evaluate endpoint: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'error': str(e)}), 500
-    
-    @app.route('/api/places', methods=['GET'])
-    def get_places():
-        """API endpoint to get nearby places for a location"""
-        lat = float(request.args.get('lat', 40.7128))
-        lon = float(request.args.get('lon', -74.0060))
-        place_type = request.args.get('type', 'school')
-        
-        places = find_nearby_places(lat, lon, place_type)
-        
-        return jsonify({
-            'places': places,
-            'count': len(places)
-        })
-    
-    @app.route('/api/all-places', methods=['POST'])
-    def get_all_places():
-        """API endpoint to get all nearby places of all types for visualization"""
-        data = request.json
-        center_lat = float(data.get('latitude', DEFAULT_LOCATION['lat']))
-        center_lon = float(data.get('longitude', DEFAULT_LOCATION['lon']))
-        radius = int(data.get('radius', 2000))
-        
-        # Validate Azerbaijan bounds
-        if not is_in_azerbaijan(center_lat, center_lon):
-            return jsonify({
-                'places': {},
-                'center': {'lat': center_lat, 'lon': center_lon},
-                'error': 'Location outside Azerbaijan'
-            })
-        
-        all_places = {}
-        place_types = ['school', 'hospital', 'supermarket', 'market', 'cafe', 'restaurant', 'park', 'gym', 'pharmacy']
-        
-        # Fetch in parallel for speed
-        cached_pois = fetch_pois_parallel(center_lat, center_lon, place_types, radius)
-        all_places = cached_pois
-        
-        # Handle market
-        if 'supermarket' in all_places:
-            all_places['market'] = all_places['supermarket']
-        
-        return jsonify({
-            'places': all_places,
-            'center': {'lat': center_lat, 'lon': center_lon}
-        })
-    
-    @app.route('/api/metro-stations', methods=['GET'])
-    def get_metro_stations():
-        """API endpoint to get all metro stations in Baku"""
-        try:
-            # Baku center coordinates
-            baku_center_lat = 40.4093
-            baku_center_lon = 49.8671
-            radius = 20000  # 20km to cover all of Baku
-            
-            # Find all metro stations
-            metro_stations = find_nearby_places(baku_center_lat, baku_center_lon, 'metro', radius)
-            
-            # Remove duplicates (same name) - keep first occurrence
-            seen_names = set()
-            unique_stations = []
-            for station in metro_stations:
-                station_name = station.get('name', '').lower().strip()
-                if station_name and station_name not in seen_names:
-                    seen_names.add(station_name)
-                    unique_stations.append(station)
-            
-            return jsonify({
-                'stations': unique_stations,
-                'count': len(unique_stations)
-            })
-        except Exception as e:
-            print(f"Error fetching metro stations: {e}")
-            return jsonify({'stations': [], 'count': 0, 'error': str(e)})
-    
-    @app.route('/api/houses', methods=['POST'])
-    def add_house():
-        """API endpoint for sellers to add a house listing"""
-        try:
-            data = request.json
-            
-            # Validate required fields
-            required_fields = ['title', 'address', 'latitude', 'longitude', 'price', 'description']
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({'error': f'Missing required field: {field}'}), 400
-            
-            lat = float(data['latitude'])
-            lon = float(data['longitude'])
-            
-            # Validate Azerbaijan bounds
-            if not is_in_azerbaijan(lat, lon):
-                return jsonify({'error': 'Location must be within Azerbaijan bounds'}), 400
-            
-            # Load existing houses
-            houses = load_houses()
-            
-            # Create new house entry
-            new_house = {
-                'id': len(houses) + 1,
-                'title': data['title'],
-                'address': data['address'],
-                'latitude': lat,
-                'longitude': lon,
-                'price': float(data['price']),
-                'description': data.get('description', ''),
-                'bedrooms': data.get('bedrooms', 0),
-                'bathrooms': data.get('bathrooms', 0),
-                'area': data.get('area', 0),
-                'seller_name': data.get('seller_name', 'Anonymous'),
-                'seller_phone': data.get('seller_phone', ''),
-                'created_at': datetime.now().isoformat()
-            }
-            
-            houses.append(new_house)
-            
-            # Save houses
-            if save_houses(houses):
-                return jsonify({'success': True, 'house': new_house}), 201
-            else:
-                return jsonify({'error': 'Failed to save house'}), 500
-                
-        except Exception as e:
-            print(f"Error adding house: {e}")
-            return jsonify({'error': str(e)}), 500
-    
-    @app.route('/api/houses', methods=['GET'])
-    def get_houses():
-        """API endpoint to get all houses"""
-        houses = load_houses()
-        if houses:
-            calculate_quality_scores(houses)
-        return jsonify({'houses': houses, 'count': len(houses)})
-    
-    @app.route('/api/houses/search', methods=['POST'])
-    def search_houses():
-        """API endpoint for buyers to search houses by price range and requirements"""
-        try:
-            data = request.json
-            min_price = float(data.get('min_price', 0))
-            max_price = float(data.get('max_price', float('inf')))
-            requirements = data.get('requirements', {})
-            
-            # Load all houses
-            houses = load_houses()
-            
-            # Filter houses by price range
-            filtered_houses = []
-            for house in houses:
-                if min_price <= house['price'] <= max_price:
-                    filtered_houses.append(house)
-            
-            # Score each house based on requirements and get amenities
-            scored_houses = []
-            for house in filtered_houses:
-                lat = house['latitude']
-                lon = house['longitude']
-                
-                # Score the location based on requirements
-                location_data = score_location(lat, lon, requirements)
-                
-                # Get important amenities: hospital, police, school, and nearest metro
-                amenities_info = {}
-                
-                # Get hospital
-                hospitals = find_nearby_places(lat, lon, 'hospital', 3000)
-                if hospitals:
-                    min_dist = min([calculate_distance(lat, lon, 
-                                                      h['geometry']['location']['lat'],
-                                                      h['geometry']['location']['lng']) 
-                                   for h in hospitals])
-                    amenities_info['hospital'] = {
-                        'distance': round(min_dist, 2),
-                        'count': len(hospitals),
-                        'name': hospitals[0]['name'] if hospitals else None
-                    }
-                else:
-                    amenities_info['hospital'] = {'distance': None, 'count': 0, 'name': None}
-                
-                # Get police
-                police_stations = find_nearby_places(lat, lon, 'police', 3000)
-                if police_stations:
-                    min_dist = min([calculate_distance(lat, lon, 
-                                                      p['geometry']['location']['lat'],
-                                                      p['geometry']['location']['lng']) 
-                                   for p in police_stations])
-                    amenities_info['police'] = {
-                        'distance': round(min_dist, 2),
-                        'count': len(police_stations),
-                        'name': police_stations[0]['name'] if police_stations else None
-                    }
-                else:
-                    amenities_info['police'] = {'distance': None, 'count': 0, 'name': None}
-                
-                # Get school
-                schools = find_nearby_places(lat, lon, 'school', 2000)
-                if schools:
-                    min_dist = min([calculate_distance(lat, lon, 
-                                                      s['geometry']['location']['lat'],
-                                                      s['geometry']['location']['lng']) 
-                                   for s in schools])
-                    amenities_info['school'] = {
-                        'distance': round(min_dist, 2),
-                        'count': len(schools),
-                        'name': schools[0]['name'] if schools else None
-                    }
-                else:
-                    amenities_info['school'] = {'distance': None, 'count': 0, 'name': None}
-                
-                # Get nearest metro station
-                metro_stations = find_nearby_places(lat, lon, 'metro', 5000)
-                if metro_stations:
-                    min_dist = min([calculate_distance(lat, lon, 
-                                                      m['geometry']['location']['lat'],
-                                                      m['geometry']['location']['lng']) 
-                                   for m in metro_stations])
-                    nearest_metro = min(metro_stations, key=lambda m: calculate_distance(
-                        lat, lon, m['geometry']['location']['lat'], m['geometry']['location']['lng']))
-                    amenities_info['metro'] = {
-                        'distance': round(min_dist, 2),
-                        'name': nearest_metro['name']
-                    }
-                else:
-                    amenities_info['metro'] = {'distance': None, 'name': None}
-                
-                scored_house = {
-                    **house,
-                    'match_score': location_data['score'],
-                    'amenities': amenities_info
-                }
-                scored_houses.append(scored_house)
-            
-            # Sort by match score (highest first)
-            scored_houses.sort(key=lambda x: x['match_score'], reverse=True)
-            
-            return jsonify({
-                'houses': scored_houses,
-                'count': len(scored_houses)
-            })
-            
-        except Exception as e:
-            print(f"Error searching houses: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'error': str(e)}), 500
-
+"""API routes for the application"""
+import json
+from flask import request, jsonify, render_template, Response, stream_with_context
+from utils import (
+    find_nearby_places, is_in_azerbaijan,
+    evaluate_locations, evaluate_adaptive, stream_evaluation, fetch_pois_parallel,
+    grid_points, poi_flights
+)
+from repository import get_house_repository
+from poi_cache import get_poi_cache
+from enrichment import profile_score, profile_amenities
+from profiles import get_profile_store
+from metro import get_metro_registry
+from osm import OSM_QUERIES
+from layers import get_layer_store
+from gazetteer import get_gazetteer
+from instrumentation import phase, render_metrics
+from payloads import compact_places, compact_locations, compressed_json
+from conditional import conditional, make_etag, version_time
+from pagination import (
+    encode_cursor, decode_cursor, parse_limit, query_signature, top_k, RankingCache, NUMBER
+)
+from config import (
+    DEFAULT_LOCATION, AZERBAIJAN_BOUNDS, ADAPTIVE_MAX_DEPTH, ADAPTIVE_CELL_BUDGET, HOUSES_MAX_AGE, METRO_MAX_AGE
+)
+from datetime import datetime
+
+# Scored search candidates by (query, data version), shared between pages
+search_rankings = RankingCache()
+
+# Ranking key of houses without a profile yet: after every score (keys are -score)
+PENDING_RANK = 1
+
+def register_routes(app):
+    """Register all API routes"""
+    
+    # Load the metro stations once at startup
+    get_metro_registry()
+    
+    @app.route('/')
+    def index():
+        return render_template('index.html')
+    
+    @app.route('/api/evaluate', methods=['POST'])
+    def evaluate():
+        """API endpoint to evaluate locations based on requirements"""
+        try:
+            data = request.json
+            
+            center_lat = float(data.get('latitude', DEFAULT_LOCATION['lat']))
+            center_lon = float(data.get('longitude', DEFAULT_LOCATION['lon']))
+            requirements = data.get('requirements', {})
+            grid_size = int(data.get('grid_size', 5))
+            
+            # Validate Azerbaijan bounds
+            if not is_in_azerbaijan(center_lat, center_lon):
+                return jsonify({
+                    'error': 'Location must be within Azerbaijan bounds',
+                    'bounds': AZERBAIJAN_BOUNDS
+                }), 400
+            
+            print(f"Received evaluation request for ({center_lat}, {center_lon})")
+            
+            def locations_response(locations, mode=None):
+                response = {'center': {'lat': center_lat, 'lon': center_lon}}
+                if mode:
+                    response['mode'] = mode
+                # Compact format: columnar arrays and a shared name table
+                if data.get('format') == 'compact':
+                    response.update(compact_locations(locations))
+                    return compressed_json(response)
+                response['locations'] = locations
+                return jsonify(response)
+            
+            # Layers mode: weighted sum of the precomputed distance layers
+            if data.get('mode') == 'layers':
+                locations = get_layer_store().score_points(grid_points(center_lat, center_lon, grid_size), requirements)
+                if locations is not None:
+                    return locations_response(locations, 'layers')
+                # Area not precomputed - evaluate from POIs below
+            
+            # Adaptive mode: variable-size cells, refined around good and changing areas
+            if data.get('mode') == 'adaptive':
+                cells = evaluate_adaptive(
+                    center_lat, center_lon, requirements, grid_size,
+                    max_depth=int(data.get('max_depth', ADAPTIVE_MAX_DEPTH)),
+                    cell_budget=int(data.get('cell_budget', ADAPTIVE_CELL_BUDGET))
+                )
+                return locations_response(cells, 'adaptive')
+            
+            # Streaming mode: newline-delimited JSON events as cells are scored
+            if data.get('stream'):
+                def generate():
+                    try:
+                        for event in stream_evaluation(center_lat, center_lon, requirements, grid_size):
+                            yield json.dumps(event) + '\n'
+                    except Exception as e:
+                        print(f"Error in evaluate stream: {e}")
+                        yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+            
+            locations = evaluate_locations(center_lat, center_lon, requirements, grid_size)
+            return locations_response(locations)
+        except Exception as e:
+            print(f"Error in evaluate endpoint: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/tiles/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+    def get_score_tile(z, x, y):
+        """API endpoint to get a score heatmap tile for the requirements in the query string"""
+        if not (0 <= z <= 20 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Invalid tile'}), 404
+        try:
+            requirements = {key: float(value) for key, value in request.args.items()}
+        except ValueError:
+            return jsonify({'error': 'Requirements must be numbers'}), 400
+        
+        response = Response(get_layer_store().heatmap_tile(z, x, y, requirements), mimetype='image/png')
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+        return response
+    
+    @app.route('/api/places', methods=['GET'])
+    def get_places():
+        """API endpoint to get nearby places for a location"""
+        lat = float(request.args.get('lat', 40.7128))
+        lon = float(request.args.get('lon', -74.0060))
+        place_type = request.args.get('type', 'school')
+        if place_type not in OSM_QUERIES:
+            return jsonify({'error': f'Unknown place type: {place_type}', 'types': list(OSM_QUERIES)}), 400
+        
+        places = find_nearby_places(lat, lon, place_type)
+        
+        return jsonify({
+            'places': places,
+            'count': len(places)
+        })
+    
+    @app.route('/api/all-places', methods=['POST'])
+    def get_all_places():
+        """API endpoint to get all nearby places of all types for visualization"""
+        data = request.json
+        center_lat = float(data.get('latitude', DEFAULT_LOCATION['lat']))
+        center_lon = float(data.get('longitude', DEFAULT_LOCATION['lon']))
+        radius = int(data.get('radius', 2000))
+        
+        # Validate Azerbaijan bounds
+        if not is_in_azerbaijan(center_lat, center_lon):
+            return jsonify({
+                'places': {},
+                'center': {'lat': center_lat, 'lon': center_lon},
+                'error': 'Location outside Azerbaijan'
+            })
+        
+        all_places = {}
+        place_types = ['school', 'hospital', 'supermarket', 'market', 'cafe', 'restaurant', 'park', 'gym', 'pharmacy']
+        
+        # Fetch in parallel for speed
+        cached_pois = fetch_pois_parallel(center_lat, center_lon, place_types, radius)
+        all_places = cached_pois
+        
+        # Handle market
+        if 'supermarket' in all_places:
+            all_places['market'] = all_places['supermarket']
+        
+        # Compact format: columnar arrays, shared name table, tags only on request
+        if data.get('format') == 'compact':
+            response = compact_places(all_places, include_tags=bool(data.get('include_tags')))
+            response['center'] = {'lat': center_lat, 'lon': center_lon}
+            return compressed_json(response)
+        
+        return jsonify({
+            'places': {place_type: places.to_places() for place_type, places in all_places.items()},
+            'center': {'lat': center_lat, 'lon': center_lon}
+        })
+    
+    @app.route('/api/metro-stations', methods=['GET'])
+    def get_metro_stations():
+        """API endpoint to get all metro stations in Baku"""
+        registry = get_metro_registry()
+        revision = registry.current_revision()
+        if registry.stations:
+            return conditional(make_etag('metro', revision, registry.version), version_time(revision),
+                               METRO_MAX_AGE, lambda: jsonify({
+                                   'stations': registry.stations,
+                                   'count': len(registry.stations),
+                                   'version': registry.version,
+                                   'source': registry.source
+                               }))
+        
+        try:
+            # Baku center coordinates
+            baku_center_lat = 40.4093
+            baku_center_lon = 49.8671
+            radius = 20000  # 20km to cover all of Baku
+            
+            # Find all metro stations
+            metro_stations = find_nearby_places(baku_center_lat, baku_center_lon, 'metro', radius)
+            
+            # Remove duplicates (same name) - keep first occurrence
+            seen_names = set()
+            unique_stations = []
+            for station in metro_stations:
+                station_name = station.get('name', '').lower().strip()
+                if station_name and station_name not in seen_names:
+                    seen_names.add(station_name)
+                    unique_stations.append(station)
+            
+            return jsonify({
+                'stations': unique_stations,
+                'count': len(unique_stations)
+            })
+        except Exception as e:
+            print(f"Error fetching metro stations: {e}")
+            return jsonify({'stations': [], 'count': 0, 'error': str(e)})
+    
+    @app.route('/api/geocode', methods=['GET'])
+    def geocode():
+        """API endpoint to autocomplete an address, place or station name (q, limit)"""
+        query = request.args.get('q', '')
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        results = get_gazetteer().search(query, limit)
+        return jsonify({'results': results, 'count': len(results)})
+    
+    @app.route('/api/reverse', methods=['GET'])
+    def reverse_geocode():
+        """API endpoint to describe a point by the closest known address, street or station"""
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+        except (KeyError, ValueError):
+            return jsonify({'error': 'lat and lon are required numbers'}), 400
+        
+        result = get_gazetteer().reverse(lat, lon)
+        if result is None:
+            return jsonify({'error': 'No known place near this location'}), 404
+        return jsonify(result)
+    
+    @app.route('/api/cache-stats', methods=['GET'])
+    def get_cache_stats():
+        """API endpoint to get POI cache hit/miss/eviction and request coalescing counters"""
+        return jsonify({**get_poi_cache().stats(), **poi_flights.stats()})
+    
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """Prometheus endpoint with request, upstream, cache and POI metrics"""
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/api/houses', methods=['POST'])
+    def add_house():
+        """API endpoint for sellers to add a house listing"""
+        try:
+            data = request.json
+            
+            # Validate required fields
+            required_fields = ['title', 'address', 'latitude', 'longitude', 'price', 'description']
+            for field in required_fields:
+                if field not in data:
+                    return jsonify({'error': f'Missing required field: {field}'}), 400
+            
+            lat = float(data['latitude'])
+            lon = float(data['longitude'])
+            
+            # Validate Azerbaijan bounds
+            if not is_in_azerbaijan(lat, lon):
+                return jsonify({'error': 'Location must be within Azerbaijan bounds'}), 400
+            
+            # Create new house entry (the repository assigns its id)
+            new_house = {
+                'title': data['title'],
+                'address': data['address'],
+                'latitude': lat,
+                'longitude': lon,
+                'price': float(data['price']),
+                'description': data.get('description', ''),
+                'bedrooms': data.get('bedrooms', 0),
+                'bathrooms': data.get('bathrooms', 0),
+                'area': data.get('area', 0),
+                'seller_name': data.get('seller_name', 'Anonymous'),
+                'seller_phone': data.get('seller_phone', ''),
+                'created_at': datetime.now().isoformat()
+            }
+            
+            # Save houses
+            new_house = get_house_repository().add(new_house)
+            if new_house is not None:
+                # Precompute its amenity profile in the background
+                get_profile_store().refresh_async([new_house])
+                return jsonify({'success': True, 'house': new_house}), 201
+            else:
+                return jsonify({'error': 'Failed to save house'}), 500
+                
+        except Exception as e:
+            print(f"Error adding house: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/houses', methods=['GET'])
+    def get_houses():
+        """API endpoint to get all houses, optionally a page at a time (limit, cursor)"""
+        repository = get_house_repository()
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            cursor = request.args.get('cursor')
+            after_id = decode_cursor(cursor, {'i': int})['i'] if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def build():
+            if limit is None:
+                # Copy the shared house dicts - quality scores are added to them
+                stored = repository.all()
+                houses = [{**h, 'quality_score': score}
+                          for h, score in zip(stored, repository.quality_scores(stored))]
+                return jsonify({'houses': houses, 'count': len(houses)})
+            
+            # Fetch one extra house to know if there is a next page
+            page = repository.page_by_id(after_id, limit + 1)
+            houses = [{**h, 'quality_score': score}
+                      for h, score in zip(page[:limit], repository.quality_scores(page[:limit]))]
+            
+            return jsonify({
+                'houses': houses,
+                'count': len(houses),
+                'total': repository.count(),
+                'next_cursor': encode_cursor({'i': houses[-1]['id']}) if len(page) > limit else None
+            })
+        
+        # The body only depends on the data version and the page asked for
+        version = repository.current_version()
+        etag = make_etag('houses', version, limit, cursor)
+        return conditional(etag, version_time(version) if version else None, HOUSES_MAX_AGE, build)
+    
+    @app.route('/api/houses/viewport', methods=['GET'])
+    def get_houses_in_viewport():
+        """API endpoint to get the houses to draw for a map viewport (bbox, zoom)
+
+        bbox is "west,south,east,north" as sent by Leaflet's toBBoxString().
+        Zoomed out, listings sharing a cell come back as clusters with their
+        count, centroid and price range.
+        """
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in request.args['bbox'].split(','))
+            zoom = int(request.args['zoom'])
+        except (KeyError, ValueError):
+            return jsonify({'error': 'bbox (west,south,east,north) and zoom are required'}), 400
+        if not (0 <= zoom <= 22 and min_lat <= max_lat and min_lon <= max_lon):
+            return jsonify({'error': 'Invalid bbox or zoom'}), 400
+        
+        repository = get_house_repository()
+        
+        def build():
+            clusters, houses = repository.viewport(min_lat, max_lat, min_lon, max_lon, zoom)
+            return jsonify({
+                'zoom': zoom,
+                'clusters': clusters,
+                'houses': houses,
+                'count': len(houses) + sum(c['count'] for c in clusters)
+            })
+        
+        version = repository.current_version()
+        etag = make_etag('viewport', version, request.args['bbox'], zoom)
+        return conditional(etag, version_time(version) if version else None, HOUSES_MAX_AGE, build)
+    
+    @app.route('/api/market', methods=['GET'])
+    def get_market():
+        """API endpoint to get price and price-per-m² statistics by city and district"""
+        repository = get_house_repository()
+        version = repository.current_version()
+        return conditional(make_etag('market', version), version_time(version) if version else None,
+                           HOUSES_MAX_AGE, lambda: jsonify(repository.market_summary()))
+    
+    @app.route('/api/houses/search', methods=['POST'])
+    def search_houses():
+        """API endpoint for buyers to search houses by price range and requirements
+
+        Pass limit to get the best matches a page at a time, and the returned
+        next_cursor to get the following page.
+        """
+        try:
+            data = request.json
+            min_price = float(data.get('min_price', 0))
+            max_price = float(data.get('max_price', float('inf')))
+            requirements = data.get('requirements', {})
+            
+            try:
+                limit = parse_limit(data.get('limit'))
+                cursor = decode_cursor(data['cursor'], {'q': str, 's': NUMBER, 'i': int}) if data.get('cursor') else None
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            repository = get_house_repository()
+            signature = query_signature(min_price, max_price, requirements)
+            if cursor is not None and cursor.get('q') != signature:
+                return jsonify({'error': 'Cursor does not belong to this search'}), 400
+            
+            # Score every house in the price range once per data version; later
+            # pages reuse the scores. Ranking key is (-match_score, id)
+            ranking_key = (signature, repository.current_version())
+            candidates = search_rankings.get(ranking_key)
+            if candidates is None:
+                # Filter houses by price range
+                filtered_houses = repository.in_price_range(min_price, max_price)
+                
+                # Scores come from the precomputed amenity profiles. Houses whose
+                # profile is still being computed rank last, unscored
+                with phase('profiles'):
+                    profiles = get_profile_store().profiles_for(filtered_houses)
+                with phase('scoring'):
+                    candidates = [
+                        ((-profile_score(profile, requirements) if profile is not None else PENDING_RANK,
+                          house['id']), house, profile)
+                        for house, profile in zip(filtered_houses, profiles)
+                    ]
+                # Rank again once the pending profiles are in
+                if all(profile is not None for profile in profiles):
+                    search_rankings.put(ranking_key, candidates)
+            
+            # Sort by match score (highest first), keeping only the requested page
+            after = (cursor['s'], cursor['i']) if cursor is not None else None
+            page, has_more = top_k(candidates, limit, key=lambda c: c[0], after=after)
+            
+            # Get amenities: hospital, police, school, and nearest metro
+            scored_houses = []
+            for (neg_score, _), house, profile in page:
+                if profile is None:
+                    scored_house = {**house, 'match_score': None, 'amenities': None, 'profile_pending': True}
+                else:
+                    scored_house = {
+                        **house,
+                        'match_score': -neg_score,
+                        'amenities': profile_amenities(profile)
+                    }
+                scored_houses.append(scored_house)
+            
+            response = {
+                'houses': scored_houses,
+                'count': len(scored_houses)
+            }
+            if limit is not None:
+                response['total'] = len(candidates)
+                response['next_cursor'] = encode_cursor(
+                    {'q': signature, 's': page[-1][0][0], 'i': page[-1][0][1]}) if has_more else None
+            return jsonify(response)
+            
+        except Exception as e:
+            print(f"Error searching houses: {e}")
+            import traceback
+            traceback.print_exc()
+            return jsonify({'error': str(e)}), 500
+
@@ -1,11 +1,11 @@
-@echo off
-echo Installing dependencies...
-pip install -r requirements.txt
-echo.
-echo Starting the application...
-echo Open your browser and go to: http://localhost:5000
-echo Press Ctrl+C to stop the server
-echo.
-python app.py
-pause
-
+@echo off
+echo Installing dependencies...
+pip install -r requirements.txt
+echo.
+echo Starting the application...
+echo Open your browser and go to: http://localhost:5000
+echo Press Ctrl+C to stop the server
+echo.
+python app.py
+pause
+
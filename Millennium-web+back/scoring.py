@@ -0,0 +1,90 @@
+"""Vectorized NumPy scoring engine for evaluation grids"""
+import numpy as np
+from geo import EARTH_RADIUS_KM
+
+# Upper bound on cells x POIs distances held in memory at once
+MAX_MATRIX_ELEMENTS = 2_000_000
+
+def haversine_matrix(lats, lons, place_lats, place_lons):
+    """Distances in km between every point and every place (points x places)
+
+    Uses the same formula and operation order as geo.calculate_distance.
+    """
+    lat1 = lats[:, None]
+    lat2 = place_lats[None, :]
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(place_lons[None, :] - lons[:, None])
+    a = (np.sin(dlat/2) * np.sin(dlat/2) +
+         np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) *
+         np.sin(dlon/2) * np.sin(dlon/2))
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+def nearest_places(lats, lons, places):
+    """Get the distance to and index of the closest place (of a PoiCollection) for every point"""
+    place_lats, place_lons = places.lats, places.lons
+    chunk = max(1, MAX_MATRIX_ELEMENTS // len(places))
+    min_distances = np.empty(len(lats))
+    closest = np.empty(len(lats), dtype=np.intp)
+    for start in range(0, len(lats), chunk):
+        distances = haversine_matrix(lats[start:start + chunk], lons[start:start + chunk], place_lats, place_lons)
+        # argmin keeps the first of equal distances, like the scalar scan
+        indices = distances.argmin(axis=1)
+        closest[start:start + chunk] = indices
+        min_distances[start:start + chunk] = distances[np.arange(len(indices)), indices]
+    return min_distances, closest
+
+def proximity_scores(weight, distances, radius):
+    """Vectorized utils.proximity_score over an array of distances (km); inf scores 0"""
+    # Maximum score if within 500m, decreasing linearly to 0 at the radius
+    radius_km = radius / 1000
+    falloff = weight * 10 * (1 - (distances - 0.5) / (radius_km - 0.5))
+    return np.where(distances <= 0.5, weight * 10, np.where(distances <= radius_km, falloff, 0))
+
+def score_grid(points, place_types, cached_pois):
+    """Score (lat, lon) points against cached POIs
+
+    Returns one {'score', 'amenities'} dict per point, identical to what
+    utils.score_location returns for the same inputs. place_types comes from
+    utils.scoring_place_types and every weighted type must be in cached_pois,
+    as a PoiCollection.
+    """
+    lats = np.array([p[0] for p in points], dtype=np.float64)
+    lons = np.array([p[1] for p in points], dtype=np.float64)
+    score = np.zeros(len(points))
+    max_score = 0
+    amenities = [{} for _ in points]
+
+    for place_type, config in place_types.items():
+        weight = config['weight']
+        if weight <= 0:
+            continue
+        max_score += weight * 10
+        places = cached_pois[place_type]
+
+        if not places:
+            for found in amenities:
+                found[place_type] = {'distance': None, 'name': None, 'count': 0}
+            continue
+
+        min_distances, closest = nearest_places(lats, lons, places)
+
+        score += proximity_scores(weight, min_distances, config['radius'])
+
+        count = len(places)
+        names = [places.names[i] for i in places.name_ids[closest].tolist()]
+        for found, distance, name in zip(amenities, min_distances.tolist(), names):
+            found[place_type] = {
+                'distance': round(distance, 2),
+                'name': name,
+                'count': count
+            }
+
+    if max_score == 0:
+        return [{'score': 0, 'amenities': found} for found in amenities]
+
+    normalized = (score / max_score) * 100
+    return [
+        {'score': round(value, 2), 'amenities': found}
+        for value, found in zip(normalized.tolist(), amenities)
+    ]
@@ -0,0 +1,216 @@
+"""Multi-process server without extra dependencies, for development and load testing
+
+    python serve.py
+    python serve.py --workers 8 --port 8000
+
+It runs werkzeug's development server in each worker, so use gunicorn in
+production (see gunicorn.conf.py). Each worker is a separate process with
+its own request threads, so requests use every core. Workers share the POI
+cache through its SQLite file. Send SIGHUP to the master process for a warm
+reload: new workers are started with freshly imported code and configuration
+(config.py and .env), then the old ones finish their requests and exit.
+SIGTERM or Ctrl+C stops the server the same way. Windows can't fork, so
+there it runs a single threaded server.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from importlib import reload
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+# The environment before config.py loads .env into it, so reloaded workers
+# read .env again with the same precedence
+BASE_ENVIRON = dict(os.environ)
+
+import config
+
+# A worker that exits this soon after starting is restarted with a delay
+MIN_WORKER_UPTIME = 5  # seconds
+
+class InFlight:
+    """Count of connections being handled, so a stopping worker can let them finish"""
+
+    def __init__(self):
+        self.count = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def track(self):
+        with self._condition:
+            self.count += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.count -= 1
+                self._condition.notify_all()
+
+    def wait(self, timeout):
+        """Wait until nothing is in flight; returns False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.count == 0, timeout)
+
+def tracked_handler(in_flight):
+    """Request handler class that counts its connections in in_flight"""
+    class TrackedRequestHandler(WSGIRequestHandler):
+        def handle(self):
+            with in_flight.track():
+                super().handle()
+    return TrackedRequestHandler
+
+def run_worker(sock, index, graceful_timeout):
+    """Serve requests from the shared socket until SIGTERM"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master handles Ctrl+C
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    # Reread the configuration, so a reload picks up changes to .env and config.py
+    host, port = config.SERVER_HOST, config.SERVER_PORT
+    os.environ.clear()
+    os.environ.update(BASE_ENVIRON)
+    reload(config)
+    # The warm-up fills the shared cache, so one worker per generation runs it
+    if index > 0:
+        config.WARMUP_ON_STARTUP = False
+    # Import the app after forking, so a reload picks up new code and every
+    # worker opens its own database connections
+    from app import app
+
+    in_flight = InFlight()
+    server = make_server(host, port, app, threaded=True,
+                         request_handler=tracked_handler(in_flight), fd=sock.fileno())
+    # serve_forever runs on this thread, so stop it from another one
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Worker {index} (pid {os.getpid()}) ready")
+    server.serve_forever()
+
+    if not in_flight.wait(graceful_timeout):
+        print(f"Worker {index} (pid {os.getpid()}) stopping with {in_flight.count} requests unfinished")
+    server.server_close()
+
+class Master:
+    """Forks the workers, restarts crashed ones and handles reloads"""
+
+    def __init__(self, sock, workers, graceful_timeout):
+        self.sock = sock
+        self.size = workers
+        self.graceful_timeout = graceful_timeout
+        self.generation = 0
+        self.workers = {}  # pid -> (generation, index, started_at)
+        self._reload = False
+        self._stop = False
+
+    def spawn(self, index):
+        # Otherwise the child inherits and prints the master's buffered output again
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, index, self.graceful_timeout)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = (self.generation, index, time.monotonic())
+
+    def signal_workers(self, signum, generation=None):
+        for pid, (worker_generation, _, _) in list(self.workers.items()):
+            if generation is None or worker_generation == generation:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def reap(self):
+        """Collect exited workers; restart those of the current generation"""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, index, started_at = self.workers.pop(pid, (None, None, None))
+            if generation != self.generation or self._stop:
+                continue
+            print(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started_at < MIN_WORKER_UPTIME:
+                time.sleep(1)
+            self.spawn(index)
+
+    def reload(self):
+        """Start a new generation of workers, then stop the old one gracefully"""
+        old_generation = self.generation
+        self.generation += 1
+        print(f"Reloading: starting {self.size} new workers")
+        for index in range(self.size):
+            self.spawn(index)
+        self.signal_workers(signal.SIGTERM, old_generation)
+
+    def stop(self):
+        print("Stopping workers...")
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            for pid in list(self.workers):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                        del self.workers[pid]
+                except ChildProcessError:
+                    del self.workers[pid]
+            time.sleep(0.1)
+        self.signal_workers(signal.SIGKILL)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, '_reload', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, '_stop', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, '_stop', True))
+
+        print(f"Master (pid {os.getpid()}) serving on http://{config.SERVER_HOST}:{config.SERVER_PORT} "
+              f"with {self.size} workers")
+        for index in range(self.size):
+            self.spawn(index)
+        while not self._stop:
+            if self._reload:
+                self._reload = False
+                self.reload()
+            self.reap()
+            time.sleep(0.2)
+        self.stop()
+
+def listen(host, port):
+    """Open the listening socket the workers share"""
+    sock = socket.create_server((host, port), family=socket.AF_INET6 if ':' in host else socket.AF_INET,
+                                backlog=1024, reuse_port=False)
+    sock.set_inheritable(True)
+    return sock
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the application with several worker processes')
+    parser.add_argument('--host', default=config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS)
+    args = parser.parse_args(argv)
+    config.SERVER_HOST, config.SERVER_PORT = args.host, args.port
+
+    if not hasattr(os, 'fork'):
+        print("Worker processes need fork(); running a single threaded server")
+        from app import app
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+        return 0
+
+    sock = listen(args.host, args.port)
+    Master(sock, max(1, args.workers), config.SERVER_GRACEFUL_TIMEOUT).run()
+    sock.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Coalescing of concurrent identical upstream fetches ("singleflight")"""
+import threading
+
+class Flight:
+    """One in-flight call that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """Wait for the call to finish and return its result (or raise its error)"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """Registry of in-flight calls by key
+
+    The first caller for a key leads and makes the call; callers arriving
+    while it runs wait for it and share the result. A leader must finish its
+    flights before waiting on anyone else's, so callers can't deadlock.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {'upstream_fetches': 0, 'coalesced': 0}
+
+    def begin(self, key):
+        """Join the flight for a key; returns (flight, is_leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.counters['coalesced'] += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self.counters['upstream_fetches'] += 1
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        """Publish the leader's result to the waiting callers"""
+        flight.result = result
+        flight.error = error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def do(self, key, fn):
+        """Call fn(), or wait for the identical call already in flight"""
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait()
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result
+
+    def stats(self):
+        """Get the upstream fetch and coalesced call counters"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self._flights)
+        return stats
@@ -0,0 +1,157 @@
+"""Bucket-grid spatial index for nearest-place and radius queries"""
+import math
+import threading
+from collections import OrderedDict
+from geo import EARTH_RADIUS_KM, calculate_distance, bounding_box
+from poi_collection import PoiCollection
+
+# Aim for a handful of places per grid cell
+PLACES_PER_CELL = 4
+MIN_CELL_SIZE = 0.002  # degrees, about 200m
+MAX_CELL_SIZE = 0.05  # degrees, about 5km
+
+class PlaceIndex:
+    """Grid of buckets over place coordinates
+
+    Nearest-place queries search rings of cells outwards from the query point
+    and stop once no unvisited cell can hold anything closer, so they only
+    touch the places around the point instead of the whole list. Places are a
+    PoiCollection or a list of place dicts.
+    """
+
+    def __init__(self, places):
+        self.places = places
+        self._buckets = {}
+        if not places:
+            self.cell_size = MAX_CELL_SIZE
+            self._max_abs_lat = 0
+            return
+
+        if isinstance(places, PoiCollection):
+            coords = list(zip(places.lats.tolist(), places.lons.tolist()))
+        else:
+            coords = [(p['geometry']['location']['lat'], p['geometry']['location']['lng']) for p in places]
+        lats = [c[0] for c in coords]
+        lons = [c[1] for c in coords]
+        area = max(max(lats) - min(lats), MIN_CELL_SIZE) * max(max(lons) - min(lons), MIN_CELL_SIZE)
+        cell_size = math.sqrt(area * PLACES_PER_CELL / len(places))
+        self.cell_size = min(max(cell_size, MIN_CELL_SIZE), MAX_CELL_SIZE)
+        self._max_abs_lat = max(abs(min(lats)), abs(max(lats)))
+
+        for index, (lat, lon) in enumerate(coords):
+            self._buckets.setdefault(self._cell(lat, lon), []).append((lat, lon, index))
+
+        keys = self._buckets.keys()
+        self._row_range = (min(k[0] for k in keys), max(k[0] for k in keys))
+        self._col_range = (min(k[1] for k in keys), max(k[1] for k in keys))
+
+    def __len__(self):
+        return len(self.places)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def _ring_bound(self, rings, lat):
+        """Lower bound (km) on the distance to places outside the searched rings"""
+        gap = math.radians(rings * self.cell_size)
+        lat_bound = EARTH_RADIUS_KM * gap
+        # Two points whose latitudes are both within +-max_lat and whose longitudes
+        # differ by gap are at least this far apart
+        max_lat = math.radians(max(self._max_abs_lat, abs(lat)))
+        lon_bound = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(max_lat) * math.sin(min(gap, math.pi) / 2)))
+        return min(lat_bound, lon_bound)
+
+    def _scan(self, cells, lat, lon, best):
+        for cell in cells:
+            for place_lat, place_lon, index in self._buckets.get(cell, ()):
+                distance = calculate_distance(lat, lon, place_lat, place_lon)
+                # Ties go to the earlier place, like a linear scan would
+                if (distance, index) < best:
+                    best = (distance, index)
+        return best
+
+    def nearest(self, lat, lon):
+        """Get (distance_km, place) of the closest place, or (None, None) if empty"""
+        distance, index = self.nearest_index(lat, lon)
+        if index is None:
+            return None, None
+        return distance, self.places[index]
+
+    def nearest_index(self, lat, lon):
+        """Get (distance_km, index) of the closest place, or (None, None) if empty"""
+        if not self._buckets:
+            return None, None
+
+        row, col = self._cell(lat, lon)
+        max_rings = max(abs(row - self._row_range[0]), abs(row - self._row_range[1]),
+                        abs(col - self._col_range[0]), abs(col - self._col_range[1]))
+        best = (float('inf'), -1)
+        best = self._scan([(row, col)], lat, lon, best)
+
+        for ring in range(1, max_rings + 1):
+            if best[0] < self._ring_bound(ring - 1, lat):
+                break
+            if 8 * ring > len(self._buckets):
+                # Far from the data - cheaper to visit the remaining buckets directly
+                remaining = [cell for cell in self._buckets
+                             if max(abs(cell[0] - row), abs(cell[1] - col)) >= ring]
+                best = self._scan(remaining, lat, lon, best)
+                break
+            cells = [(row + dr, col + dc) for dr in range(-ring, ring + 1) for dc in (-ring, ring)]
+            cells += [(row + dr, col + dc) for dr in (-ring, ring) for dc in range(-ring + 1, ring)]
+            best = self._scan(cells, lat, lon, best)
+
+        return best
+
+    def within(self, lat, lon, radius_km):
+        """Get (distance_km, place) pairs within radius_km, in list order"""
+        return [(distance, self.places[index]) for distance, index in self.within_indexes(lat, lon, radius_km)]
+
+    def within_indexes(self, lat, lon, radius_km):
+        """Get (distance_km, index) pairs within radius_km, in list order"""
+        if not self._buckets:
+            return []
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        min_row, min_col = self._cell(min_lat, min_lon)
+        max_row, max_col = self._cell(max_lat, max_lon)
+
+        found = []
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._buckets):
+            cells = [cell for cell in self._buckets
+                     if min_row <= cell[0] <= max_row and min_col <= cell[1] <= max_col]
+        else:
+            cells = [(r, c) for r in range(min_row, max_row + 1) for c in range(min_col, max_col + 1)]
+        for cell in cells:
+            for place_lat, place_lon, index in self._buckets.get(cell, ()):
+                distance = calculate_distance(lat, lon, place_lat, place_lon)
+                if distance <= radius_km:
+                    found.append((index, distance))
+        found.sort()
+        return [(distance, index) for index, distance in found]
+
+    def count_within(self, lat, lon, radius_km):
+        """Count the places within radius_km"""
+        return len(self.within_indexes(lat, lon, radius_km))
+
+# Indexes of recently used place lists, so each fetched list is indexed once
+MAX_INDEXES = 256
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def index_for(places):
+    """Get the (shared) index of a list of places, building it on first use"""
+    key = id(places)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        # Keep a reference to the list so its id can't be reused while cached
+        if entry is not None and entry[0] is places:
+            _indexes.move_to_end(key)
+            return entry[1]
+
+    index = PlaceIndex(places)
+    with _indexes_lock:
+        _indexes[key] = (places, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,29 @@
+"""Test setup: the application modules live in the parent directory"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CENTER = (40.4093, 49.8671)
+
+def make_places(rng, count, spread=0.05, center=CENTER):
+    """Random place dicts around center, some without a name or with tags"""
+    return [
+        {
+            'geometry': {'location': {'lat': center[0] + rng.uniform(-spread, spread),
+                                      'lng': center[1] + rng.uniform(-spread, spread)}},
+            'name': rng.choice([f'Place {rng.randint(0, count // 2)}', None]),
+            'tags': rng.choice([{}, {'amenity': 'cafe', 'name:en': f'Cafe {rng.randint(0, 9)}'}])
+        }
+        for _ in range(count)
+    ]
+
+@pytest.fixture
+def center():
+    return CENTER
+
+@pytest.fixture
+def random_places():
+    """make_places(rng, count, spread=0.05)"""
+    return make_places
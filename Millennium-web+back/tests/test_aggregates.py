@@ -0,0 +1,27 @@
+"""Quantile sketches must stay within their accuracy and the observed range"""
+import math
+import random
+import pytest
+from aggregates import QuantileSketch
+
+def exact_quantile(values, fraction):
+    values = sorted(values)
+    return values[max(1, math.ceil(fraction * len(values))) - 1]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_quantiles_within_accuracy_and_range(seed):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(7, rng.uniform(0.05, 1)) for _ in range(rng.randint(1, 500))]
+    sketch = QuantileSketch(accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for fraction in (0, 0.1, 0.25, 0.5, 0.75, 0.9, 1):
+        estimate = sketch.quantile(fraction)
+        assert min(values) <= estimate <= max(values)
+        assert estimate == pytest.approx(exact_quantile(values, fraction), rel=0.03)
+
+def test_single_value_is_exact():
+    sketch = QuantileSketch()
+    sketch.add(1894.74)
+    assert sketch.quantile(0.75) == 1894.74
+    assert QuantileSketch().quantile(0.5) is None
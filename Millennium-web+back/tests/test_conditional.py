@@ -0,0 +1,28 @@
+"""Conditional GET must never answer 304 for a copy older than the data"""
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from conditional import conditional, http_last_modified
+
+app = Flask(__name__)
+
+def respond(etag, modified, headers):
+    with app.test_request_context(headers=headers):
+        return conditional(etag, modified, 0, lambda: app.response_class('body'))
+
+def test_changes_within_the_current_second_have_no_last_modified():
+    now = datetime(2026, 10, 18, 12, 0, 5, 900000, tzinfo=timezone.utc)
+    assert http_last_modified(now - timedelta(milliseconds=500), now) is None
+    assert http_last_modified(now - timedelta(seconds=2), now) == datetime(2026, 10, 18, 12, 0, 3, tzinfo=timezone.utc)
+
+def test_responses_in_the_second_of_a_change_revalidate_by_etag_only():
+    response = respond('a', datetime.now(timezone.utc), {})
+    assert 'Last-Modified' not in response.headers
+    assert response.headers['ETag'] == '"a"'
+
+def test_etag_wins_over_if_modified_since():
+    modified = datetime.now(timezone.utc) - timedelta(seconds=10)
+    headers = {'If-None-Match': '"old"',
+               'If-Modified-Since': (modified + timedelta(seconds=5)).strftime('%a, %d %b %Y %H:%M:%S GMT')}
+    assert respond('new', modified, headers).status_code == 200
+    headers['If-None-Match'] = '"new"'
+    assert respond('new', modified, headers).status_code == 304
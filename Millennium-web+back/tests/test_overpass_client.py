@@ -0,0 +1,74 @@
+"""Failover and hedging of the Overpass client, against the mock Overpass server"""
+import os
+import sys
+import time
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from mock_overpass import serve
+from overpass_client import OverpassClient
+from utils import build_overpass_query
+
+QUERY = build_overpass_query(40.4093, 49.8671, 'school', 1500)
+
+@pytest.fixture
+def mirrors():
+    """Start mock servers: mirrors(latency=..., status=...) -> (endpoint, replay)"""
+    servers = []
+
+    def start(**options):
+        server, replay = serve(**options)
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}/api/interpreter', replay
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_fails_over_to_the_next_mirror(mirrors):
+    broken, broken_replay = mirrors(status=503)
+    working, working_replay = mirrors()
+    client = OverpassClient([broken, working], timeout=5, hedge_after=5)
+
+    data = client.query(QUERY)
+
+    assert data['elements']
+    assert broken_replay.requests == 1 and working_replay.requests == 1
+    assert client.counters['failovers'] == 1
+    # The broken mirror is tried last until its cooldown ends
+    assert client._ordered_endpoints() == [working, broken]
+
+def test_hedges_a_slow_mirror_and_takes_the_first_answer(mirrors):
+    slow, slow_replay = mirrors(latency=2)
+    fast, fast_replay = mirrors()
+    client = OverpassClient([slow, fast], timeout=5, hedge_after=0.2)
+
+    start = time.perf_counter()
+    data = client.query(QUERY)
+
+    assert time.perf_counter() - start < 1.5
+    assert data['elements']
+    assert client.counters['hedged'] == 1
+    # The slow mirror is still sleeping when the fast one has answered
+    assert fast_replay.requests == 1 and slow_replay.requests == 0
+
+def test_raises_when_every_mirror_fails(mirrors):
+    endpoints = [mirrors(status=502)[0], mirrors(status=504)[0]]
+    client = OverpassClient(endpoints, timeout=5, hedge_after=5)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.query(QUERY)
+    assert client.counters['failures'] == 2
+
+def test_long_queries_wait_without_hedging(mirrors):
+    slow, slow_replay = mirrors(latency=0.6)
+    fast, fast_replay = mirrors()
+    client = OverpassClient([slow, fast], timeout=0.3, hedge_after=0.1)
+
+    data = client.query(QUERY, timeout=3, hedge=False)
+
+    assert data['elements']
+    assert client.counters['hedged'] == 0 and client.counters['failures'] == 0
+    assert slow_replay.requests == 1 and fast_replay.requests == 0
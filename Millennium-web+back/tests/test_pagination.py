@@ -0,0 +1,21 @@
+"""Cursors must round-trip and reject anything the endpoints can't page from"""
+import pytest
+from pagination import NUMBER, decode_cursor, encode_cursor
+
+SEARCH_FIELDS = {'q': str, 's': NUMBER, 'i': int}
+
+def test_round_trip():
+    data = {'q': 'abc', 's': -87.5, 'i': 12}
+    assert decode_cursor(encode_cursor(data), SEARCH_FIELDS) == data
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    encode_cursor([1, 2]),
+    encode_cursor({'q': 'abc', 'i': 12}),
+    encode_cursor({'q': 'abc', 's': 'high', 'i': 12}),
+    encode_cursor({'q': 'abc', 's': 1, 'i': '12'}),
+    encode_cursor({'q': 'abc', 's': 1, 'i': True}),
+])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, SEARCH_FIELDS)
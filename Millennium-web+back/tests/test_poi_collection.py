@@ -0,0 +1,47 @@
+"""PoiCollection must answer like the list of place dicts it replaces"""
+import random
+import pytest
+from geo import calculate_distance
+from poi_collection import PLACE_TYPES, PoiCollection
+from spatial_index import PlaceIndex
+
+@pytest.mark.parametrize('seed', range(3))
+def test_round_trips(seed, random_places):
+    places = random_places(random.Random(seed), 80)
+    collection = PoiCollection.from_places(places, 'cafe')
+    assert collection.to_places() == places
+    assert [collection[i] for i in range(len(collection))] == places
+    assert PoiCollection.from_json(collection.to_json(), 'cafe').to_places() == places
+    assert all(collection.place_type(i) == 'cafe' for i in range(len(collection)))
+
+@pytest.mark.parametrize('seed', range(3))
+def test_within_radius_matches_brute_force(seed, center, random_places):
+    rng = random.Random(seed)
+    places = random_places(rng, 200)
+    collection = PoiCollection.from_places(places, 'school')
+    for _ in range(10):
+        lat, lon = center[0] + rng.uniform(-0.03, 0.03), center[1] + rng.uniform(-0.03, 0.03)
+        radius_km = rng.uniform(0.2, 4)
+        expected = [p for p in places if calculate_distance(
+            lat, lon, p['geometry']['location']['lat'], p['geometry']['location']['lng']) <= radius_km]
+        assert collection.within_radius(lat, lon, radius_km).to_places() == expected
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_matches_place_dicts(seed, center, random_places):
+    rng = random.Random(seed)
+    places = random_places(rng, 150)
+    by_collection = PlaceIndex(PoiCollection.from_places(places, 'park'))
+    by_dicts = PlaceIndex(places)
+    for _ in range(20):
+        lat, lon = center[0] + rng.uniform(-0.1, 0.1), center[1] + rng.uniform(-0.1, 0.1)
+        distance, place = by_collection.nearest(lat, lon)
+        expected_distance, expected_place = by_dicts.nearest(lat, lon)
+        assert distance == pytest.approx(expected_distance)
+        assert place == expected_place
+        assert by_collection.within_indexes(lat, lon, 2) == by_dicts.within_indexes(lat, lon, 2)
+
+def test_unknown_types_dont_grow_the_type_table():
+    size = len(PLACE_TYPES)
+    for i in range(300):
+        PoiCollection.empty(f'unknown-{i}')
+    assert len(PLACE_TYPES) == size
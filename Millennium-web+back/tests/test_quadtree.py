@@ -0,0 +1,28 @@
+import math
+import pytest
+from quadtree import refine
+
+def fake_scorer(scored):
+    """Score points by how close they are to a peak, recording every point scored"""
+    def score_points(points):
+        scored.extend(points)
+        return [{'lat': lat, 'lon': lon, 'score': max(0.0, 100 - 2000 * math.hypot(lat - 40.4, lon - 49.85))}
+                for lat, lon in points]
+    return score_points
+
+def grid(size, step):
+    half = size // 2
+    return [(40.4 + row * step, 49.85 + col * step) for row in range(-half, half + 1) for col in range(-half, half + 1)]
+
+@pytest.mark.parametrize('grid_size, cell_budget', [(15, 200), (5, 10), (5, 25), (9, 100), (5, 1000)])
+def test_scored_cells_stay_within_budget(grid_size, cell_budget):
+    scored = []
+    leaves = refine(grid(grid_size, 0.015), 0.015, fake_scorer(scored), max_depth=3, cell_budget=cell_budget,
+                    score_threshold=50, variation_threshold=10)
+    assert len(scored) <= cell_budget
+    assert leaves
+
+def test_roots_over_budget_keep_the_center():
+    scored = []
+    refine(grid(5, 0.015), 0.015, fake_scorer(scored), max_depth=0, cell_budget=9)
+    assert sorted(scored) == sorted(grid(3, 0.015))
@@ -0,0 +1,47 @@
+"""The vectorized scoring engine must match the scalar reference, score_location"""
+import random
+import pytest
+from poi_collection import PoiCollection
+from utils import score_points, scoring_place_types
+
+def random_pois(rng, random_places):
+    """Cached POIs for every scored type; one type is left empty"""
+    place_types = list(scoring_place_types({}))
+    pois = {place_type: PoiCollection.from_places(random_places(rng, rng.randint(1, 60)), place_type)
+            for place_type in place_types}
+    pois[place_types[-1]] = PoiCollection.empty(place_types[-1])
+    return pois
+
+def random_grid(rng, center, size=12, spread=0.04):
+    return [(center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread))
+            for _ in range(size * size)]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_matches_scalar(seed, center, random_places):
+    rng = random.Random(seed)
+    pois = random_pois(rng, random_places)
+    points = random_grid(rng, center)
+    requirements = {key: rng.randint(0, 10) for key in
+                    ('school', 'hospital', 'market', 'cafe', 'restaurant', 'park', 'gym', 'pharmacy')}
+
+    vectorized = score_points(points, requirements, pois, vectorized=True)
+    scalar = score_points(points, requirements, pois, vectorized=False)
+
+    assert len(vectorized) == len(scalar) == len(points)
+    for fast, reference in zip(vectorized, scalar):
+        assert (fast['lat'], fast['lon']) == (reference['lat'], reference['lon'])
+        assert fast['score'] == pytest.approx(reference['score'], abs=0.01)
+        assert fast['amenities'].keys() == reference['amenities'].keys()
+        for place_type, found in reference['amenities'].items():
+            assert fast['amenities'][place_type]['count'] == found['count']
+            assert fast['amenities'][place_type]['name'] == found['name']
+            if found['distance'] is None:
+                assert fast['amenities'][place_type]['distance'] is None
+            else:
+                assert fast['amenities'][place_type]['distance'] == pytest.approx(found['distance'], abs=0.01)
+
+def test_no_requirements_scores_zero(center, random_places):
+    rng = random.Random(7)
+    points = random_grid(rng, center, size=3)
+    for location in score_points(points, {}, random_pois(rng, random_places), vectorized=True):
+        assert location['score'] == 0
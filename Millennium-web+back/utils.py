@@ -1,371 +1,566 @@
-"""Utility functions for the application"""
-import math
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import AZERBAIJAN_BOUNDS
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth radius in kilometers
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat/2) * math.sin(dlat/2) +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon/2) * math.sin(dlon/2))
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-def is_in_azerbaijan(lat, lon):
-    """Check if coordinates are within Azerbaijan bounds"""
-    return (AZERBAIJAN_BOUNDS['min_lat'] <= lat <= AZERBAIJAN_BOUNDS['max_lat'] and
-            AZERBAIJAN_BOUNDS['min_lon'] <= lon <= AZERBAIJAN_BOUNDS['max_lon'])
-
-def normalize_metro_station_name(name):
-    """Normalize and correct Baku metro station names"""
-    if not name:
-        return name
-    
-    # Common Baku metro station names mapping
-    metro_name_map = {
-        '28 May': '28 May',
-        '28 may': '28 May',
-        '28-may': '28 May',
-        'İçərişəhər': 'İçərişəhər',
-        'Icherisheher': 'İçərişəhər',
-        'Icheri Sheher': 'İçərişəhər',
-        'Sahil': 'Sahil',
-        'Gənclik': 'Gənclik',
-        'Genclik': 'Gənclik',
-        'Nəriman Nərimanov': 'Nəriman Nərimanov',
-        'Nariman Narimanov': 'Nəriman Nərimanov',
-        'Ulduz': 'Ulduz',
-        'Koroglu': 'Koroğlu',
-        'Koroğlu': 'Koroğlu',
-        'Qara Qarayev': 'Qara Qarayev',
-        'Kara Karayev': 'Qara Qarayev',
-        'Nəsimi': 'Nəsimi',
-        'Nasimi': 'Nəsimi',
-        'Azadlıq prospekti': 'Azadlıq prospekti',
-        'Azadliq prospekti': 'Azadlıq prospekti',
-        'Azadlıq Prospekti': 'Azadlıq prospekti',
-        'Nizami': 'Nizami',
-        'İnşaatçılar': 'İnşaatçılar',
-        'Inshaatchilar': 'İnşaatçılar',
-        'Elmler Akademiyası': 'Elmler Akademiyası',
-        'Elmler Akademiyasi': 'Elmler Akademiyası',
-        'Nizami Gəncəvi': 'Nizami Gəncəvi',
-        'Nizami Ganjavi': 'Nizami Gəncəvi',
-        'Bakmil': 'Bakmil',
-        'Avtovağzal': 'Avtovağzal',
-        'Avtovagzal': 'Avtovağzal',
-        '20 Yanvar': '20 Yanvar',
-        '20 yanvar': '20 Yanvar',
-        'Memar Əcəmi': 'Memar Əcəmi',
-        'Memar Ajami': 'Memar Əcəmi',
-        'Dərnəgül': 'Dərnəgül',
-        'Darnagul': 'Dərnəgül',
-        'Bakıxanov': 'Bakıxanov',
-        'Bakikhanov': 'Bakıxanov',
-        'Xalqlar Dostluğu': 'Xalqlar Dostluğu',
-        'Khalklar Dostlugu': 'Xalqlar Dostluğu',
-        'Neftçilər': 'Neftçilər',
-        'Neftchilar': 'Neftçilər',
-        'Avrora': 'Avrora',
-        'Həzi Aslanov': 'Həzi Aslanov',
-        'Hazi Aslanov': 'Həzi Aslanov'
-    }
-    
-    # Try exact match first
-    if name in metro_name_map:
-        return metro_name_map[name]
-    
-    # Try case-insensitive match
-    name_lower = name.lower().strip()
-    for key, value in metro_name_map.items():
-        if key.lower() == name_lower:
-            return value
-    
-    # If contains "metro" or "subway", try to extract the station name
-    if 'metro' in name_lower or 'subway' in name_lower:
-        # Remove common suffixes
-        cleaned = name.replace(' Metro', '').replace(' metro', '').replace(' Station', '').replace(' station', '')
-        if cleaned in metro_name_map:
-            return metro_name_map[cleaned]
-    
-    # Return original if no match found
-    return name
-
-def find_nearby_places(lat, lon, place_type, radius=2000):
-    """Find nearby places using Overpass API (OpenStreetMap) - FREE, no API key needed"""
-    
-    # Check if location is in Azerbaijan
-    if not is_in_azerbaijan(lat, lon):
-        return []
-    
-    # Map place types to OpenStreetMap tag queries
-    osm_queries = {
-        'school': [('amenity', 'school')],
-        'hospital': [('amenity', 'hospital')],
-        'supermarket': [('shop', 'supermarket')],
-        'market': [('shop', 'supermarket'), ('amenity', 'marketplace')],
-        'cafe': [('amenity', 'cafe')],
-        'restaurant': [('amenity', 'restaurant')],
-        'park': [('leisure', 'park')],
-        'gym': [('leisure', 'fitness_centre'), ('sport', 'gym')],
-        'pharmacy': [('amenity', 'pharmacy')],
-        'metro': [('railway', 'station'), ('station', 'subway'), ('public_transport', 'station')],
-        'police': [('amenity', 'police')]
-    }
-    
-    # Get the OSM tag queries
-    tag_queries = osm_queries.get(place_type, [('amenity', 'school')])
-    
-    # Use faster Overpass API endpoint (Kumi Systems is often faster)
-    overpass_url = "https://overpass.kumi.systems/api/interpreter"
-    
-    # Build the query for all tag combinations - simplified for speed
-    query_parts = []
-    if place_type == 'metro':
-        # Special query for metro stations - only subway stations
-        query_parts.append(f'node["railway"="station"]["station"="subway"](around:{radius},{lat},{lon});')
-        query_parts.append(f'way["railway"="station"]["station"="subway"](around:{radius},{lat},{lon});')
-        query_parts.append(f'node["public_transport"="station"]["station"="subway"](around:{radius},{lat},{lon});')
-        query_parts.append(f'way["public_transport"="station"]["station"="subway"](around:{radius},{lat},{lon});')
-    else:
-        # Only query nodes for speed (skip ways/relations)
-        for key, value in tag_queries:
-            query_parts.append(f'node["{key}"="{value}"](around:{radius},{lat},{lon});')
-    
-    query = f"[out:json][timeout:8];({' '.join(query_parts)}); out center;"
-    
-    try:
-        response = requests.post(overpass_url, data={'data': query}, timeout=8)
-        response.raise_for_status()
-        data = response.json()
-        
-        places = []
-        seen_coords = set()  # To avoid duplicates by coordinates
-        seen_names = set()  # To avoid duplicates by name (for metro stations)
-        
-        for element in data.get('elements', []):
-            # Get coordinates
-            place_lat = None
-            place_lon = None
-            
-            if element['type'] == 'node':
-                place_lat = element.get('lat')
-                place_lon = element.get('lon')
-            elif element['type'] == 'way' and 'center' in element:
-                place_lat = element['center'].get('lat')
-                place_lon = element['center'].get('lon')
-            elif element['type'] == 'relation' and 'center' in element:
-                place_lat = element['center'].get('lat')
-                place_lon = element['center'].get('lon')
-            
-            if place_lat is None or place_lon is None:
-                continue
-            
-            # Avoid duplicates (same location)
-            coord_key = (round(place_lat, 5), round(place_lon, 5))
-            if coord_key in seen_coords:
-                continue
-            seen_coords.add(coord_key)
-            
-            # Get name
-            tags = element.get('tags', {})
-            name = tags.get('name') or tags.get('brand') or f'{place_type.title()}'
-            
-            # For metro stations, normalize the name and filter for subway only
-            if place_type == 'metro':
-                # Only include if it's actually a subway/metro station
-                if tags.get('station') != 'subway' and tags.get('railway') != 'station':
-                    # Check if it has subway-related tags
-                    if 'subway' not in str(tags).lower() and 'metro' not in str(tags).lower():
-                        continue
-                # Normalize the station name
-                name = normalize_metro_station_name(name)
-                
-                # Filter out unwanted stations
-                name_lower = name.lower()
-                unwanted_stations = [
-                    'mehemmed hadi', 'mehəmməd hadi', 'mehemmedhadi', 'məhəmməd hadi',
-                    'azerneft', 'azərneft', 'azər neft yağ', 'azər neft yağ', 'azər neft',
-                    'ag seher', 'ağ şəhər', 'agseher', 'ağseher',
-                    'şah ismayıl xətai', 'shah ismayil xetai', 'şah ismayıl', 'shah ismayil', 'şah ismayıl xətai'
-                ]
-                if any(unwanted in name_lower for unwanted in unwanted_stations):
-                    continue
-                
-                # Avoid duplicate names (especially Memar Əcəmi)
-                name_key = name_lower.strip()
-                if name_key in seen_names:
-                    continue
-                seen_names.add(name_key)
-            
-            # Format to match expected structure
-            places.append({
-                'geometry': {
-                    'location': {
-                        'lat': place_lat,
-                        'lng': place_lon
-                    }
-                },
-                'name': name,
-                'tags': tags
-            })
-        
-        return places
-        
-    except requests.exceptions.Timeout:
-        print(f"Timeout fetching {place_type} from Overpass API")
-        return []
-    except Exception as e:
-        print(f"Error fetching places from Overpass API for {place_type}: {e}")
-        return []
-
-def fetch_pois_parallel(center_lat, center_lon, place_types_to_fetch, radius):
-    """Fetch POIs in parallel for faster loading"""
-    cached_pois = {}
-    
-    def fetch_single_poi(place_type):
-        return place_type, find_nearby_places(center_lat, center_lon, place_type, radius)
-    
-    # Use ThreadPoolExecutor for parallel requests
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_type = {executor.submit(fetch_single_poi, pt): pt for pt in place_types_to_fetch}
-        
-        for future in as_completed(future_to_type):
-            place_type, places = future.result()
-            cached_pois[place_type] = places
-    
-    return cached_pois
-
-def score_location(lat, lon, requirements, cached_pois=None):
-    """Score a location based on proximity to required amenities"""
-    score = 0
-    max_score = 0
-    amenities_found = {}
-    
-    # Define place types and their weights - reduced radii for speed
-    place_types = {
-        'school': {'weight': requirements.get('school', 0), 'radius': 1500},
-        'hospital': {'weight': requirements.get('hospital', 0), 'radius': 2000},
-        'supermarket': {'weight': requirements.get('market', 0), 'radius': 1200},
-        'cafe': {'weight': requirements.get('cafe', 0), 'radius': 800},
-        'restaurant': {'weight': requirements.get('restaurant', 0), 'radius': 1200},
-        'park': {'weight': requirements.get('park', 0), 'radius': 1500},
-        'gym': {'weight': requirements.get('gym', 0), 'radius': 1500},
-        'pharmacy': {'weight': requirements.get('pharmacy', 0), 'radius': 800}
-    }
-    
-    for place_type, config in place_types.items():
-        weight = config['weight']
-        if weight > 0:
-            max_score += weight * 10
-            
-            # Use cached POIs if available, otherwise fetch
-            if cached_pois and place_type in cached_pois:
-                places = cached_pois[place_type]
-            else:
-                places = find_nearby_places(lat, lon, place_type, config['radius'])
-            
-            if places:
-                # Find the closest place
-                min_distance = float('inf')
-                closest_place = None
-                
-                for place in places:
-                    place_lat = place['geometry']['location']['lat']
-                    place_lon = place['geometry']['location']['lng']
-                    distance = calculate_distance(lat, lon, place_lat, place_lon)
-                    
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_place = place
-                
-                # Score based on distance (closer = better)
-                # Maximum score if within 500m, decreasing linearly
-                if min_distance <= 0.5:  # 500m
-                    place_score = weight * 10
-                elif min_distance <= config['radius'] / 1000:  # Within radius
-                    place_score = weight * 10 * (1 - (min_distance - 0.5) / (config['radius'] / 1000 - 0.5))
-                else:
-                    place_score = 0
-                
-                score += place_score
-                amenities_found[place_type] = {
-                    'distance': round(min_distance, 2),
-                    'name': closest_place.get('name', 'Unknown'),
-                    'count': len(places)
-                }
-            else:
-                amenities_found[place_type] = {'distance': None, 'name': None, 'count': 0}
-    
-    # Normalize score to 0-100
-    if max_score > 0:
-        normalized_score = (score / max_score) * 100
-    else:
-        normalized_score = 0
-    
-    return {
-        'score': round(normalized_score, 2),
-        'amenities': amenities_found
-    }
-
-def evaluate_locations(center_lat, center_lon, requirements, grid_size=5):
-    """Evaluate multiple locations in a grid around the center point"""
-    
-    # Check if center is in Azerbaijan
-    if not is_in_azerbaijan(center_lat, center_lon):
-        return []
-    
-    print(f"Starting evaluation for {grid_size}x{grid_size} grid...")
-    
-    # Calculate the area we need to cover - optimized for speed
-    step = 0.015  # Approximately 1.5km steps (larger steps = fewer locations)
-    max_radius = 1500  # Reduced radius for faster queries
-    area_radius = max_radius + (grid_size * step * 111000 / 2)  # Convert to meters
-    
-    # Fetch all POIs for the entire area ONCE (much faster!)
-    print("Fetching POIs for the area...")
-    place_types_to_fetch = []
-    
-    # Build list of place types to fetch
-    if requirements.get('market', 0) > 0:
-        place_types_to_fetch.append('supermarket')
-    
-    for place_type in ['school', 'hospital', 'cafe', 'restaurant', 'park', 'gym', 'pharmacy']:
-        if requirements.get(place_type, 0) > 0:
-            place_types_to_fetch.append(place_type)
-    
-    # Fetch POIs in parallel for speed
-    cached_pois = fetch_pois_parallel(center_lat, center_lon, place_types_to_fetch, int(area_radius))
-    
-    # Handle market/supermarket
-    if 'supermarket' in cached_pois:
-        cached_pois['market'] = cached_pois['supermarket']
-    
-    print(f"Found POIs: {sum(len(v) for v in cached_pois.values())} total")
-    
-    # Now evaluate each grid location using cached POIs
-    locations = []
-    start_lat = center_lat - (grid_size * step / 2)
-    start_lon = center_lon - (grid_size * step / 2)
-    
-    print(f"Evaluating {grid_size * grid_size} locations...")
-    for i in range(grid_size):
-        for j in range(grid_size):
-            lat = start_lat + (i * step)
-            lon = start_lon + (j * step)
-            
-            location_data = score_location(lat, lon, requirements, cached_pois)
-            locations.append({
-                'lat': lat,
-                'lon': lon,
-                'score': location_data['score'],
-                'amenities': location_data['amenities']
-            })
-    
-    print("Evaluation complete!")
-    return locations
-
+"""Utility functions for the application"""
+import requests
+from config import (
+    AZERBAIJAN_BOUNDS, OVERPASS_FALLBACK, OVERPASS_UNION_QUERIES, OVERPASS_UNION_TIMEOUT,
+    EVALUATE_BATCH_SIZE, ADAPTIVE_MAX_DEPTH, ADAPTIVE_CELL_BUDGET, POI_CACHE_GRID
+)
+from geo import calculate_distance, bounding_box
+from osm import tag_queries_for, matches_place_type, element_coordinates
+from poi_store import get_poi_store
+from poi_cache import get_poi_cache
+from metro import get_metro_registry
+from overpass_client import get_overpass_client
+from singleflight import SingleFlight
+from instrumentation import phase, upstream_timer, count_pois
+from scoring import score_grid
+from quadtree import refine
+from spatial_index import index_for
+from poi_collection import PoiBuilder, PoiCollection
+
+def is_in_azerbaijan(lat, lon):
+    """Check if coordinates are within Azerbaijan bounds"""
+    return (AZERBAIJAN_BOUNDS['min_lat'] <= lat <= AZERBAIJAN_BOUNDS['max_lat'] and
+            AZERBAIJAN_BOUNDS['min_lon'] <= lon <= AZERBAIJAN_BOUNDS['max_lon'])
+
+def normalize_metro_station_name(name):
+    """Normalize and correct Baku metro station names"""
+    # Spelling variants are looked up in the metro registry's alias index
+    return get_metro_registry().normalize(name)
+
+# Metro stations that show up in OSM but should not be offered
+UNWANTED_METRO_STATIONS = [
+    'mehemmed hadi', 'mehəmməd hadi', 'mehemmedhadi', 'məhəmməd hadi',
+    'azerneft', 'azərneft', 'azər neft yağ', 'azər neft yağ', 'azər neft',
+    'ag seher', 'ağ şəhər', 'agseher', 'ağseher',
+    'şah ismayıl xətai', 'shah ismayil xetai', 'şah ismayıl', 'shah ismayil', 'şah ismayıl xətai'
+]
+
+def overpass_query_parts(lat, lon, place_type, radius):
+    """Build the Overpass QL statements selecting one place type around a point"""
+    # Build the query for all tag combinations - simplified for speed
+    query_parts = []
+    if place_type == 'metro':
+        # Special query for metro stations - only subway stations
+        query_parts.append(f'node["railway"="station"]["station"="subway"](around:{radius},{lat},{lon});')
+        query_parts.append(f'way["railway"="station"]["station"="subway"](around:{radius},{lat},{lon});')
+        query_parts.append(f'node["public_transport"="station"]["station"="subway"](around:{radius},{lat},{lon});')
+        query_parts.append(f'way["public_transport"="station"]["station"="subway"](around:{radius},{lat},{lon});')
+    else:
+        # Only query nodes for speed (skip ways/relations)
+        for key, value in tag_queries_for(place_type):
+            query_parts.append(f'node["{key}"="{value}"](around:{radius},{lat},{lon});')
+    return query_parts
+
+def build_overpass_query(lat, lon, place_type, radius):
+    """Build the Overpass QL query for one place type around a point"""
+    query_parts = overpass_query_parts(lat, lon, place_type, radius)
+    return f"[out:json][timeout:8];({' '.join(query_parts)}); out center;"
+
+# Seconds the client waits for a union query beyond the server's timeout
+UNION_TIMEOUT_MARGIN = 5
+
+def build_union_query(lat, lon, place_types, radius):
+    """Build one Overpass QL query covering several place types around a point"""
+    query_parts = []
+    for place_type in place_types:
+        for part in overpass_query_parts(lat, lon, place_type, radius):
+            # Types can share tags (supermarket and market)
+            if part not in query_parts:
+                query_parts.append(part)
+    return f"[out:json][timeout:{OVERPASS_UNION_TIMEOUT}];({' '.join(query_parts)}); out center;"
+
+class PlaceCollector:
+    """Builds the deduplicated places of one type from Overpass elements"""
+    
+    def __init__(self, place_type):
+        self.place_type = place_type
+        self.builder = PoiBuilder(place_type)
+        self.seen_coords = set()  # To avoid duplicates by coordinates
+        self.seen_names = set()  # To avoid duplicates by name (for metro stations)
+    
+    def add(self, place_lat, place_lon, tags):
+        place_type = self.place_type
+        
+        # Avoid duplicates (same location)
+        coord_key = (round(place_lat, 5), round(place_lon, 5))
+        if coord_key in self.seen_coords:
+            return
+        self.seen_coords.add(coord_key)
+        
+        # Get name
+        name = tags.get('name') or tags.get('brand') or f'{place_type.title()}'
+        
+        # For metro stations, normalize the name and filter for subway only
+        if place_type == 'metro':
+            # Only include if it's actually a subway/metro station
+            if tags.get('station') != 'subway' and tags.get('railway') != 'station':
+                # Check if it has subway-related tags
+                if 'subway' not in str(tags).lower() and 'metro' not in str(tags).lower():
+                    return
+            # Normalize the station name
+            name = normalize_metro_station_name(name)
+            
+            # Filter out unwanted stations
+            name_lower = name.lower()
+            if any(unwanted in name_lower for unwanted in UNWANTED_METRO_STATIONS):
+                return
+            
+            # Avoid duplicate names (especially Memar Əcəmi)
+            name_key = name_lower.strip()
+            if name_key in self.seen_names:
+                return
+            self.seen_names.add(name_key)
+        
+        self.builder.add(place_lat, place_lon, name, tags)
+    
+    def collection(self):
+        return self.builder.build()
+
+def parse_overpass_elements(elements, place_type):
+    """Turn Overpass elements into a PoiCollection of deduplicated places"""
+    collector = PlaceCollector(place_type)
+    for element in elements:
+        # Get coordinates
+        place_lat, place_lon = element_coordinates(element)
+        if place_lat is None or place_lon is None:
+            continue
+        collector.add(place_lat, place_lon, element.get('tags', {}))
+    return collector.collection()
+
+def bucket_overpass_elements(elements, place_types):
+    """Sort the elements of a union query into deduplicated places per type, in one pass"""
+    collectors = {place_type: PlaceCollector(place_type) for place_type in place_types}
+    for element in elements:
+        place_lat, place_lon = element_coordinates(element)
+        if place_lat is None or place_lon is None:
+            continue
+        tags = element.get('tags', {})
+        for place_type, collector in collectors.items():
+            # Only metro queries select ways, and each type only its own tags
+            if element['type'] != 'node' and place_type != 'metro':
+                continue
+            if matches_place_type(tags, place_type):
+                collector.add(place_lat, place_lon, tags)
+    return {place_type: collector.collection() for place_type, collector in collectors.items()}
+
+def find_places_in_store(store, lat, lon, place_type, radius):
+    """Answer a radius query from the local POI store"""
+    radius_km = radius / 1000
+    # Bounding box of the search circle, then exact distance filtering
+    elements = store.query_bbox(place_type, *bounding_box(lat, lon, radius_km))
+    elements = [
+        element for element in elements
+        if calculate_distance(lat, lon, *element_coordinates(element)) <= radius_km
+    ]
+    return parse_overpass_elements(elements, place_type)
+
+def find_local_places(lat, lon, place_type, radius):
+    """Answer a query from the metro registry, POI store or Overpass cache
+
+    Returns a PoiCollection, or None if Overpass is needed.
+    """
+    # Metro stations come from the bundled registry
+    if place_type == 'metro':
+        registry = get_metro_registry()
+        if registry.stations:
+            return PoiCollection.from_places(registry.within(lat, lon, radius / 1000), 'metro')
+    
+    # Prefer the local POI store - no network needed
+    store = get_poi_store()
+    if store is not None and store.covers(lat, lon):
+        return find_places_in_store(store, lat, lon, place_type, radius)
+    
+    if not OVERPASS_FALLBACK:
+        return PoiCollection.empty(place_type)
+    
+    # Serve repeated and contained queries from the cache
+    return get_poi_cache().get(place_type, lat, lon, radius)
+
+def places_from_response(lat, lon, place_type, radius, data):
+    """Parse an Overpass response and cache the places"""
+    places = parse_overpass_elements(data.get('elements', []), place_type)
+    get_poi_cache().put(place_type, lat, lon, radius, places)
+    return places
+
+def report_overpass_error(place_type, error):
+    """Log a failed Overpass fetch"""
+    if isinstance(error, requests.exceptions.Timeout):
+        print(f"Timeout fetching {place_type} from Overpass API")
+    else:
+        print(f"Error fetching places from Overpass API for {place_type}: {error}")
+
+class PoiFetchError(Exception):
+    """An Overpass fetch failed, as opposed to finding no places"""
+
+# In-flight Overpass fetches, so concurrent identical requests share one
+poi_flights = SingleFlight()
+
+def flight_key(place_type, lat, lon, radius):
+    """Identify a fetch by type, radius and center snapped like the POI cache key"""
+    return (place_type, int(radius), round(lat / POI_CACHE_GRID), round(lon / POI_CACHE_GRID))
+
+def find_nearby_places(lat, lon, place_type, radius=2000):
+    """Find nearby places from the local POI store, falling back to the Overpass API (OpenStreetMap)
+
+    Returns place dicts in the API format.
+    """
+    return find_nearby_pois(lat, lon, place_type, radius).to_places()
+
+def find_nearby_pois(lat, lon, place_type, radius=2000):
+    """Find nearby places like find_nearby_places, as a PoiCollection"""
+    
+    # Check if location is in Azerbaijan
+    if not is_in_azerbaijan(lat, lon):
+        return PoiCollection.empty(place_type)
+    
+    places = find_local_places(lat, lon, place_type, radius)
+    if places is None:
+        places = fetch_nearby_pois(lat, lon, place_type, radius)
+    # Counted whichever source answered, like in fetch_pois_parallel
+    count_pois({place_type: places})
+    return places
+
+def fetch_nearby_pois(lat, lon, place_type, radius):
+    """Fetch one place type from Overpass; empty if the fetch failed"""
+    def fetch():
+        query = build_overpass_query(lat, lon, place_type, radius)
+        
+        try:
+            with upstream_timer([place_type]):
+                data = get_overpass_client().query(query)
+        except Exception as e:
+            report_overpass_error(place_type, e)
+            raise PoiFetchError(place_type) from e
+        return places_from_response(lat, lon, place_type, radius, data)
+    
+    # Concurrent identical requests share one Overpass fetch
+    try:
+        return poi_flights.do(flight_key(place_type, lat, lon, radius), fetch)
+    except PoiFetchError:
+        return PoiCollection.empty(place_type)
+
+def fetch_from_overpass(center_lat, center_lon, missing, radius, cached_pois):
+    """Fetch several place types from Overpass concurrently, storing them in cached_pois
+
+    Returns the types whose fetch failed; they are stored empty.
+    """
+    if len(missing) > 1 and OVERPASS_UNION_QUERIES:
+        # One union query for all types, split into types on our side
+        query = build_union_query(center_lat, center_lon, missing, radius)
+        try:
+            # Wait for the server's own timeout, and don't send the heavy query twice
+            with upstream_timer(missing):
+                data = get_overpass_client().query(query, timeout=OVERPASS_UNION_TIMEOUT + UNION_TIMEOUT_MARGIN,
+                                                   hedge=False)
+            buckets = bucket_overpass_elements(data.get('elements', []), missing)
+        except Exception as e:
+            # Not cached, so the next request tries again
+            report_overpass_error(', '.join(missing), e)
+            for place_type in missing:
+                cached_pois[place_type] = PoiCollection.empty(place_type)
+            return list(missing)
+        cache = get_poi_cache()
+        for place_type, places in buckets.items():
+            cache.put(place_type, center_lat, center_lon, radius, places)
+            cached_pois[place_type] = places
+        return []
+    failed = []
+    if missing:
+        queries = [build_overpass_query(center_lat, center_lon, pt, radius) for pt in missing]
+        with upstream_timer(missing):
+            results = get_overpass_client().query_many(queries)
+        for place_type, result in zip(missing, results):
+            if isinstance(result, Exception):
+                report_overpass_error(place_type, result)
+                cached_pois[place_type] = PoiCollection.empty(place_type)
+                failed.append(place_type)
+            else:
+                cached_pois[place_type] = places_from_response(center_lat, center_lon, place_type, radius, result)
+    return failed
+
+def fetch_pois_parallel(center_lat, center_lon, place_types_to_fetch, radius, failed=None):
+    """Fetch POIs of several types around a point, sending the Overpass queries concurrently
+
+    Returns {place_type: PoiCollection}. Types whose fetch failed come back
+    empty; pass a set as failed to tell them apart from types with no places.
+    """
+    cached_pois = {}
+    missing = []
+    
+    for place_type in place_types_to_fetch:
+        if not is_in_azerbaijan(center_lat, center_lon):
+            places = PoiCollection.empty(place_type)
+        else:
+            places = find_local_places(center_lat, center_lon, place_type, radius)
+        if places is None:
+            missing.append(place_type)
+        else:
+            cached_pois[place_type] = places
+    
+    # Fetch only the types no other request is already fetching for this area;
+    # wait for the others once our own fetches are done
+    waiting = {}
+    flights = {}
+    for place_type in missing:
+        key = flight_key(place_type, center_lat, center_lon, radius)
+        flight, leader = poi_flights.begin(key)
+        if leader:
+            flights[place_type] = (key, flight)
+        else:
+            waiting[place_type] = flight
+    
+    fetch_failed = list(flights)
+    try:
+        fetch_failed = fetch_from_overpass(center_lat, center_lon, list(flights), radius, cached_pois)
+    finally:
+        for place_type, (key, flight) in flights.items():
+            if place_type in fetch_failed:
+                poi_flights.finish(key, flight, error=PoiFetchError(place_type))
+            else:
+                poi_flights.finish(key, flight, result=cached_pois[place_type])
+    
+    for place_type, flight in waiting.items():
+        try:
+            cached_pois[place_type] = flight.wait()
+        except PoiFetchError:
+            cached_pois[place_type] = PoiCollection.empty(place_type)
+            fetch_failed.append(place_type)
+    if failed is not None:
+        failed.update(fetch_failed)
+    
+    # Index each type once so every scored point can reuse it
+    for places in cached_pois.values():
+        index_for(places)
+    count_pois(cached_pois)
+    
+    return cached_pois
+
+def scoring_place_types(requirements):
+    """Get the weight and search radius (meters) of each scored place type"""
+    # Define place types and their weights - reduced radii for speed
+    return {
+        'school': {'weight': requirements.get('school', 0), 'radius': 1500},
+        'hospital': {'weight': requirements.get('hospital', 0), 'radius': 2000},
+        'supermarket': {'weight': requirements.get('market', 0), 'radius': 1200},
+        'cafe': {'weight': requirements.get('cafe', 0), 'radius': 800},
+        'restaurant': {'weight': requirements.get('restaurant', 0), 'radius': 1200},
+        'park': {'weight': requirements.get('park', 0), 'radius': 1500},
+        'gym': {'weight': requirements.get('gym', 0), 'radius': 1500},
+        'pharmacy': {'weight': requirements.get('pharmacy', 0), 'radius': 800}
+    }
+
+def proximity_score(weight, distance, radius):
+    """Score one amenity from its distance (km) and search radius (meters)"""
+    if distance is None:
+        return 0
+    # Maximum score if within 500m, decreasing linearly
+    if distance <= 0.5:  # 500m
+        return weight * 10
+    elif distance <= radius / 1000:  # Within radius
+        return weight * 10 * (1 - (distance - 0.5) / (radius / 1000 - 0.5))
+    return 0
+
+def score_location(lat, lon, requirements, cached_pois=None):
+    """Score a location based on proximity to required amenities
+
+    This is the scalar reference implementation; grids are scored with the
+    vectorized engine in scoring.py, which must produce the same results.
+    """
+    score = 0
+    max_score = 0
+    amenities_found = {}
+    
+    place_types = scoring_place_types(requirements)
+    
+    for place_type, config in place_types.items():
+        weight = config['weight']
+        if weight > 0:
+            max_score += weight * 10
+            
+            # Use cached POIs if available, otherwise fetch
+            if cached_pois and place_type in cached_pois:
+                places = cached_pois[place_type]
+            else:
+                places = find_nearby_pois(lat, lon, place_type, config['radius'])
+            
+            if places:
+                # Find the closest place
+                min_distance, closest = index_for(places).nearest_index(lat, lon)
+                
+                # Score based on distance (closer = better)
+                score += proximity_score(weight, min_distance, config['radius'])
+                amenities_found[place_type] = {
+                    'distance': round(min_distance, 2),
+                    'name': places.name(closest),
+                    'count': len(places)
+                }
+            else:
+                amenities_found[place_type] = {'distance': None, 'name': None, 'count': 0}
+    
+    # Normalize score to 0-100
+    if max_score > 0:
+        normalized_score = (score / max_score) * 100
+    else:
+        normalized_score = 0
+    
+    return {
+        'score': round(normalized_score, 2),
+        'amenities': amenities_found
+    }
+
+def score_locations(points, requirements, cached_pois):
+    """Score many (lat, lon) points at once with the vectorized engine
+
+    Falls back to score_location per point if a weighted type isn't cached,
+    since those have to be fetched around each point.
+    """
+    place_types = scoring_place_types(requirements)
+    if any(config['weight'] > 0 and not (cached_pois and place_type in cached_pois)
+           for place_type, config in place_types.items()):
+        return [score_location(lat, lon, requirements, cached_pois) for lat, lon in points]
+    return score_grid(points, place_types, cached_pois)
+
+# Spacing of the evaluation grid
+GRID_STEP = 0.015  # degrees, approximately 1.5km steps (larger steps = fewer locations)
+GRID_MAX_RADIUS = 1500  # meters, reduced radius for faster queries
+
+def evaluation_radius(grid_size):
+    """Get the radius (meters) of the POI fetch behind a grid of grid_size x grid_size points"""
+    return int(GRID_MAX_RADIUS + (grid_size * GRID_STEP * 111000 / 2))
+
+def fetch_evaluation_pois(center_lat, center_lon, requirements, grid_size):
+    """Fetch the POIs needed to score a grid around the center point"""
+    # Calculate the area we need to cover - optimized for speed
+    area_radius = evaluation_radius(grid_size)
+    
+    # Fetch all POIs for the entire area ONCE (much faster!)
+    print("Fetching POIs for the area...")
+    place_types_to_fetch = []
+    
+    # Build list of place types to fetch
+    if requirements.get('market', 0) > 0:
+        place_types_to_fetch.append('supermarket')
+    
+    for place_type in ['school', 'hospital', 'cafe', 'restaurant', 'park', 'gym', 'pharmacy']:
+        if requirements.get(place_type, 0) > 0:
+            place_types_to_fetch.append(place_type)
+    
+    # Fetch POIs in parallel for speed
+    cached_pois = fetch_pois_parallel(center_lat, center_lon, place_types_to_fetch, area_radius)
+    
+    # Handle market/supermarket
+    if 'supermarket' in cached_pois:
+        cached_pois['market'] = cached_pois['supermarket']
+    
+    print(f"Found POIs: {sum(len(v) for v in cached_pois.values())} total")
+    return cached_pois
+
+def grid_points(center_lat, center_lon, grid_size):
+    """Get the (lat, lon) points of a grid_size x grid_size grid, row by row"""
+    start_lat = center_lat - (grid_size * GRID_STEP / 2)
+    start_lon = center_lon - (grid_size * GRID_STEP / 2)
+    return [
+        (start_lat + (i * GRID_STEP), start_lon + (j * GRID_STEP))
+        for i in range(grid_size)
+        for j in range(grid_size)
+    ]
+
+def score_points(points, requirements, cached_pois, vectorized=True):
+    """Score points and return them as location dicts"""
+    with phase('scoring'):
+        if vectorized:
+            results = score_locations(points, requirements, cached_pois)
+        else:
+            results = [score_location(lat, lon, requirements, cached_pois) for lat, lon in points]
+    
+    return [
+        {
+            'lat': lat,
+            'lon': lon,
+            'score': location_data['score'],
+            'amenities': location_data['amenities']
+        }
+        for (lat, lon), location_data in zip(points, results)
+    ]
+
+def coarse_to_fine(grid_size):
+    """Split grid indexes into levels: every 4th row/column, then every 2nd, then the rest"""
+    levels = []
+    seen = set()
+    for stride in (4, 2, 1):
+        level = [
+            i * grid_size + j
+            for i in range(0, grid_size, stride)
+            for j in range(0, grid_size, stride)
+            if i * grid_size + j not in seen
+        ]
+        seen.update(level)
+        if level:
+            levels.append(level)
+    return levels
+
+def evaluate_locations(center_lat, center_lon, requirements, grid_size=5, vectorized=True):
+    """Evaluate multiple locations in a grid around the center point
+
+    Set vectorized=False to score each cell with the scalar score_location.
+    """
+    
+    # Check if center is in Azerbaijan
+    if not is_in_azerbaijan(center_lat, center_lon):
+        return []
+    
+    print(f"Starting evaluation for {grid_size}x{grid_size} grid...")
+    cached_pois = fetch_evaluation_pois(center_lat, center_lon, requirements, grid_size)
+    
+    # Now evaluate each grid location using cached POIs
+    print(f"Evaluating {grid_size * grid_size} locations...")
+    locations = score_points(grid_points(center_lat, center_lon, grid_size), requirements, cached_pois, vectorized)
+    
+    print("Evaluation complete!")
+    return locations
+
+def evaluate_adaptive(center_lat, center_lon, requirements, grid_size=5,
+                      max_depth=ADAPTIVE_MAX_DEPTH, cell_budget=ADAPTIVE_CELL_BUDGET):
+    """Evaluate the grid area adaptively: cells that score high or change sharply are subdivided
+
+    Returns variable-size cells: location dicts with their 'size' in degrees and quadtree 'depth'.
+    """
+    if not is_in_azerbaijan(center_lat, center_lon):
+        return []
+    
+    print(f"Starting adaptive evaluation for {grid_size}x{grid_size} grid (budget {cell_budget} cells)...")
+    cached_pois = fetch_evaluation_pois(center_lat, center_lon, requirements, grid_size)
+    
+    cells = refine(
+        grid_points(center_lat, center_lon, grid_size), GRID_STEP,
+        lambda points: score_points(points, requirements, cached_pois),
+        max_depth=max_depth, cell_budget=cell_budget
+    )
+    
+    print(f"Evaluation complete! {len(cells)} cells")
+    return cells
+
+def stream_evaluation(center_lat, center_lon, requirements, grid_size=5, batch_size=EVALUATE_BATCH_SIZE):
+    """Evaluate a grid like evaluate_locations, yielding events as cells are scored
+
+    Yields a header event with the POI counts, then 'cells' events. A coarse
+    subgrid is scored first so the whole area gets painted early, then the
+    finer levels; within each level the best cells come first.
+    """
+    cached_pois = fetch_evaluation_pois(center_lat, center_lon, requirements, grid_size)
+    yield {
+        'type': 'header',
+        'center': {'lat': center_lat, 'lon': center_lon},
+        'grid_size': grid_size,
+        'total': grid_size * grid_size,
+        'pois': {place_type: len(places) for place_type, places in cached_pois.items()}
+    }
+    
+    points = grid_points(center_lat, center_lon, grid_size)
+    for level in coarse_to_fine(grid_size):
+        locations = score_points([points[index] for index in level], requirements, cached_pois)
+        locations.sort(key=lambda location: -location['score'])
+        for start in range(0, len(locations), batch_size):
+            yield {'type': 'cells', 'locations': locations[start:start + batch_size]}
+    
+    yield {'type': 'done', 'total': grid_size * grid_size}
@@ -0,0 +1,214 @@
+"""Prefetch POIs for the configured regions into the POI cache
+
+Each region is covered with overlapping circles big enough that any
+/api/evaluate grid centered in the region is a superset hit, and the POI
+fetches behind the listings' amenity profiles are warmed with their exact
+keys. Progress is saved after every point, so an interrupted run resumes
+where it stopped:
+
+    python warmup.py [--region Baku] [--reset]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from config import (
+    WARMUP_REGIONS, WARMUP_RADIUS, WARMUP_GRID_SIZE, WARMUP_SPACING_KM, WARMUP_INTERVAL,
+    WARMUP_PROGRESS_FILE, POI_CACHE_TTL
+)
+from enrichment import PROFILE_RADII, profile_fetches
+from geo import calculate_distance
+from osm import OSM_QUERIES
+from poi_cache import get_poi_cache
+from repository import get_house_repository
+from utils import is_in_azerbaijan, find_local_places, fetch_pois_parallel, evaluation_radius
+
+# Server workers share the warm-up; Windows runs a single process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Every type the Overpass queries know; metro comes from the bundled registry
+WARMUP_TYPES = [place_type for place_type in OSM_QUERIES if place_type != 'metro']
+
+def region_radius(spacing_km=WARMUP_SPACING_KM, grid_size=WARMUP_GRID_SIZE):
+    """Get the warm-up radius (meters) covering evaluation grids centered anywhere between the points
+
+    A request center is at most half a diagonal of the point spacing from the
+    nearest point, so its fetch circle fits in a circle that much bigger.
+    """
+    return evaluation_radius(grid_size) + math.ceil(spacing_km * 1000 / math.sqrt(2))
+
+def region_points(region, spacing_km=WARMUP_SPACING_KM):
+    """Get the (lat, lon) warm-up points covering a region, nearest to its center first"""
+    lat_step = spacing_km / 111.32
+    lon_step = spacing_km / (111.32 * math.cos(math.radians(region['lat'])))
+    steps = int(region['extent_km'] // spacing_km)
+    offsets = [(i, j) for i in range(-steps, steps + 1) for j in range(-steps, steps + 1)
+               if math.hypot(i, j) * spacing_km <= region['extent_km']]
+    offsets.sort(key=lambda offset: math.hypot(*offset))
+    points = [(region['lat'] + i * lat_step, region['lon'] + j * lon_step) for i, j in offsets]
+    return [point for point in points if is_in_azerbaijan(*point)]
+
+def load_progress(path):
+    """Get the completed point keys and when they were done"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('completed', {})
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading warm-up progress: {e}")
+        return {}
+
+def save_progress(path, completed):
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'completed': completed}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error saving warm-up progress: {e}")
+
+def listing_work():
+    """Get the (lat, lon, radius, types) fetches behind the listings' amenity profiles"""
+    try:
+        houses = get_house_repository().all()
+    except Exception as e:
+        print(f"Error loading houses for warm-up: {e}")
+        return []
+    return [(lat, lon, radius, list(PROFILE_RADII)) for lat, lon, radius, _ in profile_fetches(houses)]
+
+def hit_rate(regions, listing_fetches, spacing_km=WARMUP_SPACING_KM, grid_size=WARMUP_GRID_SIZE):
+    """Get the share of request lookups now answered without Overpass
+
+    Probes an evaluation grid centered halfway along the diagonal between
+    neighbouring points of each region (the farthest a center gets from a
+    point) and every listing profile fetch.
+    """
+    probes = list(listing_fetches)
+    for region in regions:
+        lat_step = spacing_km / 2 / 111.32
+        lon_step = spacing_km / 2 / (111.32 * math.cos(math.radians(region['lat'])))
+        for lat, lon in region_points(region, spacing_km):
+            lat, lon = lat + lat_step, lon + lon_step
+            if calculate_distance(lat, lon, region['lat'], region['lon']) <= region['extent_km']:
+                probes.append((lat, lon, evaluation_radius(grid_size), WARMUP_TYPES))
+    results = [find_local_places(lat, lon, place_type, radius) is not None
+               for lat, lon, radius, types in probes for place_type in types]
+    return sum(results) / len(results) if results else None
+
+def warm_up(regions=WARMUP_REGIONS, radius=WARMUP_RADIUS, interval=WARMUP_INTERVAL,
+            progress_file=WARMUP_PROGRESS_FILE, reset=False, listings=True):
+    """Prefetch every amenity type around each region's points and the listings'
+    profile fetches, at most one fetch per interval
+
+    Returns (points fetched from Overpass, points whose fetch failed). Failed
+    points aren't recorded as done, so the next run retries them.
+    """
+    radius = radius or region_radius()
+    # Without the disk tier nothing survives a restart, so saved progress means nothing
+    use_progress = bool(progress_file and get_poi_cache().path)
+    completed = {} if reset or not use_progress else load_progress(progress_file)
+    now = time.time()
+    completed = {key: done_at for key, done_at in completed.items() if now - done_at < POI_CACHE_TTL}
+
+    work = [(f"{region['name']}:{index}:{radius}", region['name'], lat, lon, radius, WARMUP_TYPES)
+            for region in regions for index, (lat, lon) in enumerate(region_points(region))]
+    listing_fetches = listing_work() if listings else []
+    work.extend((f'listings:{lat:.5f},{lon:.5f}:{fetch_radius}', 'listings', lat, lon, fetch_radius, types)
+                for lat, lon, fetch_radius, types in listing_fetches)
+    total = len(work)
+    fetched = failures = 0
+    last_fetch = 0
+    for position, (key, name, lat, lon, fetch_radius, types) in enumerate(work, 1):
+        if key in completed:
+            continue
+        missing = [t for t in types if find_local_places(lat, lon, t, fetch_radius) is None]
+        if missing:
+            # Rate limit the upstream fetches
+            wait = last_fetch + interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_fetch = time.monotonic()
+            failed = set()
+            cached_pois = fetch_pois_parallel(lat, lon, missing, fetch_radius, failed)
+            if failed:
+                failures += 1
+                print(f"[{position}/{total}] {name} ({lat:.4f}, {lon:.4f}, {fetch_radius}m): "
+                      f"failed to fetch {', '.join(sorted(failed))}")
+                continue
+            fetched += 1
+            print(f"[{position}/{total}] {name} ({lat:.4f}, {lon:.4f}, {fetch_radius}m): "
+                  f"{sum(len(places) for places in cached_pois.values())} POIs")
+        else:
+            print(f"[{position}/{total}] {name} ({lat:.4f}, {lon:.4f}, {fetch_radius}m): already cached")
+        completed[key] = time.time()
+        if use_progress:
+            save_progress(progress_file, completed)
+
+    print(f"Warm-up complete: {total} points, {fetched} fetched from Overpass, {failures} failed")
+    rate = hit_rate(regions, listing_fetches)
+    if rate is not None:
+        print(f"Warm-up hit rate: {rate:.1%} of evaluation and listing profile lookups served locally")
+    return fetched, failures
+
+@contextmanager
+def single_process(path):
+    """Yield True if this process holds the lock on path, False if another process does"""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def start_background_warmup():
+    """Run the warm-up in a daemon thread so the server can start right away
+
+    Every server worker calls this; the warm-up fills the shared cache, so
+    only one of them runs it at a time.
+    """
+    def run():
+        try:
+            with single_process(f'{WARMUP_PROGRESS_FILE or "warmup_progress.json"}.lock') as leader:
+                if leader:
+                    warm_up()
+        except Exception as e:
+            print(f"Error during cache warm-up: {e}")
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prefetch POIs for the configured regions')
+    parser.add_argument('--region', action='append', choices=[r['name'] for r in WARMUP_REGIONS],
+                        help='Region to warm up (default: all)')
+    parser.add_argument('--reset', action='store_true', help='Ignore saved progress and start over')
+    parser.add_argument('--interval', type=float, default=WARMUP_INTERVAL,
+                        help='Minimum seconds between Overpass fetches')
+    parser.add_argument('--no-listings', action='store_true',
+                        help="Don't warm the POI fetches behind the listings' amenity profiles")
+    args = parser.parse_args(argv)
+
+    regions = [r for r in WARMUP_REGIONS if not args.region or r['name'] in args.region]
+    _, failures = warm_up(regions, interval=args.interval, reset=args.reset, listings=not args.no_listings)
+    if failures:
+        print(f"{failures} points failed; run the warm-up again to retry them")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())